@@ -0,0 +1,6 @@
+"""
+Performance benchmarks for the datapane client
+
+Each benchmark module is runnable directly, e.g. `python -m benchmarks.cold_start`, and writes its results as JSON.
+Results are checked against the limits in `thresholds.json` so they can gate releases, see `harness.py`
+"""
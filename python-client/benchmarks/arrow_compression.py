@@ -0,0 +1,89 @@
+"""
+Size and encode time of DataTable assets with Arrow IPC buffer compression, against uncompressed Arrow
+
+Each frame is written as the file store does, i.e. within a gzip stream (as served assets) and base64-encoded
+(as inline reports), where compressed Arrow is stored in the gzip stream without being compressed again.
+
+Run with `python -m benchmarks.arrow_compression [--scale N] [--check]`
+"""
+from __future__ import annotations
+
+import functools
+import typing as t
+
+from .harness import finish, mk_parser, summarise, timed
+
+if t.TYPE_CHECKING:
+    import pandas as pd
+
+BENCHMARK = "arrow_compression"
+N_ROWS = 200_000
+CODECS = [None, "lz4", "zstd"]
+
+
+def mk_frames(n_rows: int) -> t.Dict[str, pd.DataFrame]:
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    words = np.array([f"word_{i}" for i in range(5000)], dtype=object)
+    return dict(
+        # measurements, e.g. sensor readings or prices
+        numeric=pd.DataFrame(
+            dict(
+                id=np.arange(n_rows),
+                count=rng.integers(0, 1000, n_rows),
+                value=rng.normal(size=n_rows).round(2),
+                ts=pd.Timestamp("2020-01-01") + pd.to_timedelta(np.arange(n_rows), unit="s"),
+            )
+        ),
+        # a typical business table, of categories, free text and amounts
+        mixed=pd.DataFrame(
+            dict(
+                region=rng.choice(["north", "south", "east", "west"], n_rows).astype(object),
+                customer=pd.Series(rng.integers(0, n_rows // 4, n_rows)).map("customer-{:06d}".format),
+                notes=[" ".join(x) for x in rng.choice(words, (n_rows, 5))],
+                amount=rng.integers(0, 10**6, n_rows) / 100,
+                paid=rng.random(n_rows) < 0.5,
+            )
+        ),
+    )
+
+
+def write_asset(df: pd.DataFrame, codec: t.Optional[str], inline: bool) -> int:
+    """Write the frame as a DataTable asset, returning its stored size"""
+    from datapane.common import ArrowFormat
+    from datapane.processors.file_store import B64FileEntry, GzipTmpFileEntry
+
+    klass = B64FileEntry if inline else GzipTmpFileEntry
+    fe = klass(ArrowFormat.ext, ArrowFormat.content_type, compress=codec is None)
+    ArrowFormat.save_file(fe.file, df, compression=codec)
+    fe.freeze()
+    return fe.size
+
+
+def main() -> None:
+    parser = mk_parser(__doc__)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply the number of rows in each frame")
+    args = parser.parse_args()
+    n_rows = int(N_ROWS * args.scale)
+
+    results = {}
+    sizes = {}
+    for (name, df) in mk_frames(n_rows).items():
+        for codec in CODECS:
+            for (store, inline) in [("gzip", False), ("b64", True)]:
+                key = f"{name}_{codec or 'none'}_{store}"
+                f = functools.partial(write_asset, df, codec, inline)
+                results[f"{key}_secs"] = summarise(timed(f, repeat=args.repeat))
+                sizes[key] = f()
+            for store in ("gzip", "b64"):
+                key = f"{name}_{codec or 'none'}_{store}"
+                ratio = sizes[key] / sizes[f"{name}_none_{store}"]
+                print(f"{key}: {sizes[key] / 1024 ** 2:.2f}MB ({ratio:.2f}x), {results[f'{key}_secs']['median']:.3f}s")
+
+    finish(BENCHMARK, results, args, n_rows=n_rows, sizes=sizes)
+
+
+if __name__ == "__main__":
+    main()
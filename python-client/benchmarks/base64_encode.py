@@ -0,0 +1,66 @@
+"""
+Base64 encoding throughput of in-memory (data-uri) assets, against buffering the asset and encoding it in one go
+
+Run with `python -m benchmarks.base64_encode [--check]`
+"""
+from __future__ import annotations
+
+import base64
+import functools
+import hashlib
+import io
+import os
+import typing as t
+
+from .harness import finish, mk_parser, summarise, timed
+
+BENCHMARK = "base64_encode"
+ASSET_SIZE = 100 * 1024 * 1024
+# the chunk size used by `shutil.copyfileobj`, i.e. when loading files into the store
+CHUNK_SIZE = 64 * 1024
+
+
+def _chunks(data: bytes, chunk_size: t.Optional[int]) -> t.List[memoryview]:
+    mv = memoryview(data)
+    if chunk_size is None:
+        return [mv]
+    return [mv[i : i + chunk_size] for i in range(0, len(mv), chunk_size)]
+
+
+def b64encode_src(chunks: t.List[memoryview]) -> str:
+    """Buffer the asset, then encode it with the stdlib"""
+    wrapped = io.BytesIO()
+    for c in chunks:
+        wrapped.write(c)
+    contents = base64.b64encode(wrapped.getbuffer())
+    hashlib.sha256(contents).hexdigest()
+    return f"data:application/octet-stream;base64,{contents.decode('ascii')}"
+
+
+def b64_file_entry_src(chunks: t.List[memoryview]) -> str:
+    from datapane.processors.file_store import B64FileEntry
+
+    fe = B64FileEntry(".bin", "application/octet-stream")
+    for c in chunks:
+        fe.file.write(c)
+    fe.freeze()
+    return fe.src
+
+
+def main() -> None:
+    args = mk_parser(__doc__).parse_args()
+    data = os.urandom(ASSET_SIZE)
+    mb = ASSET_SIZE / (1024 * 1024)
+
+    results = {}
+    for (chunk_name, chunk_size) in [("chunked", CHUNK_SIZE), ("single_write", None)]:
+        chunks = _chunks(data, chunk_size)
+        for (impl_name, f) in [("b64encode", b64encode_src), ("b64_file_entry", b64_file_entry_src)]:
+            times = timed(functools.partial(f, chunks), repeat=args.repeat)
+            results[f"{impl_name}_{chunk_name}_mb_per_sec"] = summarise([mb / x for x in times])
+
+    finish(BENCHMARK, results, args, asset_size=ASSET_SIZE, chunk_size=CHUNK_SIZE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Cold-start benchmarks - import time and first-render latency, each measured in a fresh interpreter
+
+Run with `python -m benchmarks.cold_start [--check]`
+"""
+from __future__ import annotations
+
+import re
+import typing as t
+
+from .harness import finish, mk_parser, run_fresh, run_fresh_json, summarise
+
+BENCHMARK = "cold_start"
+
+_import = """
+import json, time
+start = time.perf_counter()
+import datapane
+print(json.dumps(time.perf_counter() - start))
+"""
+
+# the data and plot objects are created before timing, as a user would already have imported their libraries
+_first_render = """
+import json, time
+import datapane as dp
+{setup}
+start = time.perf_counter()
+dp.stringify_report(dp.View({block}))
+print(json.dumps(time.perf_counter() - start))
+"""
+
+FIRST_RENDERS: t.Dict[str, t.Tuple[str, str]] = {
+    "first_stringify_report": ("", 'dp.Text("Hello, world")'),
+    "first_datatable": (
+        "import pandas as pd\ndf = pd.DataFrame({'a': range(1000), 'b': [str(x) for x in range(1000)]})",
+        "dp.DataTable(df)",
+    ),
+    "first_plot": (
+        "import altair as alt, pandas as pd\n"
+        "df = pd.DataFrame({'x': range(100), 'y': range(100)})\n"
+        "chart = alt.Chart(df).mark_line().encode(x='x', y='y')",
+        "dp.Plot(chart)",
+    ),
+}
+
+_importtime_re = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$")
+
+
+def import_profile(top: int = 25) -> t.List[t.Dict[str, t.Any]]:
+    """Per-module import cost (in microseconds) of `import datapane`, from `python -X importtime`"""
+    stderr = run_fresh("import datapane", "-X", "importtime").stderr
+    modules = []
+    for line in stderr.splitlines():
+        if m := _importtime_re.match(line):
+            (self_us, cumulative_us, _, name) = m.groups()
+            modules.append(dict(module=name, self_us=int(self_us), cumulative_us=int(cumulative_us)))
+    return sorted(modules, key=lambda x: x["self_us"], reverse=True)[:top]
+
+
+def main() -> None:
+    args = mk_parser(__doc__).parse_args()
+    results = {"import_datapane": summarise([run_fresh_json(_import) for _ in range(args.repeat)])}
+    for (name, (setup, block)) in FIRST_RENDERS.items():
+        code = _first_render.format(setup=setup, block=block)
+        results[name] = summarise([run_fresh_json(code) for _ in range(args.repeat)])
+
+    finish(BENCHMARK, results, args, import_profile=import_profile())
+
+
+if __name__ == "__main__":
+    main()
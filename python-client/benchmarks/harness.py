@@ -0,0 +1,106 @@
+"""Shared helpers to run benchmarks and record their results"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import typing as t
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+THRESHOLDS_FILE = BENCH_DIR / "thresholds.json"
+RESULTS_DIR = BENCH_DIR / "results"
+SRC_DIR = BENCH_DIR.parent / "src"
+
+# in-process benchmarks run against the source tree, as do the fresh interpreters (see `fresh_env`)
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+
+def fresh_env() -> t.Dict[str, str]:
+    """Environment for a fresh interpreter, able to import datapane from the source tree"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC_DIR), env.get("PYTHONPATH")]))
+    env.setdefault("DP_TEST_ENV", "true")
+    return env
+
+
+def run_fresh(code: str, *py_args: str) -> subprocess.CompletedProcess:
+    """Run the code in a fresh interpreter, raising on failure"""
+    return subprocess.run(
+        [sys.executable, *py_args, "-c", code], capture_output=True, text=True, check=True, env=fresh_env()
+    )
+
+
+def run_fresh_json(code: str) -> t.Any:
+    """Run the code in a fresh interpreter, returning the JSON it prints on its last line of output"""
+    return json.loads(run_fresh(code).stdout.splitlines()[-1])
+
+
+def timed(f: t.Callable[[], t.Any], repeat: int = 5) -> t.List[float]:
+    """Run `f` several times, returning the times in seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def summarise(times: t.Sequence[float]) -> t.Dict[str, float]:
+    return dict(min=min(times), median=statistics.median(times), max=max(times))
+
+
+def check_thresholds(benchmark: str, results: t.Dict[str, t.Dict[str, float]]) -> t.List[str]:
+    """Compare the median of each result against its threshold, returning a list of failures"""
+    thresholds: t.Dict[str, float] = json.loads(THRESHOLDS_FILE.read_text()).get(benchmark, {})
+    failures = []
+    for (name, limit) in thresholds.items():
+        if name not in results:
+            continue
+        # thresholds are upper bounds, unless the name is a rate, where they're lower bounds
+        value = results[name]["median"]
+        if (value < limit) if name.endswith("_per_sec") else (value > limit):
+            failures.append(f"{benchmark}.{name}: {value:.4g} (threshold {limit:.4g})")
+    return failures
+
+
+def save_results(benchmark: str, results: t.Dict[str, t.Any], output: t.Optional[Path] = None, **extra) -> Path:
+    output = output or RESULTS_DIR / f"{benchmark}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    doc = dict(
+        benchmark=benchmark,
+        timestamp=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        results=results,
+        **extra,
+    )
+    output.write_text(json.dumps(doc, indent=2, sort_keys=True))
+    return output
+
+
+def mk_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs per measurement")
+    parser.add_argument("--output", type=Path, default=None, help="Path of the JSON results file")
+    parser.add_argument("--check", action="store_true", help="Exit with an error if any threshold is exceeded")
+    return parser
+
+
+def finish(benchmark: str, results: t.Dict[str, t.Dict[str, float]], args: argparse.Namespace, **extra) -> None:
+    """Save and print the results, failing the process if thresholds are exceeded and `--check` was given"""
+    failures = check_thresholds(benchmark, results)
+    path = save_results(benchmark, results, args.output, failures=failures, **extra)
+    for (name, r) in results.items():
+        print(f"{name:<40} median {r['median']:.4g}  (min {r['min']:.4g}, max {r['max']:.4g})")
+    print(f"Results written to {path}")
+    if failures:
+        print("Thresholds exceeded:\n  " + "\n  ".join(failures), file=sys.stderr)
+        if args.check:
+            sys.exit(1)
@@ -0,0 +1,86 @@
+"""
+JSON serialisation time for large plots and app data, for each available JSON backend
+
+Run with `python -m benchmarks.json_serialize [--check]`
+"""
+from __future__ import annotations
+
+import functools
+import io
+import typing as t
+
+from .harness import finish, mk_parser, summarise, timed
+
+BENCHMARK = "json_serialize"
+N_ROWS = 200_000
+
+
+def mk_altair_chart():
+    import altair as alt
+    import numpy as np
+    import pandas as pd
+
+    alt.data_transformers.disable_max_rows()
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(dict(x=np.arange(N_ROWS), y=rng.normal(size=N_ROWS), c=rng.choice(["a", "b", "c"], size=N_ROWS)))
+    return alt.Chart(df).mark_point().encode(x="x", y="y", color="c")
+
+
+def mk_plotly_figure():
+    import numpy as np
+    import plotly.graph_objects as go
+
+    rng = np.random.default_rng(0)
+    return go.Figure(go.Scattergl(x=np.arange(N_ROWS), y=rng.normal(size=N_ROWS), mode="markers"))
+
+
+def mk_app_data() -> t.Dict[str, t.Any]:
+    """Similar to the app data embedded into a HTML report, i.e. view xml and data-uri assets"""
+    import base64
+    import os
+
+    assets = {
+        f"asset-{i}": dict(src=f"data:application/json;base64,{base64.b64encode(os.urandom(1024 * 1024)).decode()}")
+        for i in range(20)
+    }
+    return dict(view_xml="<View>" + "<Text>Hello</Text>" * 1000 + "</View>", assets=assets)
+
+
+def write_plot(x: t.Any) -> None:
+    from datapane.view.asset_writers import PlotWriter
+
+    PlotWriter().write_file(x, io.BytesIO())
+
+
+def escape_app_data(app_data: t.Dict[str, t.Any]) -> None:
+    from datapane.processors.processors import ExportHTMLInlineAssets
+
+    ExportHTMLInlineAssets(path="").escape_json_htmlsafe(app_data)
+
+
+def main() -> None:
+    from datapane.common import json_utils
+
+    args = mk_parser(__doc__).parse_args()
+    cases: t.Dict[str, t.Callable[[], None]] = dict(
+        altair=functools.partial(write_plot, mk_altair_chart()),
+        app_data=functools.partial(escape_app_data, mk_app_data()),
+    )
+    try:
+        cases["plotly"] = functools.partial(write_plot, mk_plotly_figure())
+    except ImportError:
+        print("Plotly not installed, skipping")
+
+    results = {}
+    default_backend = json_utils.backend
+    for backend in json_utils._backends:
+        json_utils.set_json_backend(backend)
+        for (name, f) in cases.items():
+            results[f"{name}_{backend}_secs"] = summarise(timed(f, repeat=args.repeat))
+    json_utils.backend = default_backend
+
+    finish(BENCHMARK, results, args, n_rows=N_ROWS, default_backend=default_backend.name)
+
+
+if __name__ == "__main__":
+    main()
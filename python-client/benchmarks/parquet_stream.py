@@ -0,0 +1,80 @@
+"""
+Time and peak Arrow memory to write a Parquet file as a DataTable asset, processed a row group at a time,
+against reading and processing the whole table
+
+Each run is in a fresh interpreter, so the peak allocation of the Arrow memory pool is of that run alone.
+
+Run with `python -m benchmarks.parquet_stream [--scale N] [--check]`
+"""
+from __future__ import annotations
+
+import tempfile
+import typing as t
+from pathlib import Path
+
+from .harness import finish, mk_parser, run_fresh_json, summarise
+
+BENCHMARK = "parquet_stream"
+N_ROWS = 2_000_000
+ROW_GROUP_ROWS = 100_000
+
+_WRITE_ASSET = """
+import json, time
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datapane.common.datafiles import write_parquet, write_table
+from datapane.common.df_processor import process_table
+
+start = time.perf_counter()
+if {stream}:
+    write_parquet(pq.ParquetFile({path!r}, memory_map=True), pa.MockOutputStream())
+else:
+    write_table(process_table(pq.read_table({path!r}, memory_map=True)), pa.MockOutputStream())
+secs = time.perf_counter() - start
+print(json.dumps(dict(secs=secs, peak_mb=pa.default_memory_pool().max_memory() / 1024 ** 2)))
+"""
+
+
+def mk_file(path: Path, n_rows: int) -> None:
+    import numpy as np
+    import pandas as pd
+
+    from datapane.common.datafiles import ParquetFormat
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        dict(
+            id=np.arange(n_rows),
+            region=rng.choice(["north", "south", "east", "west"], n_rows).astype(object),
+            customer=pd.Series(rng.integers(0, n_rows // 4, n_rows)).map("customer-{:06d}".format),
+            amount=rng.integers(0, 10**6, n_rows) / 100,
+            count=rng.integers(0, 1000, n_rows).astype(float),
+            ts=pd.Timestamp("2020-01-01") + pd.to_timedelta(np.arange(n_rows), unit="s"),
+        )
+    )
+    ParquetFormat.save_file(str(path), df, row_group_size=ROW_GROUP_ROWS)
+
+
+def main() -> None:
+    parser = mk_parser(__doc__)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply the number of rows in the file")
+    args = parser.parse_args()
+    n_rows = int(N_ROWS * args.scale)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "data.parquet"
+        mk_file(path, n_rows)
+        for (name, stream) in [("stream", True), ("whole", False)]:
+            runs: t.List[t.Dict[str, float]] = [
+                run_fresh_json(_WRITE_ASSET.format(stream=stream, path=str(path))) for _ in range(args.repeat)
+            ]
+            results[f"{name}_secs"] = summarise([x["secs"] for x in runs])
+            results[f"{name}_peak_mb"] = summarise([x["peak_mb"] for x in runs])
+            print(f"{name}: {results[f'{name}_secs']['median']:.3f}s, {results[f'{name}_peak_mb']['median']:.0f}MB")
+
+    finish(BENCHMARK, results, args, n_rows=n_rows, row_group_rows=ROW_GROUP_ROWS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+DataFrame processing time (`process_df`) across frame shapes and dtypes, against the previous multi-pass pipeline,
+and for a very wide frame, processed on a single thread against a thread per core
+
+Run with `python -m benchmarks.process_df [--scale N] [--check]`
+"""
+from __future__ import annotations
+
+import functools
+import typing as t
+
+from .harness import finish, mk_parser, summarise, timed
+
+if t.TYPE_CHECKING:
+    import pandas as pd
+
+BENCHMARK = "process_df"
+N_ROWS = 500_000
+
+
+def legacy_process_df(df: pd.DataFrame) -> pd.DataFrame:
+    """The previous `process_df`, running each step over the whole frame in turn"""
+    from datapane.common import df_processor as dfp
+
+    df = df.copy(deep=True)
+    dfp.convert_axis(df)
+    dfp.timedelta_to_str(df)
+    df = df.convert_dtypes()
+    dfp.downcast_numbers(df)
+    dfp.obj_to_str(df)
+    dfp.parse_categories(df)
+    dfp.str_to_arrow_str(df)
+    return df
+
+
+def mk_frames(n_rows: int) -> t.Dict[str, pd.DataFrame]:
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+
+    def _col(kind: str, n: int) -> t.Any:
+        if kind == "int":
+            return rng.integers(0, 1000, n)
+        elif kind == "float":
+            return rng.normal(size=n)
+        elif kind == "float_int":
+            return np.where(rng.random(n) < 0.1, np.nan, rng.integers(-100, 100, n))
+        elif kind == "str_low":
+            return rng.choice(["north", "south", "east", "west"], n).astype(object)
+        elif kind == "str_high":
+            return pd.Series(rng.integers(0, n, n)).astype(str).to_numpy(dtype=object)
+        elif kind == "timedelta":
+            return pd.to_timedelta(rng.integers(0, 10**6, n), unit="s")
+        elif kind == "datetime":
+            return pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 10**6, n), unit="s")
+        elif kind == "bool":
+            return rng.random(n) < 0.5
+        raise ValueError(kind)
+
+    kinds = ["int", "float", "float_int", "str_low", "str_high", "timedelta", "datetime", "bool"]
+    frames = {f"{k}_only": pd.DataFrame({f"{k}_{i}": _col(k, n_rows) for i in range(4)}) for k in kinds}
+    # a wide frame, of 60 mixed columns
+    frames["wide_mixed"] = pd.DataFrame({f"{k}_{i}": _col(k, n_rows // 5) for i in range(60) for k in [kinds[i % 8]]})
+    # a very wide frame, of 320 mixed columns
+    frames["very_wide"] = pd.DataFrame({f"{k}_{i}": _col(k, n_rows // 10) for i in range(320) for k in [kinds[i % 8]]})
+    # a tall, narrow frame, with a non-default index
+    n_tall = n_rows * 4
+    frames["tall_indexed"] = pd.DataFrame(
+        dict(x=_col("int", n_tall), y=_col("float", n_tall), c=_col("str_low", n_tall)), index=_col("int", n_tall)
+    )
+    return frames
+
+
+def main() -> None:
+    from datapane.common.df_processor import process_df, process_threads
+
+    parser = mk_parser(__doc__)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply the number of rows in each frame")
+    args = parser.parse_args()
+    n_rows = int(N_ROWS * args.scale)
+
+    results = {}
+    frames = mk_frames(n_rows)
+    for (name, df) in frames.items():
+        results[f"{name}_secs"] = summarise(timed(functools.partial(process_df, df, copy=True), repeat=args.repeat))
+        results[f"{name}_legacy_secs"] = summarise(timed(functools.partial(legacy_process_df, df), repeat=args.repeat))
+        speedup = results[f"{name}_legacy_secs"]["median"] / results[f"{name}_secs"]["median"]
+        print(f"{name}: {results[f'{name}_secs']['median']:.3f}s ({speedup:.1f}x)")
+
+    very_wide = frames["very_wide"]
+    f_serial = functools.partial(process_df, very_wide, copy=True, threads=1)
+    results["very_wide_serial_secs"] = summarise(timed(f_serial, repeat=args.repeat))
+    speedup = results["very_wide_serial_secs"]["median"] / results["very_wide_secs"]["median"]
+    print(f"very_wide: {speedup:.1f}x faster over {process_threads} threads than on 1")
+
+    finish(BENCHMARK, results, args, n_rows=n_rows, threads=process_threads)
+
+
+if __name__ == "__main__":
+    main()
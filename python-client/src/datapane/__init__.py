@@ -1,6 +1,8 @@
 # Copyright 2020 StackHut Limited (trading as Datapane)
 # SPDX-License-Identifier: Apache-2.0
+import importlib
 import sys
+import typing as t
 from pathlib import Path
 
 try:
@@ -28,45 +30,124 @@ from .client import (  # isort:skip  otherwise circular import issue
     set_dp_mode,
 )  # isort:skip  otherwise circular import issue
 
-from .blocks import (
-    HTML,
-    Attachment,
-    BigNumber,
-    Block,
-    Code,
-    DataTable,
-    Embed,
-    Empty,
-    Formula,
-    Group,
-    Media,
-    Page,
-    Plot,
-    Select,
-    SelectType,
-    Table,
-    Text,
-    Toggle,
-    VAlign,
-    wrap_block,
-)
-from .processors import (
-    FontChoice,
-    Formatting,
-    TextAlignment,
-    Width,
-    build_report,
-    save_report,
-    stringify_report,
-    upload_report,
-)
-from .view import App, Blocks, Report, View
-
-# Other useful re-exports
-# ruff: noqa: I001
-from . import builtins  # isort:skip  otherwise circular import issue
-
-X = wrap_block
+# Lazily-loaded public API (PEP 562), as the blocks, views and processors have heavy dependencies
+# maps attribute -> (submodule, attribute in submodule)
+_lazy_attrs: t.Dict[str, t.Tuple[str, t.Optional[str]]] = {
+    **{
+        x: (".blocks", x)
+        for x in (
+            "HTML",
+            "Attachment",
+            "BigNumber",
+            "Block",
+            "Code",
+            "DataTable",
+            "Embed",
+            "Empty",
+            "Formula",
+            "Group",
+            "Media",
+            "Page",
+            "Plot",
+            "Select",
+            "SelectType",
+            "Table",
+            "Text",
+            "Toggle",
+            "VAlign",
+            "wrap_block",
+        )
+    },
+    **{
+        x: (".processors", x)
+        for x in (
+            "FontChoice",
+            "Formatting",
+            "RenderBudget",
+            "RenderResult",
+            "TextAlignment",
+            "Width",
+            "archive_report",
+            "build_report",
+            "save_report",
+            "stringify_report",
+            "upload_report",
+        )
+    },
+    **{x: (".view", x) for x in ("App", "Blocks", "Report", "View")},
+    # Other useful re-exports
+    "builtins": (".builtins", None),
+    "X": (".blocks", "wrap_block"),
+}
+
+
+# Subpackages that were imported (so available as attributes) with the eager API, and are now imported on first use
+_lazy_subpackages = ("_vendor", "blocks", "processors", "resources", "view")
+
+
+def __getattr__(name: str) -> t.Any:
+    if name in _lazy_attrs:
+        (mod_name, attr) = _lazy_attrs[name]
+        mod = importlib.import_module(mod_name, __name__)
+        value = mod if attr is None else getattr(mod, attr)
+    else:
+        # any other subpackage or submodule, as with `import datapane.x`
+        try:
+            value = importlib.import_module(f"{__name__}.{name}")
+        except ModuleNotFoundError as e:
+            if e.name != f"{__name__}.{name}":
+                raise
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    # cache on the module so later lookups are direct
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> t.List[str]:
+    return sorted({*globals(), *_lazy_attrs, *_lazy_subpackages})
+
+
+if t.TYPE_CHECKING:
+    from . import builtins
+    from .blocks import (
+        HTML,
+        Attachment,
+        BigNumber,
+        Block,
+        Code,
+        DataTable,
+        Embed,
+        Empty,
+        Formula,
+        Group,
+        Media,
+        Page,
+        Plot,
+        Select,
+        SelectType,
+        Table,
+        Text,
+        Toggle,
+        VAlign,
+        wrap_block,
+    )
+    from .processors import (
+        FontChoice,
+        Formatting,
+        RenderBudget,
+        RenderResult,
+        TextAlignment,
+        Width,
+        archive_report,
+        build_report,
+        save_report,
+        stringify_report,
+        upload_report,
+    )
+    from .view import App, Blocks, Report, View
+
+    X = wrap_block
 
 __all__ = [
     "App",
@@ -97,6 +178,7 @@ __all__ = [
     "upload_report",
     "save_report",
     "build_report",
+    "archive_report",
     "stringify_report",
     "X",
     "Page",
@@ -104,6 +186,8 @@ __all__ = [
     "Width",
     "FontChoice",
     "Formatting",
+    "RenderBudget",
+    "RenderResult",
     "TextAlignment",
 ]
 
@@ -0,0 +1,56 @@
+"""
+Datapane command line
+
+    datapane render-server [--host HOST] [--port PORT] [--workers N] [--max-queue N] [--timeout SECS]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import typing as t
+
+
+def _render_server(args: argparse.Namespace) -> None:
+    from datapane.server import RenderServer
+
+    RenderServer(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        max_queue=args.max_queue,
+        timeout=args.timeout,
+        max_upload_mb=args.max_upload_mb,
+    ).serve_forever()
+
+
+def mk_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="datapane", description="Datapane command line")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Increase the logging verbosity")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("render-server", help="Run a local HTTP server that renders block specs")
+    p.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: %(default)s)")
+    p.add_argument("--port", type=int, default=8090, help="Port to listen on (default: %(default)s)")
+    p.add_argument(
+        "--workers", type=int, default=min(os.cpu_count() or 1, 4), help="Render processes (default: %(default)s)"
+    )
+    p.add_argument("--max-queue", type=int, default=8, help="Requests waiting for a worker (default: %(default)s)")
+    p.add_argument("--timeout", type=float, default=300.0, help="Render timeout in seconds (default: %(default)s)")
+    p.add_argument("--max-upload-mb", type=int, default=512, help="Largest request body (default: %(default)s)")
+    p.set_defaults(func=_render_server)
+    return parser
+
+
+def main(argv: t.Optional[t.List[str]] = None) -> None:
+    from datapane.client.utils import _setup_dp_logging
+
+    args = mk_parser().parse_args(argv)
+    _setup_dp_logging(verbosity=args.verbose + 1)
+    try:
+        args.func(args)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
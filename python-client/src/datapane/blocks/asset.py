@@ -5,16 +5,18 @@ import typing as t
 from pathlib import Path
 
 import pandas as pd
-from pandas.io.formats.style import Styler
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from datapane.common import NPath, SSDict
-from datapane.common.df_processor import to_df
+from datapane.common.datafiles import check_compression
+from datapane.common.df_processor import to_df, to_table
 from datapane.common.viewxml_utils import mk_attribs
 
 from .base import BlockId, DataBlock
 
 if t.TYPE_CHECKING:
-    from datapane.processors.file_store import FileEntry
+    from pandas.io.formats.style import Styler
 
 
 class AssetBlock(DataBlock):
@@ -22,8 +24,6 @@ class AssetBlock(DataBlock):
     AssetBlock objects form basis of all File-related blocks (abstract class, not exported)
     """
 
-    _prev_entry: t.Optional[FileEntry] = None
-
     # TODO - we may need to support file here as well to handle media, etc.
     def __init__(
         self,
@@ -40,6 +40,8 @@ class AssetBlock(DataBlock):
         self.file = file
         self.caption = caption
         self.file_attribs: SSDict = dict()
+        # options passed to the asset writer
+        self.writer_options: t.Dict[str, t.Any] = dict()
 
     def get_file_attribs(self) -> SSDict:
         return self.file_attribs
@@ -183,7 +185,7 @@ class Table(AssetBlock):
 
 class DataTable(AssetBlock):
     """
-    The DataTable block takes a pandas DataFrame and renders an interactive, sortable, searchable table in your app, along with advanced analysis options such as exploring data through [SandDance](https://www.microsoft.com/en-us/research/project/sanddance/).
+    The DataTable block takes a pandas DataFrame (or Arrow-compatible data, or a Parquet file) and renders an interactive, sortable, searchable table in your app, along with advanced analysis options such as exploring data through [SandDance](https://www.microsoft.com/en-us/research/project/sanddance/).
 
     It supports large datasets and viewers can also download the table from the website as a CSV or Excel file.
 
@@ -195,21 +197,34 @@ class DataTable(AssetBlock):
 
     def __init__(
         self,
-        df: pd.DataFrame,
+        df: t.Union[pd.DataFrame, pa.Table, pq.ParquetFile, t.Any],
         caption: t.Optional[str] = None,
         name: BlockId = None,
         label: str = None,
+        compression: t.Optional[str] = None,
     ):
         """
         Args:
-            df: The pandas dataframe to attach to the report
+            df: The pandas dataframe to attach to the report, this is referenced rather than copied and read when rendered.
+             Arrow-compatible data, e.g. a pyarrow Table or RecordBatchReader, a polars DataFrame, or any object
+             exporting the Arrow PyCapsule stream, is also accepted and processed without converting to pandas.
+             An open `pyarrow.parquet.ParquetFile` is processed a row group at a time, without loading the whole file,
+             open it with `datapane.common.datafiles.ParquetPath` to render it with the `process` budget backend
             caption: A caption to display below the plot (optional)
             name: A unique name for the block to reference when adding text or embedding (optional)
             label: A label used when displaying the block (optional)
+            compression: Compress the Arrow data, using `lz4` or `zstd`, mainly to reduce the size of inline reports (optional)
         """
-        # create a copy of the df to process
-        df = to_df(df)
-        super().__init__(data=df, caption=caption, name=name, label=label)
+        compression = check_compression(compression)
+        # keep a shallow copy of the df (or the arrow table), sharing its data - it's only processed when rendered
+        if isinstance(df, pq.ParquetFile):
+            data = df
+            (rows, columns) = (df.metadata.num_rows, len(df.schema_arrow))
+        else:
+            table = to_table(df)
+            data = to_df(df, copy=False) if table is None else table
+            (rows, columns) = data.shape
+        super().__init__(data=data, caption=caption, name=name, label=label)
+        self.writer_options = dict(compression=compression)
         # TODO - support pyarrow schema for local reports
-        (rows, columns) = df.shape
         self.file_attribs = mk_attribs(rows=rows, columns=columns, schema="[]")
@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+import base64
+import hashlib
 import secrets
+import typing as t
 
 from .base import BaseBlock, BlockId
 
 
-def gen_name() -> str:
-    """Return a (safe) name for use in a Block"""
-    return f"id-{secrets.token_urlsafe(8)}"
+def gen_name(seed: t.Optional[str] = None) -> str:
+    """Return a (safe) name for use in a Block, derived from the seed if given"""
+    if seed is None:
+        return f"id-{secrets.token_urlsafe(8)}"
+    token = base64.urlsafe_b64encode(hashlib.sha256(seed.encode()).digest()[:8]).rstrip(b"=").decode()
+    return f"id-{token}"
 
 
 class Empty(BaseBlock):
@@ -19,6 +25,15 @@ class Empty(BaseBlock):
     """
 
     _tag = "Empty"
+    # the name was generated rather than set by the user
+    _is_generated: bool = False
 
     def __init__(self, name: BlockId):
         super().__init__(name=name)
+
+    @classmethod
+    def generated(cls) -> Empty:
+        """Create an Empty block with a generated name"""
+        inst = cls(gen_name())
+        inst._is_generated = True
+        return inst
@@ -8,7 +8,7 @@ from datapane.client import DPClientError, log
 from datapane.common.dp_types import StrEnum
 
 from .base import BaseBlock, BlockId, BlockList, BlockOrPrimitive, wrap_block
-from .empty import Empty, gen_name
+from .empty import Empty
 
 if t.TYPE_CHECKING:
     from typing_extensions import Self
@@ -63,7 +63,7 @@ class ContainerBlock(BaseBlock):
 
     @classmethod
     def empty(cls) -> Self:
-        return cls(blocks=[Empty(gen_name())])
+        return cls(blocks=[Empty.generated()])
 
     def traverse(self, visitor: VV) -> VV:
         # perform a depth-first traversal of the contained blocks
@@ -6,6 +6,8 @@ import typing as t
 from pathlib import Path
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from altair.utils import SchemaBase
 from multimethod import multimethod
 
@@ -18,6 +20,9 @@ from .base import DataBlock
 
 @multimethod
 def convert_to_block(x: object) -> DataBlock:
+    # support for optional libraries is registered on first use
+    if opt.load_for(x):
+        return convert_to_block(x)
     raise DPClientError(
         f"{type(x)} not supported directly, please pass into in the appropriate dp object (including dp.Attachment if want to upload as a pickle)"
     )
@@ -46,35 +51,60 @@ def convert_to_block(x: pd.DataFrame) -> DataBlock:
     return b.Table(x) if n_cells <= 250 else b.DataTable(x)
 
 
+@multimethod
+def convert_to_block(x: pa.Table) -> DataBlock:
+    return b.DataTable(x)
+
+
+@multimethod
+def convert_to_block(x: pq.ParquetFile) -> DataBlock:
+    return b.DataTable(x)
+
+
 # Plots
 @multimethod
 def convert_to_block(x: SchemaBase) -> DataBlock:
     return b.Plot(x)
 
 
+def _register_plots(*types: type) -> None:
+    for typ in types:
+        convert_to_block[(typ,)] = b.Plot
+
+
 if opt.HAVE_BOKEH:
 
-    @multimethod
-    def convert_to_block(x: t.Union[opt.BFigure, opt.BLayout]) -> DataBlock:
-        return b.Plot(x)
+    @opt.on_first_use("bokeh")
+    def _register_bokeh() -> None:
+        from bokeh.layouts import LayoutDOM as BLayout
+        from bokeh.plotting.figure import Figure as BFigure
+
+        _register_plots(BFigure, BLayout)
 
 
 if opt.HAVE_PLOTLY:
 
-    @multimethod
-    def convert_to_block(x: opt.PFigure) -> DataBlock:
-        return b.Plot(x)
+    @opt.on_first_use("plotly")
+    def _register_plotly() -> None:
+        from plotly.graph_objects import Figure as PFigure
+
+        _register_plots(PFigure)
 
 
 if opt.HAVE_FOLIUM:
 
-    @multimethod
-    def convert_to_block(x: opt.Map) -> DataBlock:
-        return b.Plot(x)
+    @opt.on_first_use("folium")
+    def _register_folium() -> None:
+        from folium import Map
+
+        _register_plots(Map)
 
 
 if opt.HAVE_MATPLOTLIB:
 
-    @multimethod
-    def convert_to_block(x: t.Union[opt.Figure, opt.Axes, opt.ndarray]) -> DataBlock:
-        return b.Plot(x)
+    @opt.on_first_use("matplotlib", "numpy")
+    def _register_matplotlib() -> None:
+        from matplotlib.figure import Axes, Figure
+        from numpy import ndarray
+
+        _register_plots(Figure, Axes, ndarray)
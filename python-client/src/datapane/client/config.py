@@ -4,6 +4,8 @@ We use a module-level singleton pattern here, where top-level functions and glob
 act like the state for a "Manager" class around the internal Config object
 """
 import typing as t
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Optional
 
 from .utils import log
@@ -28,6 +30,8 @@ class Config:
 
 
 config: Optional[Config] = None
+# per-context override of the global config, e.g. for a single request within a threaded server
+_context_config: "ContextVar[Optional[Config]]" = ContextVar("dp_config", default=None)
 
 
 ################################################################################
@@ -55,8 +59,18 @@ def set_config(c: Optional[Config]):
 
 def get_config() -> Config:
     """Get the current config object, doesn't attempt to re-init the API token"""
-    global config
-    if config is None:
+    c = _context_config.get() or config
+    if c is None:
         raise RuntimeError("Config must be initialised before it can be used")
 
-    return config
+    return c
+
+
+@contextmanager
+def use_config(c: Config) -> t.Iterator[Config]:
+    """Use the config within the current thread / async context only, rather than replacing the global config"""
+    token = _context_config.set(c)
+    try:
+        yield c
+    finally:
+        _context_config.reset(token)
@@ -7,7 +7,9 @@ Common/shared objects and types used throughout the client API
 import atexit
 import os
 import shutil
+import threading
 import time
+import typing as t
 from datetime import timedelta
 from pathlib import Path
 from tempfile import gettempdir, mkdtemp, mkstemp
@@ -21,18 +23,62 @@ from datapane.common import MIME, guess_type
 # Tmpfile handling
 # We create a tmp-dir per Python execution that stores all working files,
 # we attempt to delete where possible, but where not, we allow the atexit handler
-# to cleanup for us on shutdown
-cache_dir = Path(gettempdir())
-
-# Remove any old dp-tmp-* dirs over 24hrs old which might not have been cleaned up due to unexpected exit
-one_day_ago = time.time() - timedelta(days=1).total_seconds()
-prev_tmp_dirs = (p for p in cache_dir.glob("dp-tmp-*") if p.is_dir() and p.stat().st_mtime < one_day_ago)
-for p in prev_tmp_dirs:
-    log.debug(f"Removing stale temp dir {p}")
-    shutil.rmtree(p, ignore_errors=True)
-
-# create new dp-tmp for this session
-tmp_dir = Path(mkdtemp(prefix="dp-tmp-", dir=cache_dir)).absolute()
+# to cleanup for us on shutdown.
+# NOTE - the tmp-dir is only created when the first tmp file is needed, to avoid touching the filesystem on import
+STALE_TMP_AGE = timedelta(days=1)
+# minimum time between scans for stale tmp dirs, across all processes sharing the system temp dir
+STALE_CLEANUP_INTERVAL = timedelta(hours=1)
+_CLEANUP_STAMP = "dp-tmp-cleanup.stamp"
+
+_tmp_dir: t.Optional[Path] = None
+_tmp_dir_lock = threading.Lock()
+
+
+def _remove_stale_tmp_dirs(cache_dir: Path) -> None:
+    """Remove any old dp-tmp-* dirs which might not have been cleaned up due to unexpected exit"""
+    cutoff = time.time() - STALE_TMP_AGE.total_seconds()
+    for p in cache_dir.glob("dp-tmp-*"):
+        try:
+            if p.is_dir() and p.stat().st_mtime < cutoff:
+                log.debug(f"Removing stale temp dir {p}")
+                shutil.rmtree(p, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def _schedule_stale_cleanup(cache_dir: Path) -> None:
+    """Run the stale tmp dir cleanup in the background, at most once per STALE_CLEANUP_INTERVAL"""
+    stamp = cache_dir / _CLEANUP_STAMP
+    try:
+        if time.time() - stamp.stat().st_mtime < STALE_CLEANUP_INTERVAL.total_seconds():
+            return
+    except FileNotFoundError:
+        pass
+    try:
+        # claim this interval before scanning, so concurrent processes skip it
+        stamp.touch()
+    except OSError:
+        return
+    threading.Thread(target=_remove_stale_tmp_dirs, args=(cache_dir,), name="dp-tmp-cleanup", daemon=True).start()
+
+
+def get_tmp_dir() -> Path:
+    """Return the dp-tmp dir for this session, creating it on first use"""
+    global _tmp_dir
+    with _tmp_dir_lock:
+        if _tmp_dir is None:
+            cache_dir = Path(gettempdir())
+            _tmp_dir = Path(mkdtemp(prefix="dp-tmp-", dir=cache_dir)).absolute()
+            atexit.register(cleanup_tmp)
+            _schedule_stale_cleanup(cache_dir)
+        return _tmp_dir
+
+
+def __getattr__(name: str) -> t.Any:
+    # backwards-compatibility for the previous module-level tmp_dir
+    if name == "tmp_dir":
+        return get_tmp_dir()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class DPTmpFile:
@@ -43,7 +89,7 @@ class DPTmpFile:
     """
 
     def __init__(self, ext: str):
-        fd, name = mkstemp(suffix=ext, prefix="dp-tmp-", dir=tmp_dir)
+        fd, name = mkstemp(suffix=ext, prefix="dp-tmp-", dir=get_tmp_dir())
         os.close(fd)
         self.file = Path(name)
 
@@ -71,9 +117,9 @@ class DPTmpFile:
         return self.name
 
 
-@atexit.register
 def cleanup_tmp():
-    """Ensure we cleanup the tmp_dir on Python VM exit"""
+    """Ensure we cleanup the tmp_dir on Python VM exit, registered when the tmp_dir is created"""
     # breaks tests
-    # log.debug(f"Removing current session DP tmp work dir {tmp_dir}")
-    shutil.rmtree(tmp_dir, ignore_errors=True)
+    # log.debug(f"Removing current session DP tmp work dir {_tmp_dir}")
+    if _tmp_dir is not None:
+        shutil.rmtree(_tmp_dir, ignore_errors=True)
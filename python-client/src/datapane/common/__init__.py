@@ -5,7 +5,9 @@ NOTE - this module should not depend on any client or server specific code and i
 # Copyright 2020 StackHut Limited (trading as Datapane)
 # SPDX-License-Identifier: Apache-2.0
 # flake8: noqa:F401
-from .datafiles import ArrowFormat
+import importlib
+import typing as t
+
 from .dp_types import (
     ARROW_EXT,
     ARROW_MIMETYPE,
@@ -30,6 +32,39 @@ from .dp_types import (
     SSDict,
     log,
 )
-from .ops_utils import pushd, timestamp
-from .utils import dict_drop_empty, guess_type, utf_read_text
-from .viewxml_utils import ViewXML, load_doc, validate_view_doc
+
+# Lazily-loaded (PEP 562), as these pull in pandas, pyarrow and lxml
+_lazy_attrs: t.Dict[str, str] = {
+    "ArrowFormat": ".datafiles",
+    "ParquetFormat": ".datafiles",
+    "pushd": ".ops_utils",
+    "timestamp": ".ops_utils",
+    "dict_drop_empty": ".utils",
+    "guess_type": ".utils",
+    "utf_read_text": ".utils",
+    "ViewXML": ".viewxml_utils",
+    "load_doc": ".viewxml_utils",
+    "validate_view_doc": ".viewxml_utils",
+}
+
+
+def __getattr__(name: str) -> t.Any:
+    try:
+        mod_name = _lazy_attrs[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    value = getattr(importlib.import_module(mod_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> t.List[str]:
+    return sorted({*globals(), *_lazy_attrs})
+
+
+if t.TYPE_CHECKING:
+    from .datafiles import ArrowFormat, ParquetFormat
+    from .ops_utils import pushd, timestamp
+    from .utils import dict_drop_empty, guess_type, utf_read_text
+    from .viewxml_utils import ViewXML, load_doc, validate_view_doc
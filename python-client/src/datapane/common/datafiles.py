@@ -1,25 +1,115 @@
 """Dataset Format handling"""
 import abc
 import enum
-from typing import IO, Dict, Type, Union
+import io
+import sys
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Dict, Iterator, List, Optional, Tuple, Type, Union
 
 import pandas as pd
 import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 from pandas.errors import ParserError
 from pyarrow import RecordBatchFileWriter
 
-from .df_processor import obj_to_str, process_df, str_to_arrow_str
-from .dp_types import ARROW_EXT, ARROW_MIMETYPE, MIME, log
+from .df_processor import (
+    obj_to_str,
+    process_batch_stream,
+    process_df_batches,
+    process_table,
+    str_to_arrow_str,
+    to_table,
+)
+from .dp_types import ARROW_EXT, ARROW_MIMETYPE, MIME, SIZE_1_MB, log
 from .utils import guess_encoding
 
+# IPC buffer compression codecs, by their accepted names
+ARROW_COMPRESSION = {"lz4": "lz4", "lz4_frame": "lz4", "zstd": "zstd"}
 
-def write_table(table: pa.Table, sink: Union[str, IO[bytes]]):
-    """Write an arrow table to a file"""
-    writer = RecordBatchFileWriter(sink, table.schema)
+
+def check_compression(compression: Optional[str]) -> Optional[str]:
+    """Validate the IPC compression codec, returning its name as used by pyarrow"""
+    if compression is None:
+        return None
+    codec = ARROW_COMPRESSION.get(compression.lower())
+    if codec is None:
+        raise ValueError(f"Unknown Arrow compression {compression}, choose from {list(ARROW_COMPRESSION)}")
+    if not pa.Codec.is_available(codec):
+        raise ValueError(f"Arrow compression {compression} isn't available in this build of pyarrow")
+    return codec
+
+
+def _ipc_options(compression: Optional[str]) -> Optional[pa.ipc.IpcWriteOptions]:
+    codec = check_compression(compression)
+    return pa.ipc.IpcWriteOptions(compression=codec) if codec else None
+
+
+def write_table(table: pa.Table, sink: Union[str, IO[bytes]], compression: Optional[str] = None):
+    """Write an arrow table to a file, with the buffers compressed using `compression` (lz4 or zstd) if given"""
+    writer = RecordBatchFileWriter(sink, table.schema, options=_ipc_options(compression))
     writer.write(table)
     writer.close()
 
 
+def write_df(
+    df: pd.DataFrame,
+    sink: Union[str, IO[bytes]],
+    batch_rows: Optional[int] = None,
+    threads: Optional[int] = None,
+    compression: Optional[str] = None,
+):
+    """Process and write a dataframe to an arrow file, a record batch at a time"""
+    (schema, batches) = process_df_batches(df, batch_rows=batch_rows, threads=threads)
+    with RecordBatchFileWriter(sink, schema, options=_ipc_options(compression)) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+
+
+class ParquetPath(pq.ParquetFile):
+    """
+    A Parquet file opened from a path, that's pickled as its path, so it can be sent to a subprocess, e.g. to write
+    a DataTable with the `process` render budget backend (see `RenderBudget`)
+    """
+
+    def __init__(self, path: str, memory_map: bool = True):
+        super().__init__(path, memory_map=memory_map)
+        self.path = path
+        self.memory_map = memory_map
+
+    def __reduce__(self):
+        return (type(self), (self.path, self.memory_map))
+
+
+# the number of rows read from a Parquet file at a time when processing it
+PARQUET_BATCH_ROWS = 64 * 1024
+
+
+def process_parquet(pf: pq.ParquetFile, threads: Optional[int] = None) -> Tuple[pa.Schema, Iterator[pa.RecordBatch]]:
+    """Process a Parquet file into arrow record batches, reading its row groups as needed, see `process_batch_stream`"""
+    return process_batch_stream(
+        pf.schema_arrow,
+        pf.metadata.num_rows,
+        read_batches=lambda columns: pf.iter_batches(batch_size=PARQUET_BATCH_ROWS, columns=columns),
+        read_columns=lambda columns: pf.read(columns=columns),
+        threads=threads,
+    )
+
+
+def write_parquet(
+    pf: pq.ParquetFile,
+    sink: Union[str, IO[bytes]],
+    threads: Optional[int] = None,
+    compression: Optional[str] = None,
+):
+    """Process and write a Parquet file to an arrow file, a record batch at a time, without loading the whole file"""
+    (schema, batches) = process_parquet(pf, threads=threads)
+    with RecordBatchFileWriter(sink, schema, options=_ipc_options(compression)) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+
+
 PathOrFile = Union[str, IO]
 
 
@@ -49,19 +139,161 @@ class ArrowFormat(DFFormatter):
     enum = "ARROW"
 
     @staticmethod
-    def load_file(fn: PathOrFile) -> pd.DataFrame:
-        df = pa.ipc.open_file(fn).read_pandas()
+    def load_file(
+        fn: PathOrFile,
+        columns: Optional[List[str]] = None,
+        rows: Optional[slice] = None,
+        as_table: bool = False,
+    ) -> Union[pd.DataFrame, pa.Table]:
+        """
+        Load an arrow file, memory-mapped when given a path, so only the parts used are read from disk
+
+        Args:
+            fn: The path or file object
+            columns: Only load these columns, in this order (optional)
+            rows: Only load this range of rows, indexed by their position in the file (optional)
+            as_table: Return the arrow table, deferring the conversion to pandas, e.g. until it's sliced further
+        NOTE - the table shares the memory-mapped file (unless compressed), so is opened without reading its data
+        """
+        mapped = isinstance(fn, str)
+        source = pa.memory_map(fn) if mapped else fn
+        options = None
+        if columns is not None:
+            names = pa.ipc.open_file(source).schema.names
+            if missing := [c for c in columns if c not in names]:
+                raise ValueError(f"Columns {missing} not found in the arrow file")
+            if not mapped:
+                # only read the selected columns from file objects (the mapped file is selected without reading)
+                options = pa.ipc.IpcReadOptions(included_fields=sorted({names.index(c) for c in columns}))
+        table = pa.ipc.open_file(source, options=options).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        if rows is not None:
+            (start, stop, step) = rows.indices(table.num_rows)
+            if step != 1:
+                raise ValueError("Only contiguous ranges of rows can be loaded")
+            table = table.slice(start, max(stop - start, 0))
+        if as_table:
+            return table
+
+        df = table.to_pandas()
+        if rows is not None:
+            df.index = pd.RangeIndex(start, start + len(df))
         # NOTE - need to convert categories from object to string https://github.com/apache/arrow/issues/33070
         obj_to_str(df)
         str_to_arrow_str(df)
         return df
 
     @staticmethod
-    def save_file(fn: PathOrFile, df: pd.DataFrame):
-        df = process_df(df)
-        # NOTE - can pass expected schema and columns for output df here
-        table: pa.Table = pa.Table.from_pandas(df, preserve_index=False)
-        write_table(table, fn)
+    def save_file(fn: PathOrFile, df: Union[pd.DataFrame, pa.Table, pq.ParquetFile], compression: Optional[str] = None):
+        """
+        Save a dataframe, or Arrow-compatible data (see `to_table`), processed directly without using pandas,
+        or a Parquet file, processed a batch at a time
+        The IPC buffers are compressed if `compression` is given, either `lz4` (LZ4_FRAME) or `zstd`
+        NOTE - compressed files need an Arrow reader with support for IPC buffer compression
+        """
+        # NOTE - the df isn't modified, as it may be shared, e.g. by a block rendered concurrently
+        if isinstance(df, pd.DataFrame):
+            write_df(df, fn, compression=compression)
+        elif isinstance(df, pq.ParquetFile):
+            write_parquet(df, fn, compression=compression)
+        elif (table := to_table(df)) is not None:
+            write_table(process_table(table), fn, compression=compression)
+        else:
+            raise ValueError(f"Can't save {type(df).__name__} as an arrow file, expected a DataFrame or Arrow data")
+
+
+# the size of the blocks of a CSV file parsed in parallel
+CSV_BLOCK_SIZE = 4 * SIZE_1_MB
+# text and unseekable file objects are copied to read them more than once, to a temp file if larger than this
+CSV_SPOOL_SIZE = 64 * SIZE_1_MB
+# the values read as missing, and as booleans, by `pd.read_csv`
+CSV_NULL_VALUES = [
+    *("", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN"),
+    *("<NA>", "N/A", "NA", "NULL", "NaN", "n/a", "nan", "null"),
+]
+CSV_TRUE_VALUES = ["True", "TRUE", "true"]
+CSV_FALSE_VALUES = ["False", "FALSE", "false"]
+
+
+def _csv_column_names(names: List[str]) -> List[str]:
+    """The column names given by `pd.read_csv`, i.e. `Unnamed: <i>` if empty, and duplicates renamed `<name>.<n>`"""
+    names = [x or f"Unnamed: {i}" for (i, x) in enumerate(names)]
+    counts: Dict[str, int] = {}
+    for (i, name) in enumerate(names):
+        col = name
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            col = f"{name}.{count}"
+            count = count + 1 if col in names else counts.get(col, 0)
+        names[i] = col
+        counts[col] = count + 1
+    return names
+
+
+def _temporal_columns(schema: pa.Schema) -> Dict[str, pa.DataType]:
+    return {x.name: pa.string() for x in schema if pa.types.is_temporal(x.type)}
+
+
+def _read_csv_arrow(f: Union[str, IO[bytes]], encoding: str = "utf8") -> pd.DataFrame:
+    """
+    Read a CSV file with the multithreaded arrow reader, parsing blocks of the file in parallel,
+    to the same columns and values as `pd.read_csv`
+    NOTE - the whole file is read, rather than streamed, as the streaming reader fixes the column types from its
+    first block, failing on e.g. a float in a column of ints after it, and the file is loaded as a single dataframe
+    """
+    start = None if isinstance(f, str) else f.tell()
+    read_options = pa_csv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE, encoding=encoding)
+
+    def _read(column_types: Dict[str, pa.DataType]) -> pa.Table:
+        if start is not None:
+            f.seek(start)
+        convert_options = pa_csv.ConvertOptions(
+            column_types=column_types,
+            null_values=CSV_NULL_VALUES,
+            true_values=CSV_TRUE_VALUES,
+            false_values=CSV_FALSE_VALUES,
+            strings_can_be_null=True,
+        )
+        return pa_csv.read_csv(f, read_options=read_options, convert_options=convert_options)
+
+    # pandas doesn't parse dates or times, so their columns, found from the first block, are read as strings
+    with pa_csv.open_csv(f, read_options=read_options) as reader:
+        column_types = _temporal_columns(reader.schema)
+    table = _read(column_types)
+    if extra_types := _temporal_columns(table.schema):
+        # i.e. only found after the first block
+        table = _read({**column_types, **extra_types})
+
+    if any(pa.types.is_binary(x.type) for x in table.schema):
+        # text that's invalid in the encoding is read as binary
+        raise UnicodeError(f"CSV file isn't valid {encoding}")
+    table = table.rename_columns(_csv_column_names(table.column_names))
+    # the table is released column by column while converting
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _csv_encoding(guessed: Optional[str]) -> str:
+    """The encoding to read a CSV file with, from its guessed encoding - UTF-8 unless another was detected"""
+    # NOTE - ASCII is guessed when the sample is ASCII, but as a subset of UTF-8 the rest of the file may not be
+    return "utf-8" if guessed is None or guessed.lower() in ("ascii", "utf-8") else guessed
+
+
+@contextmanager
+def _seekable_binary(f: IO) -> Iterator[IO[bytes]]:
+    """
+    A seekable binary file object, as needed to read a file more than once
+    Text and unseekable file objects are copied, held in memory if small, else spooled to a temp file
+    """
+    if not isinstance(f, io.TextIOBase) and f.seekable():
+        yield f
+        return
+    with tempfile.SpooledTemporaryFile(max_size=CSV_SPOOL_SIZE) as out:
+        while chunk := f.read(CSV_BLOCK_SIZE):
+            out.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        out.seek(0)
+        yield out
 
 
 class CSVFormat(DFFormatter):
@@ -71,22 +303,57 @@ class CSVFormat(DFFormatter):
 
     @staticmethod
     def load_file(fn: PathOrFile) -> pd.DataFrame:
-        # TODO - fix
-        if not isinstance(fn, str):
-            raise ValueError("FObj not yet supported")
+        """
+        Load a CSV file, or file object, using the multithreaded arrow reader, guessing the encoding from
+        the start of the file if not UTF-8, and falling back to pandas for files it can't parse
+        """
+        if isinstance(fn, str):
+            return CSVFormat._load(fn)
+        with _seekable_binary(fn) as f:
+            return CSVFormat._load(f)
+
+    @staticmethod
+    def _load(f: Union[str, IO[bytes]]) -> pd.DataFrame:
+        start = 0 if isinstance(f, str) else f.tell()
+
+        def _rewind() -> None:
+            if not isinstance(f, str):
+                f.seek(start)
 
         try:
-            return pd.read_csv(fn, engine="c", sep=",")
-        except UnicodeDecodeError:
-            encoding = guess_encoding(fn)
-            return pd.read_csv(fn, engine="c", sep=",", encoding=encoding)
-        except ParserError as e:
-            log.warning(f"Error parsing CSV file ({e}), trying python fallback")
+            return _read_csv_arrow(f)
+        except (pa.ArrowInvalid, UnicodeError) as e:
+            error = e
+
+        _rewind()
+        encoding = _csv_encoding(guess_encoding(f))
+        if encoding.lower() != "utf-8":
+            _rewind()
+            try:
+                return _read_csv_arrow(f, encoding=encoding)
+            except (pa.ArrowInvalid, UnicodeError) as e:
+                error = e
+
+        def _read_csv_pandas(encoding: str) -> pd.DataFrame:
             try:
-                return pd.read_csv(fn, engine="python", sep=None)
-            except UnicodeDecodeError:
-                encoding = guess_encoding(fn)
-                return pd.read_csv(fn, engine="python", sep=None, encoding=encoding)
+                _rewind()
+                return pd.read_csv(f, engine="c", sep=",", encoding=encoding)
+            except ParserError as e:
+                log.warning(f"Error parsing CSV file ({e}), trying python fallback")
+                _rewind()
+                return pd.read_csv(f, engine="python", sep=None, encoding=encoding)
+
+        log.warning(f"Error parsing CSV file ({error}), trying pandas fallback")
+        try:
+            return _read_csv_pandas(encoding)
+        except UnicodeDecodeError as e:
+            # the start of the file may not be representative, e.g. ASCII before any other characters
+            _rewind()
+            full_encoding = _csv_encoding(guess_encoding(f, sample_size=sys.maxsize))
+            if full_encoding == encoding:
+                raise
+            log.warning(f"Error decoding CSV file as {encoding} ({e}), trying {full_encoding} from the whole file")
+            return _read_csv_pandas(full_encoding)
 
     @staticmethod
     def save_file(fn: PathOrFile, df: pd.DataFrame):
@@ -107,12 +374,73 @@ class ExcelFormat(DFFormatter):
         df.to_excel(fn, index=False, engine="openpyxl")
 
 
+class ParquetFormat(DFFormatter):
+    content_type = MIME("application/vnd.apache.parquet")
+    ext = ".parquet"
+    enum = "PARQUET"
+
+    @staticmethod
+    def load_file(
+        fn: PathOrFile,
+        columns: Optional[List[str]] = None,
+        row_groups: Optional[List[int]] = None,
+        as_table: bool = False,
+    ) -> Union[pd.DataFrame, pa.Table]:
+        """
+        Load a Parquet file, memory-mapped when given a path, only reading the columns and row groups used
+
+        Args:
+            fn: The path or file object
+            columns: Only load these columns, in this order (optional)
+            row_groups: Only load these row groups, by their position in the file (optional)
+            as_table: Return the arrow table, deferring the conversion to pandas
+        """
+        pf = ParquetPath(fn) if isinstance(fn, str) else pq.ParquetFile(fn)
+        if columns is not None and (missing := [c for c in columns if c not in pf.schema_arrow.names]):
+            raise ValueError(f"Columns {missing} not found in the parquet file")
+        if row_groups is not None and (missing := [i for i in row_groups if not 0 <= i < pf.num_row_groups]):
+            raise ValueError(f"Row groups {missing} not found in the parquet file of {pf.num_row_groups}")
+        table = pf.read(columns=columns) if row_groups is None else pf.read_row_groups(row_groups, columns=columns)
+        if columns is not None:
+            table = table.select(columns)
+        if as_table:
+            return table
+
+        df = table.to_pandas()
+        obj_to_str(df)
+        str_to_arrow_str(df)
+        return df
+
+    @staticmethod
+    def save_file(
+        fn: PathOrFile,
+        df: Union[pd.DataFrame, pa.Table],
+        row_group_size: Optional[int] = None,
+        compression: Optional[str] = "snappy",
+    ):
+        """
+        Save a dataframe, or Arrow-compatible data (see `to_table`), as is, without processing
+
+        Args:
+            fn: The path or file object
+            df: The data to save
+            row_group_size: The most rows in each row group, the unit read at a time (default: pyarrow's, 1M rows)
+            compression: The compression codec, e.g. `snappy`, `zstd`, `gzip`, or None
+        """
+        if isinstance(df, pd.DataFrame):
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        elif (table := to_table(df)) is None:
+            raise ValueError(f"Can't save {type(df).__name__} as a parquet file, expected a DataFrame or Arrow data")
+        pq.write_table(table, fn, row_group_size=row_group_size, compression=compression)
+
+
 class DatasetFormats(enum.Enum):
     """Used to switch between the different format handlers"""
 
     CSV = CSVFormat
     EXCEL = ExcelFormat
     ARROW = ArrowFormat
+    PARQUET = ParquetFormat
 
 
 # TODO - make into enums?
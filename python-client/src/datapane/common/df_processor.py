@@ -1,11 +1,27 @@
 import datetime
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, suppress
 from numbers import Number
-from typing import Any
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from packaging.specifiers import SpecifierSet
 from packaging.version import Version
+from pandas.api.extensions import ExtensionDtype
+from pandas.api.types import (
+    infer_dtype,
+    is_bool_dtype,
+    is_categorical_dtype,
+    is_float_dtype,
+    is_integer_dtype,
+    is_object_dtype,
+    is_string_dtype,
+    is_timedelta64_dtype,
+)
 
 PD_VERSION = Version(pd.__version__)
 PD_1_3_GREATER = SpecifierSet(">=1.3.0")
@@ -71,6 +87,9 @@ def parse_categories(data: pd.DataFrame):
 
     def criteria(ser: pd.Series) -> bool:
         """Decides whether to convert into categorical"""
+        if _is_high_cardinality(ser):
+            return False
+
         nunique: int = ser.nunique()
 
         if nunique <= 20 and (nunique != ser.size):
@@ -133,42 +152,595 @@ def str_to_arrow_str(df: pd.DataFrame):
     df[df_str.columns] = df_str.astype("string[pyarrow]")
 
 
-def process_df(df: pd.DataFrame, copy: bool = False) -> pd.DataFrame:
+def _is_category(nunique: int, size: int) -> bool:
+    """Decides whether to convert into categorical, as per `parse_categories`"""
+    if nunique <= 20 and (nunique != size):
+        # few unique values => make it a category regardless of the proportion
+        return True
+    # a lot of redundant information => categories are more compact
+    prop_unique = (nunique + 1) / (size + 1)  # + 1 for nan
+    return prop_unique <= 0.05
+
+
+# columns of at least this many rows are first checked against a sample of every `CATEGORY_SAMPLE_STEP`th row
+CATEGORY_SAMPLE_MIN_ROWS = 100_000
+CATEGORY_SAMPLE_STEP = 16
+
+
+def _is_high_cardinality(ser: pd.Series) -> bool:
+    """
+    Whether a column clearly has too many unique values to be a category, decided from a sample of its rows
+    NOTE - the unique values of the sample are a lower bound of those of the column, so this is exact - it only
+     avoids counting the whole column when the sample alone exceeds the thresholds (e.g. ids or free text),
+     columns near the thresholds are counted in full
+    """
+    if ser.size < CATEGORY_SAMPLE_MIN_ROWS:
+        return False
+    return not _is_category(ser.iloc[::CATEGORY_SAMPLE_STEP].nunique(), ser.size)
+
+
+def _downcast_int_dtype(ser: pd.Series) -> str:
+    """The smallest nullable int dtype holding the values, unsigned if possible, as per `downcast_numbers`"""
+    return _int_dtype_for(ser.min(), ser.max())
+
+
+def _int_dtype_for(lo: Any, hi: Any) -> str:
+    if pd.isna(lo):
+        # empty, or all NA
+        (lo, hi) = (0, 0)
+    if lo >= 0:
+        return next(x for x in ("UInt8", "UInt16", "UInt32", "UInt64") if hi <= np.iinfo(x.lower()).max)
+    return next(
+        (x for x in ("Int8", "Int16", "Int32") if lo >= np.iinfo(x.lower()).min and hi <= np.iinfo(x.lower()).max),
+        "Int64",
+    )
+
+
+_float_dtypes = {np.dtype("float32"): "Float32", np.dtype("float64"): "Float64"}
+
+
+def _is_integral(values: np.ndarray) -> bool:
+    """If the (float) values can be held as ints, as per `convert_dtypes`"""
+
+    def _check(x: np.ndarray) -> bool:
+        x = x[~np.isnan(x)]
+        with np.errstate(invalid="ignore"):
+            return bool((x.astype(np.int64) == x).all())
+
+    # most float columns can be ruled out from the first few values
+    return _check(values[:1024]) and _check(values)
+
+
+# The conversion of a column, decided from all its values, to apply to the rows selected by a slice
+ColumnPlan = Callable[[slice], pd.Series]
+
+
+def _slice(ser: pd.Series) -> ColumnPlan:
+    return lambda s: ser.iloc[s]
+
+
+def _astype(ser: pd.Series, dtype: Any) -> ColumnPlan:
+    return lambda s: ser.iloc[s].astype(dtype)
+
+
+def _plan_number(ser: pd.Series) -> ColumnPlan:
+    dtype = ser.dtype
+    if not len(ser):
+        return _slice(ser.convert_dtypes())
+    if is_float_dtype(dtype):
+        # only numpy floats holding ints are converted to ints
+        if isinstance(dtype, ExtensionDtype):
+            return _slice(ser)
+        elif not _is_integral(ser.to_numpy()):
+            # float downcasting currently disabled - alters values and rounds to 'inf' instead of erroring
+            return _astype(ser, _float_dtypes[dtype]) if dtype in _float_dtypes else _slice(ser.convert_dtypes())
+    return _astype(ser, _downcast_int_dtype(ser))
+
+
+def _format_timedeltas(ser: pd.Series, even_days: bool) -> pa.Array:
+    """
+    Vectorised version of pandas' string formatting of a timedelta column, with NaT as null,
+    e.g. `-1 days +23:59:57.500000`, or `2 days` if all values in the column are whole days
+    """
+    ns = ser.to_numpy(dtype="timedelta64[ns]").view(np.int64)
+    is_null = pa.array(ser.isna().to_numpy())
+    (days, rem) = np.divmod(ns, 86400 * 10**9)
+    days_str = pc.cast(pa.array(days), pa.string())
+    if even_days:
+        return pc.if_else(is_null, pa.scalar(None, pa.string()), pc.binary_join_element_wise(days_str, " days", ""))
+
+    (secs, sub_secs) = np.divmod(rem, 10**9)
+    (sub_us, sub_ns) = np.divmod(sub_secs, 1000)
+
+    def _pad(x: np.ndarray, width: int) -> pa.Array:
+        return pc.utf8_lpad(pc.cast(pa.array(x), pa.string()), width, "0")
+
+    frac = pc.if_else(
+        pa.array(sub_secs > 0),
+        pc.binary_join_element_wise(".", _pad(sub_us, 6), pc.if_else(pa.array(sub_ns > 0), _pad(sub_ns, 3), ""), ""),
+        "",
+    )
+    out = pc.binary_join_element_wise(
+        days_str,
+        pa.array(np.where(ns < 0, " days +", " days ")),
+        _pad(secs // 3600, 2),
+        ":",
+        _pad(secs // 60 % 60, 2),
+        ":",
+        _pad(secs % 60, 2),
+        frac,
+        "",
+    )
+    return pc.if_else(is_null, pa.scalar(None, pa.string()), out)
+
+
+def _plan_timedelta(ser: pd.Series) -> ColumnPlan:
+    """Timedeltas are stored as strings - NOTE - only until arrow.js supports Duration type"""
+    uniques = pd.Index(pd.unique(ser)).dropna()
+    if not len(uniques):
+        return _slice(_process_column(pd.Series(pd.NA, index=ser.index, dtype=object)))
+
+    even_days = not (uniques.asi8 % (86400 * 10**9)).any()
+    # the formatted strings are unique iff the timedeltas are, so only the unique values are formatted
+    if _is_category(len(uniques), ser.size):
+        categories = pd.Index(_format_timedeltas(uniques.to_series(), even_days).to_numpy(zero_copy_only=False))
+        dtype = pd.CategoricalDtype(categories.sort_values().astype("string"))
+        return lambda s: pd.Series(
+            _format_timedeltas(ser.iloc[s], even_days).to_numpy(zero_copy_only=False), index=ser.index[s]
+        ).astype(dtype)
+    return lambda s: pd.Series(
+        pd.arrays.ArrowStringArray(_format_timedeltas(ser.iloc[s], even_days)), index=ser.index[s]
+    )
+
+
+def _plan_str(ser: pd.Series) -> ColumnPlan:
+    """Strings (or python objects of strings) to categories or arrow strings"""
+    if _is_high_cardinality(ser):
+        return _astype(ser, "string[pyarrow]")
+    uniques = pd.Index(pd.unique(ser)).dropna()
+    if _is_category(len(uniques), ser.size):
+        categories = uniques.sort_values()
+        if categories.dtype == np.dtype("object"):
+            categories = categories.astype("string")
+        return _astype(ser, pd.CategoricalDtype(categories))
+    return _astype(ser, "string[pyarrow]")
+
+
+def _process_category(ser: pd.Series) -> pd.Series:
+    if ser.cat.categories.dtype == np.dtype("object"):
+        return ser.cat.rename_categories(ser.cat.categories.astype("string"))
+    return ser
+
+
+def _plan_object(ser: pd.Series) -> ColumnPlan:
+    if infer_dtype(ser, skipna=True) == "string":
+        return _plan_str(ser)
+
+    # otherwise the type depends on the mix of values, so the whole column is converted
+    ser = ser.convert_dtypes()
+    if is_integer_dtype(ser.dtype):
+        return _astype(ser, _downcast_int_dtype(ser))
+    elif is_object_dtype(ser.dtype) or is_string_dtype(ser.dtype):
+        # mixed types are stored as their string representation
+        return _plan_str(ser.astype("string"))
+    return _slice(ser)
+
+
+def _plan_column(ser: pd.Series) -> ColumnPlan:
+    """Decide the storage type of a column, returning its conversion in as few steps as possible"""
+    dtype = ser.dtype
+
+    if is_timedelta64_dtype(dtype):
+        return _plan_timedelta(ser)
+    elif is_categorical_dtype(dtype):
+        return lambda s: _process_category(ser.iloc[s])
+    elif is_bool_dtype(dtype):
+        return _astype(ser, "boolean")
+    elif is_integer_dtype(dtype) or is_float_dtype(dtype):
+        # NOTE - timedeltas are handled above, as a downcast timedelta64[ns] is an int <ns> and hard to understand
+        return _plan_number(ser)
+    elif is_string_dtype(dtype) and not is_object_dtype(dtype):
+        return _plan_str(ser)
+    elif is_object_dtype(dtype):
+        return _plan_object(ser)
+    return _slice(ser)
+
+
+def _process_column(ser: pd.Series) -> pd.Series:
+    return _plan_column(ser)(slice(None))
+
+
+# the default number of threads used to process the columns of large dataframes,
+# bounded as the gains flatten out, and to not oversubscribe large hosts running other work
+MAX_DEFAULT_THREADS = 8
+process_threads: int = min(os.cpu_count() or 1, MAX_DEFAULT_THREADS)
+# dataframes with fewer cells are processed on the calling thread
+PARALLEL_MIN_CELLS = 1_000_000
+
+T = TypeVar("T")
+R = TypeVar("R")
+ColumnMapper = Callable[[Callable[[T], R], Sequence[T]], List[R]]
+
+
+def set_process_threads(n: int) -> None:
+    """Set the default number of threads used to process the columns of large dataframes, use 1 to disable"""
+    global process_threads
+    if n < 1:
+        raise ValueError("At least 1 thread is needed")
+    process_threads = n
+
+
+@contextmanager
+def _column_mapper(shape: Tuple[int, int], threads: Optional[int]) -> Iterator[ColumnMapper]:
+    """
+    Map a function over the columns of a dataframe (or table) of the given shape, in a thread pool if large
+    NOTE - numpy casts and reductions, hashing of non-object values, and the arrow conversions release the GIL
+    """
+    (n_rows, n_columns) = shape
+    threads = min(threads or process_threads, n_columns)
+    if threads <= 1 or n_rows * n_columns < PARALLEL_MIN_CELLS:
+        yield lambda f, xs: [f(x) for x in xs]
+    else:
+        with ThreadPoolExecutor(threads, thread_name_prefix="dp-process-df") as executor:
+            yield lambda f, xs: list(executor.map(f, xs))
+
+
+def process_df(df: pd.DataFrame, copy: bool = False, threads: Optional[int] = None) -> pd.DataFrame:
     """
     Processing steps needed before writing / after reading
     We only modify the dataframe to optimise size,
     rather than convert/infer types, e.g. no longer parsing dates from strings
 
-    NOTE - this mutates the dataframe by default but returns it - use the returned copy!
+    Each column is converted in a single pass, with the same results as running
+    `convert_axis`, `timedelta_to_str`, `convert_dtypes`, `downcast_numbers`, `obj_to_str`,
+    `parse_categories` and `str_to_arrow_str` in turn
+
+    Columns of large dataframes are processed in parallel, over `threads` threads (default: `process_threads`)
+
+    NOTE - this mutates the dataframe axes by default but returns a new dataframe - use the returned copy!
     """
     if copy:
-        df = df.copy(deep=True)
+        # the column data isn't modified, so only the axes need copying
+        df = df.copy(deep=False)
 
     convert_axis(df)
 
-    # convert timedelta
-    timedelta_to_str(df)
+    with _column_mapper(df.shape, threads) as map_columns:
+        columns = map_columns(_process_column, [df.iloc[:, i] for i in range(df.shape[1])])
+    out = pd.DataFrame(dict(enumerate(columns)), index=df.index, copy=False)
+    # NOTE - the column labels are strings, but held in an object index, as when built by `convert_dtypes`
+    out.columns = df.columns.astype(object)
+    return out
+
 
-    # NOTE - pandas >= 1.3 handles downcasting of nullable values correctly
-    df = df.convert_dtypes()
-    downcast_numbers(df)
+# the approximate (in-memory) size of the rows of each record batch
+BATCH_BYTES = 64 * 1024 * 1024
 
-    # save timedeltas cols (unneeded whilst timedelta_to_str used)
-    # td_col = df.select_dtypes("timedelta")
-    # df[td_col.columns] = td_col
-    obj_to_str(df)
-    parse_categories(df)
 
-    # convert all strings to use the arrow dtype
-    str_to_arrow_str(df)
+def _to_array(ser: pd.Series, typ: pa.DataType) -> pa.Array:
+    arr = pa.array(ser, type=typ, from_pandas=True)
+    # arrow-backed columns convert to chunked arrays
+    return arr.combine_chunks() if isinstance(arr, pa.ChunkedArray) else arr
 
-    return df
 
+def process_df_batches(
+    df: pd.DataFrame, batch_rows: Optional[int] = None, threads: Optional[int] = None
+) -> Tuple[pa.Schema, Iterator[pa.RecordBatch]]:
+    """
+    Process the dataframe into arrow record batches, of `batch_rows` rows (or around `BATCH_BYTES` in size),
+    with the same types and values as `pa.Table.from_pandas(process_df(df, copy=True))`
 
-def to_df(value: Any) -> pd.DataFrame:
+    The type of each column is decided up front from all its values, then the rows are converted a batch at a time,
+    so only the current batch is held in memory. The columns of large dataframes are planned, and each batch
+    converted, in parallel over `threads` threads (default: `process_threads`)
+
+    NOTE - the input dataframe is not modified
+    """
+    df = df.copy(deep=False)
+    convert_axis(df)
+    with _column_mapper(df.shape, threads) as map_columns:
+        plans = map_columns(_plan_column, [df.iloc[:, i] for i in range(df.shape[1])])
+
+    # the pandas schema metadata is built from the empty processed columns
+    df_head = pd.DataFrame({i: p(slice(0, 0)) for (i, p) in enumerate(plans)}, index=df.index[:0])
+    df_head.columns = df.columns.astype(object)
+    schema = pa.Schema.from_pandas(df_head, preserve_index=False)
+
+    n_rows = len(df)
+    if batch_rows is None:
+        row_bytes = df.memory_usage(index=False).sum() / max(n_rows, 1)
+        batch_rows = max(1024, int(BATCH_BYTES / max(row_bytes, 1)))
+
+    def _batches() -> Iterator[pa.RecordBatch]:
+        with _column_mapper(df.shape, threads) as map_columns:
+            # NOTE - an empty dataframe results in a single empty batch
+            for start in range(0, max(n_rows, 1), batch_rows):
+                rows = slice(start, start + batch_rows)
+                arrays = map_columns(lambda x: _to_array(x[0](rows), x[1].type), list(zip(plans, schema)))
+                yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    return (schema, _batches())
+
+
+def process_df_to_table(df: pd.DataFrame, threads: Optional[int] = None) -> pa.Table:
+    """
+    Process the dataframe into an arrow table, as `pa.Table.from_pandas(process_df(df, copy=True))`,
+    converting a column at a time so that only a single processed column is held in pandas at once
+
+    NOTE - the input dataframe is not modified
+    """
+    (schema, batches) = process_df_batches(df, batch_rows=max(len(df), 1), threads=threads)
+    return pa.Table.from_batches(batches, schema=schema)
+
+
+################################################################################
+# Arrow-native processing
+def _downcast_int_type(arr: pa.ChunkedArray) -> pa.DataType:
+    """The smallest int type holding the values, unsigned if possible, as per `_downcast_int_dtype`"""
+    min_max = pc.min_max(arr)
+    dtype = _int_dtype_for(min_max["min"].as_py(), min_max["max"].as_py())
+    return pa.from_numpy_dtype(np.dtype(dtype.lower()))
+
+
+def _category_index_type(categories: pa.Array) -> pa.DataType:
+    """The smallest index type for the categories, as per pandas categoricals"""
+    return next(
+        (x for x in (pa.int8(), pa.int16(), pa.int32()) if len(categories) < np.iinfo(x.to_pandas_dtype()).max),
+        pa.int64(),
+    )
+
+
+def _encode_chunk(arr: pa.Array, categories: pa.Array, index_type: pa.DataType) -> pa.DictionaryArray:
+    return pa.DictionaryArray.from_arrays(pc.cast(pc.index_in(arr, value_set=categories), index_type), categories)
+
+
+def _dictionary_encode(arr: pa.ChunkedArray, categories: pa.Array) -> pa.ChunkedArray:
+    """Encode the values against the categories, using the smallest index type, as per pandas categoricals"""
+    index_type = _category_index_type(categories)
+    # NOTE - every chunk shares the same dictionary, as needed to write them as batches of an arrow file
+    chunks = [_encode_chunk(c, categories, index_type) for c in arr.chunks]
+    return pa.chunked_array(chunks, type=pa.dictionary(index_type, categories.type))
+
+
+def _sorted_categories(uniques: pa.Array) -> pa.Array:
+    return pc.cast(uniques.take(pc.sort_indices(uniques)), pa.string())
+
+
+def _process_str_array(arr: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Strings to categories or strings, as per `_plan_str`"""
+    n = len(arr)
+    if n < CATEGORY_SAMPLE_MIN_ROWS or _is_category(pc.count_distinct(arr[::CATEGORY_SAMPLE_STEP]).as_py(), n):
+        uniques = pc.unique(arr).drop_null()
+        if _is_category(len(uniques), n):
+            return _dictionary_encode(arr, _sorted_categories(uniques))
+    return pc.cast(arr, pa.string())
+
+
+# types the frontend supports as is
+_arrow_passthrough_types = (pa.types.is_null, pa.types.is_boolean, pa.types.is_timestamp, pa.types.is_date)
+
+
+def _process_array(arr: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Process an arrow column with the equivalent conversions to `_process_column`"""
+    typ = arr.type
+    if pa.types.is_integer(typ):
+        return pc.cast(arr, _downcast_int_type(arr))
+    elif pa.types.is_floating(typ):
+        # floats holding ints (without NaNs) are converted to ints
+        with suppress(pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            if len(arr):
+                ints = pc.cast(arr, pa.int64())
+                return pc.cast(ints, _downcast_int_type(ints))
+        return arr
+    elif pa.types.is_string(typ) or pa.types.is_large_string(typ):
+        return _process_str_array(arr)
+    elif pa.types.is_dictionary(typ) or any(f(typ) for f in _arrow_passthrough_types):
+        return arr
+    # otherwise, e.g. durations and nested values, the column is converted via pandas
+    return pa.chunked_array([pa.array(_process_column(arr.to_pandas()), from_pandas=True)])
+
+
+def process_table(table: pa.Table, threads: Optional[int] = None) -> pa.Table:
+    """
+    Process an arrow table for the frontend, with the equivalent conversions to `process_df` run with
+    `pyarrow.compute` rather than via pandas. Columns that don't need converting are kept as is, without copying
+    """
+    # NOTE - any pandas metadata no longer matches the converted types
+    table = table.unify_dictionaries().replace_schema_metadata(None)
+    with _column_mapper(table.shape, threads) as map_columns:
+        columns = map_columns(_process_array, table.columns)
+    return pa.Table.from_arrays(columns, names=[str(x) for x in table.column_names])
+
+
+################################################################################
+# Streamed processing, a record batch at a time
+class _StreamPlan:
+    """
+    The conversion of an arrow column, as per `_process_array`, decided by updating it with every batch of
+    the column in turn, and then applied to each batch. The base plan keeps the column as is
+    """
+
+    def update(self, arr: pa.Array) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+    def convert(self, arr: pa.Array) -> pa.Array:
+        return arr
+
+
+class _IntStreamPlan(_StreamPlan):
+    def __init__(self):
+        self.lo: Optional[int] = None
+        self.hi: Optional[int] = None
+
+    def update(self, arr: pa.Array) -> None:
+        min_max = pc.min_max(arr)
+        (lo, hi) = (min_max["min"].as_py(), min_max["max"].as_py())
+        if lo is not None:
+            self.lo = lo if self.lo is None else min(self.lo, lo)
+            self.hi = hi if self.hi is None else max(self.hi, hi)
+
+    def finish(self) -> None:
+        self.type = pa.from_numpy_dtype(np.dtype(_int_dtype_for(self.lo, self.hi).lower()))
+
+    def convert(self, arr: pa.Array) -> pa.Array:
+        return pc.cast(arr, self.type)
+
+
+class _FloatStreamPlan(_IntStreamPlan):
+    def __init__(self):
+        super().__init__()
+        self.integral = True
+        self.n_rows = 0
+
+    def update(self, arr: pa.Array) -> None:
+        self.n_rows += len(arr)
+        if self.integral:
+            try:
+                super().update(pc.cast(arr, pa.int64()))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                self.integral = False
+
+    def finish(self) -> None:
+        # floats holding ints (without NaNs) are converted to ints
+        self.integral = self.integral and self.n_rows > 0
+        if self.integral:
+            super().finish()
+
+    def convert(self, arr: pa.Array) -> pa.Array:
+        return super().convert(pc.cast(arr, pa.int64())) if self.integral else arr
+
+
+class _StrStreamPlan(_StreamPlan):
+    def __init__(self, n_rows: int):
+        self.n_rows = n_rows
+        # the unique values so far, until there are too many to be categories
+        self.uniques: Optional[pa.Array] = pa.array([], type=pa.string())
+        self.categories: Optional[pa.Array] = None
+
+    def update(self, arr: pa.Array) -> None:
+        if self.uniques is not None:
+            new = pc.unique(pc.cast(arr, pa.string())).drop_null()
+            uniques = pc.unique(pa.concat_arrays([self.uniques, new]))
+            n = len(uniques)
+            # once there are too many unique values to be categories (see `_is_category`), there always will be
+            self.uniques = uniques if n <= 20 or _is_category(n, self.n_rows) else None
+
+    def finish(self) -> None:
+        if self.uniques is not None and _is_category(len(self.uniques), self.n_rows):
+            self.categories = _sorted_categories(self.uniques)
+            self.index_type = _category_index_type(self.categories)
+        self.uniques = None
+
+    def convert(self, arr: pa.Array) -> pa.Array:
+        arr = pc.cast(arr, pa.string())
+        # NOTE - every batch shares the same dictionary, as needed to write them to an arrow file
+        return arr if self.categories is None else _encode_chunk(arr, self.categories, self.index_type)
+
+
+def _plan_stream(typ: pa.DataType, n_rows: int) -> Optional[_StreamPlan]:
+    """The plan to process a column a batch at a time, or None if it's processed as a whole column"""
+    if pa.types.is_integer(typ):
+        return _IntStreamPlan()
+    elif pa.types.is_floating(typ):
+        return _FloatStreamPlan()
+    elif pa.types.is_string(typ) or pa.types.is_large_string(typ):
+        return _StrStreamPlan(n_rows)
+    elif any(f(typ) for f in _arrow_passthrough_types):
+        return _StreamPlan()
+    return None
+
+
+def process_batch_stream(
+    schema: pa.Schema,
+    n_rows: int,
+    read_batches: Callable[[List[str]], Iterable[pa.RecordBatch]],
+    read_columns: Callable[[List[str]], pa.Table],
+    threads: Optional[int] = None,
+) -> Tuple[pa.Schema, Iterator[pa.RecordBatch]]:
+    """
+    Process arrow data read a batch at a time, e.g. the row groups of a Parquet file, with the same conversions as
+    `process_table`, without holding all the data in memory.
+
+    The batches are read twice, firstly to decide the type of each column, e.g. the ints' range or the categories,
+    and then lazily, when the returned batches are consumed, to convert them. Columns that can't be converted
+    a batch at a time, e.g. dictionaries, durations and nested values, are read and processed as whole columns.
+
+    Args:
+        schema: The schema of the data
+        n_rows: The number of rows in the data
+        read_batches: Reads the batches of the given columns, in order
+        read_columns: Reads the given columns as a whole
+        threads: Process the columns over this many threads (default: `process_threads`)
+    """
+    names = schema.names
+    plans = {i: p for (i, f) in enumerate(schema) if (p := _plan_stream(f.type, n_rows)) is not None}
+    streamed = [names[i] for i in plans]
+    shape = (n_rows, len(names))
+
+    whole = [i for i in range(len(names)) if i not in plans]
+    columns = {}
+    if whole:
+        table = process_table(read_columns([names[i] for i in whole]), threads=threads)
+        columns = dict(zip(whole, table.columns))
+
+    with _column_mapper(shape, threads) as map_columns:
+        if streamed:
+            for batch in read_batches(streamed):
+                map_columns(lambda x: x[0].update(x[1]), list(zip(plans.values(), batch.columns)))
+        for p in plans.values():
+            p.finish()
+
+    types = {i: p.convert(pa.array([], type=schema.field(i).type)).type for (i, p) in plans.items()}
+    # NOTE - any pandas metadata no longer matches the converted types
+    out_schema = pa.schema([(x, types[i] if i in plans else columns[i].type) for (i, x) in enumerate(names)])
+
+    def _batches() -> Iterator[pa.RecordBatch]:
+        offset = 0
+        with _column_mapper(shape, threads) as map_columns:
+            for batch in read_batches(streamed):
+                arrays = dict(zip(plans, batch.columns))
+
+                def _convert(i: int) -> pa.Array:
+                    if i in plans:
+                        return plans[i].convert(arrays[i])
+                    return columns[i].slice(offset, batch.num_rows).combine_chunks()
+
+                yield pa.RecordBatch.from_arrays(map_columns(_convert, range(len(names))), schema=out_schema)
+                offset += batch.num_rows
+
+    return (out_schema, _batches())
+
+
+def to_table(value: Any) -> Optional[pa.Table]:
+    """
+    Converts Arrow-compatible data to an arrow table, without copying, or None if it isn't Arrow-compatible, i.e.
+    arrow tables, record batches and streams, polars dataframes, and objects exporting the Arrow PyCapsule stream
+    NOTE - streams are read in full
+    """
+    if isinstance(value, pd.DataFrame):
+        # converted via `to_df`, even if exporting the Arrow PyCapsule stream
+        return None
+    if isinstance(value, pa.Table):
+        return value
+    if isinstance(value, pa.RecordBatch):
+        return pa.Table.from_batches([value])
+    if isinstance(value, pa.RecordBatchReader):
+        return value.read_all()
+    if hasattr(value, "__arrow_c_stream__") and hasattr(pa.RecordBatchReader, "from_stream"):
+        return pa.RecordBatchReader.from_stream(value).read_all()
+    if type(value).__module__.split(".")[0] == "polars" and hasattr(value, "to_arrow"):
+        # polars versions without the PyCapsule interface
+        return value.to_arrow()
+    return None
+
+
+def to_df(value: Any, copy: bool = True) -> pd.DataFrame:
     """
     Converts a python object, i.e. a app's output, to a dataframe
-    NOTE - this returns a new DF each time
+    NOTE - this returns a new DF each time, for dataframes this is a shallow copy sharing the data if not `copy`
     """
     if value is None:
         # This return the empty dataframe, which atm is the same as
@@ -177,7 +749,7 @@ def to_df(value: Any) -> pd.DataFrame:
         return pd.DataFrame()
 
     if isinstance(value, pd.DataFrame):
-        return value.copy(deep=True)
+        return value.copy(deep=copy)
 
     if isinstance(value, (pd.Series, pd.Index)):
         if value.name is not None:
@@ -0,0 +1,132 @@
+"""
+JSON serialisation used when writing reports
+
+Uses orjson when installed, falling back to the stdlib `json` module.
+Both backends produce compact UTF-8 output, and handle numpy arrays and scalars,
+and dates / datetimes (as ISO 8601 strings).
+Non-finite floats (NaN / Infinity), which aren't valid JSON, are written as `null` by both.
+"""
+from __future__ import annotations
+
+import datetime
+import json
+import math
+import sys
+import typing as t
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(o: t.Any) -> t.Any:
+    """Fallback for types not handled natively by the backend"""
+    # NOTE - numpy is only checked if already imported, as any numpy objects would have imported it
+    if np := sys.modules.get("numpy"):
+        if isinstance(o, np.ndarray):
+            return o.tolist()
+        elif isinstance(o, np.generic):
+            return o.item()
+    if isinstance(o, (datetime.date, datetime.time)):
+        return o.isoformat()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def _finite(o: t.Any) -> t.Any:
+    """Copy of `o` with non-finite floats replaced by None, as orjson does"""
+    if isinstance(o, float):
+        return o if math.isfinite(o) else None
+    elif isinstance(o, dict):
+        return {k: _finite(v) for k, v in o.items()}
+    elif isinstance(o, (list, tuple)):
+        return [_finite(x) for x in o]
+    elif o is None or isinstance(o, (str, int)):
+        return o
+    try:
+        return _finite(_default(o))
+    except TypeError:
+        # let the encoder report it
+        return o
+
+
+class JSONBackend(t.Protocol):
+    name: str
+
+    def dumpb(self, obj: t.Any) -> bytes:
+        ...
+
+    def loads(self, s: t.Union[str, bytes]) -> t.Any:
+        ...
+
+
+class StdlibBackend:
+    name = "json"
+    _encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, allow_nan=False, default=_default)
+
+    def dumpb(self, obj: t.Any) -> bytes:
+        try:
+            return self._encoder.encode(obj).encode("utf-8")
+        except ValueError as e:
+            if not str(e).startswith("Out of range float values"):
+                raise
+        # NOTE - only copied when needed, as the stdlib has no hook for float encoding
+        return self._encoder.encode(_finite(obj)).encode("utf-8")
+
+    def loads(self, s: t.Union[str, bytes]) -> t.Any:
+        return json.loads(s)
+
+
+class OrjsonBackend:
+    name = "orjson"
+
+    def __init__(self):
+        self._option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumpb(self, obj: t.Any) -> bytes:
+        try:
+            return orjson.dumps(obj, default=_default, option=self._option)
+        except TypeError as e:
+            error = e
+        # e.g. non-contiguous numpy arrays, or ints over 64 bits, are supported by the stdlib backend
+        try:
+            return StdlibBackend().dumpb(obj)
+        except (TypeError, ValueError):
+            # otherwise the type isn't supported by either, so report the original error
+            raise error from None
+
+    def loads(self, s: t.Union[str, bytes]) -> t.Any:
+        return orjson.loads(s)
+
+
+_backends: t.Dict[str, t.Callable[[], JSONBackend]] = {"json": StdlibBackend}
+if orjson is not None:
+    _backends["orjson"] = OrjsonBackend
+
+backend: JSONBackend = OrjsonBackend() if orjson is not None else StdlibBackend()
+
+
+def set_json_backend(name: str) -> None:
+    """Select the JSON backend, i.e. `orjson` or `json`"""
+    global backend
+    try:
+        backend = _backends[name]()
+    except KeyError:
+        raise ValueError(f"JSON backend {name} not available, choose from {list(_backends)}") from None
+
+
+def dumpb(obj: t.Any) -> bytes:
+    """Serialise to UTF-8 encoded JSON"""
+    return backend.dumpb(obj)
+
+
+def dumps(obj: t.Any) -> str:
+    return backend.dumpb(obj).decode("utf-8")
+
+
+def dump(obj: t.Any, f: t.BinaryIO) -> None:
+    f.write(backend.dumpb(obj))
+
+
+def loads(s: t.Union[str, bytes]) -> t.Any:
+    return backend.loads(s)
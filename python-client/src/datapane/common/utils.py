@@ -1,16 +1,18 @@
+import functools
 import locale
 import logging
 import mimetypes
 import re
 import sys
 import typing as t
+from contextlib import nullcontext
 from pathlib import Path
 
 import chardet
 import importlib_resources as ir
 from chardet.universaldetector import UniversalDetector
 
-from .dp_types import MIME
+from .dp_types import MIME, SIZE_1_MB
 
 log = logging.getLogger("datapane")
 
@@ -20,7 +22,13 @@ ON_WINDOWS = sys.platform == "win32"
 
 ################################################################################
 # MIME-type handling
-mimetypes.init(files=[str(ir.files("datapane.resources") / "mime.types")])
+
+
+@functools.lru_cache(maxsize=None)
+def _init_mimetypes() -> None:
+    # loaded on first use, as reads the system and datapane mime.types files
+    mimetypes.init(files=[str(ir.files("datapane.resources") / "mime.types")])
+
 
 # TODO - hardcode as temporary fix until mimetypes double extension issue is sorted
 _double_ext_map = {
@@ -42,19 +50,32 @@ def guess_type(filename: Path) -> MIME:
     ext = "".join(filename.suffixes)
     if ext in double_ext_map.keys():
         return double_ext_map[ext]
+    _init_mimetypes()
     mtype: str
     mtype, _ = mimetypes.guess_type(str(filename))
     return MIME(mtype or "application/octet-stream")
 
 
-def guess_encoding(fn: str) -> str:
-    with open(fn, "rb") as f:
-        detector = UniversalDetector()
-        for line in f.readlines():
-            detector.feed(line)
-            if detector.done:
+# the most of a file read to guess its encoding
+ENCODING_SAMPLE_SIZE = SIZE_1_MB
+
+
+def guess_encoding(fn: t.Union[str, t.BinaryIO], sample_size: int = ENCODING_SAMPLE_SIZE) -> t.Optional[str]:
+    """
+    Guess the encoding of a file from (at most) its first `sample_size` bytes
+    NOTE - file objects are read from their current position, which is restored afterwards
+    """
+    detector = UniversalDetector()
+    with open(fn, "rb") if isinstance(fn, str) else nullcontext(fn) as f:
+        start = f.tell()
+        while sample_size > 0 and not detector.done:
+            chunk = f.read(min(sample_size, 64 * 1024))
+            if not chunk:
                 break
-        detector.close()
+            detector.feed(chunk)
+            sample_size -= len(chunk)
+        f.seek(start)
+    detector.close()
     return detector.result["encoding"]
 
 
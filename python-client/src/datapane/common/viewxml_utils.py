@@ -1,7 +1,8 @@
 import dataclasses as dc
-import json
+import functools
 import math
 import re
+import threading
 import typing as t
 from collections.abc import Sized
 from numbers import Number
@@ -12,15 +13,40 @@ from lxml.etree import DocumentInvalid
 from lxml.etree import _Element as ElementT
 from micawber import ProviderException, bootstrap_basic, bootstrap_noembed, cache
 
+from . import json_utils
 from .dp_types import HTML, DPError, SSDict, log
 
 local_view_resources = ir.files("datapane.resources.view_resources")
-rng_validator = etree.RelaxNG(file=str(local_view_resources / "full_schema.rng"))
 
 dp_namespace: str = "https://datapane.com/schemas/report/1/"
 ViewXML = str
 
 
+_thread_local = threading.local()
+
+
+@functools.lru_cache(maxsize=None)
+def _rng_schema_doc() -> etree._ElementTree:
+    return etree.parse(str(local_view_resources / "full_schema.rng"))
+
+
+def get_rng_validator() -> etree.RelaxNG:
+    """RelaxNG validator for the view schema, compiled on first use within each thread
+
+    NOTE - validators hold their error log, so aren't shared between threads
+    """
+    if (validator := getattr(_thread_local, "rng_validator", None)) is None:
+        validator = _thread_local.rng_validator = etree.RelaxNG(_rng_schema_doc())
+    return validator
+
+
+def __getattr__(name: str) -> t.Any:
+    # backwards-compatibility for the previous module-level validator
+    if name == "rng_validator":
+        return get_rng_validator()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def load_doc(x: str) -> ElementT:
     parser = etree.XMLParser(strip_cdata=False, recover=True, remove_blank_text=True, remove_comments=True)
     return etree.fromstring(x, parser=parser)
@@ -39,6 +65,7 @@ def validate_view_doc(
     if xml_str:
         xml_doc = etree.fromstring(xml_str)
 
+    rng_validator = get_rng_validator()
     try:
         rng_validator.assertValid(xml_doc)
         return True
@@ -71,7 +98,7 @@ def conv_attrib(v: t.Any) -> t.Optional[str]:
         else:
             return str(v)
     else:
-        return json.dumps(v)
+        return json_utils.dumps(v)
 
 
 def mk_attribs(**attribs: t.Any) -> SSDict:
@@ -4,6 +4,7 @@ import io
 import json
 import os
 import sys
+import threading
 import typing as t
 from functools import cached_property
 from pathlib import Path
@@ -20,14 +21,18 @@ __all__ = ("get_environment",)
 
 
 _env = None
+_env_lock = threading.Lock()
 
 
 def get_environment() -> PythonEnvironment:
     """Returns the current IPython environment"""
     global _env
     if _env is None:
-        _env = _get_environment()
-        log.info("Detected IPython environment: %s", _env.name)
+        with _env_lock:
+            if _env is None:
+                env = _get_environment()
+                log.info("Detected IPython environment: %s", env.name)
+                _env = env
     return _env
 
 
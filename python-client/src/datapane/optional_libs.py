@@ -1,9 +1,18 @@
 """
 Dynamic handling for optional libraries - this module is imported on demand
+
+Libraries are only detected here (without importing them), support for their objects, e.g. asset writers and
+block converters, is registered lazily on the first use of an object from that library via `load_for`
 """
 # flake8: noqa:F811 isort:skip_file
 from __future__ import annotations
 
+import sys
+import threading
+import typing as t
+from collections import defaultdict
+from importlib.util import find_spec
+
 from packaging import version as v
 from packaging.specifiers import SpecifierSet
 
@@ -22,47 +31,63 @@ def _check_version(name: str, _v: v.Version, ss: SpecifierSet):
         )
 
 
-# Optional Plotting library import handling
-# Matplotlib
-try:
-    from matplotlib.figure import Axes, Figure
-    from numpy import ndarray
-
-    HAVE_MATPLOTLIB = True
-except ImportError:
-    log.debug("No matplotlib found")
-    HAVE_MATPLOTLIB = False
-
-# Folium
-try:
-    import folium
-    from folium import Map
-
-    _check_version("Folium", v.Version(folium.__version__), FOLIUM_V_SPECIFIER)
-    HAVE_FOLIUM = True
-except ImportError:
-    HAVE_FOLIUM = False
-    log.debug("No folium found")
-
-# Bokeh
-try:
-    import bokeh
-    from bokeh.layouts import LayoutDOM as BLayout
-    from bokeh.plotting.figure import Figure as BFigure
-
-    _check_version("Bokeh", v.Version(bokeh.__version__), BOKEH_V_SPECIFIER)
-    HAVE_BOKEH = True
-except ImportError:
-    HAVE_BOKEH = False
-    log.debug("No Bokeh Found")
-
-# Plotly
-try:
-    import plotly
-    from plotly.graph_objects import Figure as PFigure
-
-    _check_version("Plotly", v.Version(plotly.__version__), PLOTLY_V_SPECIFIER)
-    HAVE_PLOTLY = True
-except ImportError:
-    HAVE_PLOTLY = False
-    log.debug("No Plotly Found")
+def _have(name: str) -> bool:
+    have = find_spec(name) is not None
+    if not have:
+        log.debug(f"No {name} found")
+    return have
+
+
+# Optional Plotting library detection
+HAVE_MATPLOTLIB = _have("matplotlib")
+HAVE_FOLIUM = _have("folium")
+HAVE_BOKEH = _have("bokeh")
+HAVE_PLOTLY = _have("plotly")
+
+# (display name, version specifier) checked when a library is first used
+_version_specs: t.Dict[str, t.Tuple[str, SpecifierSet]] = {
+    "folium": ("Folium", FOLIUM_V_SPECIFIER),
+    "bokeh": ("Bokeh", BOKEH_V_SPECIFIER),
+    "plotly": ("Plotly", PLOTLY_V_SPECIFIER),
+}
+
+Loader = t.Callable[[], None]
+
+# loaders pending to run on first use of an object, keyed by the top-level module that defines its type
+_pending: t.DefaultDict[str, t.List[Loader]] = defaultdict(list)
+_lock = threading.RLock()
+
+
+def on_first_use(*modules: str) -> t.Callable[[Loader], Loader]:
+    """Decorator to run the loader (once) on first use of an object whose type is defined in any of the modules"""
+
+    def _decorator(f: Loader) -> Loader:
+        done = False
+
+        def _once() -> None:
+            nonlocal done
+            if not done:
+                done = True
+                f()
+
+        with _lock:
+            for m in modules:
+                _pending[m].append(_once)
+        return f
+
+    return _decorator
+
+
+def load_for(x: t.Any) -> bool:
+    """Run any pending loaders for the libraries that define the type of `x`, returning True if any were run"""
+    roots = {k.__module__.split(".")[0] for k in type(x).__mro__}
+    with _lock:
+        loaders = [f for r in roots for f in _pending.pop(r, [])]
+        if not loaders:
+            return False
+        for r in roots & _version_specs.keys():
+            if r in sys.modules:
+                _check_version(_version_specs[r][0], v.Version(sys.modules[r].__version__), _version_specs[r][1])
+        for f in loaders:
+            f()
+    return True
@@ -1,5 +1,16 @@
 # flake8: noqa:F401
-from .api import build_report, save_report, stringify_report, upload_report
+from .api import archive_report, build_report, save_report, stringify_report, upload_report
+from .delta import AppManifest, apply_delta, build_delta, build_delta_from_blocks
 from .file_store import FileEntry, FileStore
 from .processors import ConvertXML, PreProcessView
-from .types import FontChoice, Formatting, Pipeline, TextAlignment, ViewState, Width, mk_null_pipe
+from .types import (
+    FontChoice,
+    Formatting,
+    Pipeline,
+    RenderBudget,
+    RenderResult,
+    TextAlignment,
+    ViewState,
+    Width,
+    mk_null_pipe,
+)
@@ -6,8 +6,11 @@ API for processing Views, e.g. rendering it locally and publishing to a remote s
 
 from __future__ import annotations
 
+import datetime
 import os
 import typing as t
+from contextlib import suppress
+from functools import partial
 from pathlib import Path
 from shutil import rmtree
 
@@ -15,17 +18,18 @@ from datapane.client import DPClientError
 from datapane.common import NPath
 from datapane.view import Blocks, BlocksT
 
-from .file_store import B64FileEntry, GzipTmpFileEntry
+from .file_store import AppArchive, ArchiveFileEntry, B64FileEntry, GzipHashedFileEntry, GzipTmpFileEntry
 from .processors import (
     ConvertXML,
+    ExportHTMLArchive,
     ExportHTMLFileAssets,
     ExportHTMLInlineAssets,
     ExportHTMLStringInlineAssets,
     PreProcessView,
 )
-from .types import Formatting, Pipeline, ViewState
+from .types import Formatting, Pipeline, RenderBudget, RenderResult, ViewState
 
-__all__ = ["upload_report", "save_report", "build_report", "stringify_report"]
+__all__ = ["upload_report", "save_report", "build_report", "archive_report", "stringify_report"]
 
 
 ################################################################################
@@ -36,7 +40,10 @@ def build_report(
     dest: t.Optional[NPath] = None,
     formatting: t.Optional[Formatting] = None,
     overwrite: bool = False,
-) -> None:
+    budget: t.Optional[RenderBudget] = None,
+    deterministic: bool = False,
+    build_date: t.Optional[datetime.datetime] = None,
+) -> RenderResult:
     """Build an (static) app with a directory structure, which can be served by a local http server
 
     !!! note
@@ -48,6 +55,12 @@ def build_report(
         dest: File path to store the app directory
         formatting: Sets the basic app styling
         overwrite: Replace existing app with the same name and destination if already exists (default: False)
+        budget: Time limits for writing the assets, overrunning assets are replaced with a placeholder (optional)
+        deterministic: Produce identical output for identical inputs, deriving ids and filenames from the content (default: False)
+        build_date: The date recorded in the document (optional: uses the current time, or a fixed date if deterministic)
+
+    Returns:
+        A `RenderResult` listing any assets that overran the budget
     """
     # TODO(product) - unknown if we should keep this...
 
@@ -64,7 +77,14 @@ def build_report(
     assets_dir.mkdir(parents=True)
 
     # write the app html and assets
-    s = ViewState(blocks=Blocks.wrap_blocks(blocks), file_entry_klass=GzipTmpFileEntry, dir_path=assets_dir)
+    s = ViewState(
+        blocks=Blocks.wrap_blocks(blocks),
+        file_entry_klass=GzipHashedFileEntry if deterministic else GzipTmpFileEntry,
+        dir_path=assets_dir,
+        budget=budget,
+        deterministic=deterministic,
+        build_date=build_date,
+    )
     _: str = (
         Pipeline(s)
         .pipe(PreProcessView(is_finalised=True))
@@ -72,6 +92,66 @@ def build_report(
         .pipe(ExportHTMLFileAssets(app_dir=app_dir, name=name, formatting=formatting))
         .result
     )
+    return RenderResult(overruns=s.overruns)
+
+
+def archive_report(
+    blocks: BlocksT,
+    path: NPath,
+    name: str = "Report",
+    formatting: t.Optional[Formatting] = None,
+    overwrite: bool = False,
+    budget: t.Optional[RenderBudget] = None,
+    deterministic: bool = False,
+    build_date: t.Optional[datetime.datetime] = None,
+) -> RenderResult:
+    """Build an (static) app directly into a zip or tar archive, as would be output by `build_report`
+
+    The app and its assets are streamed into the archive in a single pass, with the (gzipped) assets stored as-is
+
+    Args:
+        blocks: The `Blocks` object or a list of Blocks
+        path: File path of the archive, ending in `.zip` or `.tar`
+        name: The name of the app
+        formatting: Sets the basic app styling
+        overwrite: Replace an existing archive at the given path (default: False)
+        budget: Time limits for writing the assets, overrunning assets are replaced with a placeholder (optional)
+        deterministic: Produce identical output for identical inputs, deriving ids and filenames from the content (default: False)
+        build_date: The date recorded in the document (optional: uses the current time, or a fixed date if deterministic)
+
+    Returns:
+        A `RenderResult` listing any assets that overran the budget
+    """
+    path = Path(path)
+    fmt = path.suffix.lstrip(".").lower()
+    if fmt not in ("zip", "tar"):
+        raise DPClientError(f"Unsupported archive type {path.suffix}, please use .zip or .tar")
+    if path.exists() and not overwrite:
+        raise DPClientError(f"Archive exists at given path {str(path)} -- set `overwrite=True` to allow overwrite")
+
+    archive = AppArchive(path, fmt=fmt)
+    s = ViewState(
+        blocks=Blocks.wrap_blocks(blocks),
+        file_entry_klass=partial(ArchiveFileEntry, archive=archive),
+        budget=budget,
+        deterministic=deterministic,
+        build_date=build_date,
+    )
+    try:
+        _: Path = (
+            Pipeline(s)
+            .pipe(PreProcessView(is_finalised=True))
+            .pipe(ConvertXML())
+            .pipe(ExportHTMLArchive(archive=archive, name=name, formatting=formatting))
+            .result
+        )
+    except BaseException:
+        # don't leave a partial archive behind
+        with suppress(Exception):
+            archive.close()
+        path.unlink(missing_ok=True)
+        raise
+    return RenderResult(overruns=s.overruns)
 
 
 def save_report(
@@ -80,7 +160,10 @@ def save_report(
     open: bool = False,
     name: str = "Report",
     formatting: t.Optional[Formatting] = None,
-) -> None:
+    budget: t.Optional[RenderBudget] = None,
+    deterministic: bool = False,
+    build_date: t.Optional[datetime.datetime] = None,
+) -> RenderResult:
     """Save the app document to a local HTML file
 
     Args:
@@ -89,9 +172,21 @@ def save_report(
         open: Open in your browser after creating (default: False)
         name: Name of the document (optional: uses path if not provided)
         formatting: Sets the basic app styling
+        budget: Time limits for writing the assets, overrunning assets are replaced with a placeholder (optional)
+        deterministic: Produce identical output for identical inputs, deriving ids and filenames from the content (default: False)
+        build_date: The date recorded in the document (optional: uses the current time, or a fixed date if deterministic)
+
+    Returns:
+        A `RenderResult` listing any assets that overran the budget
     """
 
-    s = ViewState(blocks=Blocks.wrap_blocks(blocks), file_entry_klass=B64FileEntry)
+    s = ViewState(
+        blocks=Blocks.wrap_blocks(blocks),
+        file_entry_klass=B64FileEntry,
+        budget=budget,
+        deterministic=deterministic,
+        build_date=build_date,
+    )
     _: str = (
         Pipeline(s)
         .pipe(PreProcessView(is_finalised=True))
@@ -99,12 +194,16 @@ def save_report(
         .pipe(ExportHTMLInlineAssets(path=path, open=open, name=name, formatting=formatting))
         .result
     )
+    return RenderResult(overruns=s.overruns)
 
 
 def stringify_report(
     blocks: BlocksT,
     name: t.Optional[str] = None,
     formatting: t.Optional[Formatting] = None,
+    budget: t.Optional[RenderBudget] = None,
+    deterministic: bool = False,
+    build_date: t.Optional[datetime.datetime] = None,
 ) -> str:
     """Stringify the app document to a HTML string
 
@@ -112,9 +211,18 @@ def stringify_report(
         blocks: The `Blocks` object or a list of Blocks
         name: Name of the document (optional: uses path if not provided)
         formatting: Sets the basic app styling
+        budget: Time limits for writing the assets, overrunning assets are replaced with a placeholder (optional)
+        deterministic: Produce identical output for identical inputs, deriving ids and filenames from the content (default: False)
+        build_date: The date recorded in the document (optional: uses the current time, or a fixed date if deterministic)
     """
 
-    s = ViewState(blocks=Blocks.wrap_blocks(blocks), file_entry_klass=B64FileEntry)
+    s = ViewState(
+        blocks=Blocks.wrap_blocks(blocks),
+        file_entry_klass=B64FileEntry,
+        budget=budget,
+        deterministic=deterministic,
+        build_date=build_date,
+    )
     report_html: str = (
         Pipeline(s)
         .pipe(PreProcessView(is_finalised=False))
@@ -0,0 +1,180 @@
+"""
+Delta bundles between two builds of an app
+
+A delta bundle contains the files that are new or changed between two `build_report` outputs,
+along with a listing of the full new build where unchanged files are referenced by their hash.
+Applying the bundle patches the old app directory in place.
+"""
+from __future__ import annotations
+
+import dataclasses as dc
+import hashlib
+import json
+import typing as t
+from pathlib import Path, PureWindowsPath
+from shutil import copyfile, rmtree
+from tempfile import TemporaryDirectory
+
+from datapane.client import DPClientError, log
+from datapane.common import NPath
+
+if t.TYPE_CHECKING:
+    from datapane.view import BlocksT
+
+    from .types import Formatting
+
+DELTA_MANIFEST = "delta.json"
+DELTA_VERSION = 1
+
+
+def _hash_file(path: Path) -> str:
+    file_hash = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(1024 * 1024):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+@dc.dataclass(frozen=True)
+class AppManifest:
+    """Content hashes of all files within a built app, keyed by relative (posix) path"""
+
+    files: t.Dict[str, str] = dc.field(default_factory=dict)
+
+    @classmethod
+    def from_dir(cls, app_dir: NPath) -> AppManifest:
+        app_dir = Path(app_dir)
+        if not app_dir.is_dir():
+            raise DPClientError(f"App directory {app_dir} not found")
+        files = {p.relative_to(app_dir).as_posix(): _hash_file(p) for p in sorted(app_dir.rglob("*")) if p.is_file()}
+        return cls(files=files)
+
+    @classmethod
+    def load(cls, path: NPath) -> AppManifest:
+        return cls(files=json.loads(Path(path).read_text())["files"])
+
+    def save(self, path: NPath) -> None:
+        Path(path).write_text(json.dumps(dict(files=self.files), indent=2, sort_keys=True))
+
+    @property
+    def hashes(self) -> t.Set[str]:
+        return set(self.files.values())
+
+
+@dc.dataclass(frozen=True)
+class DeltaStats:
+    added: t.List[str]
+    unchanged: t.List[str]
+    removed: t.List[str]
+
+
+def build_delta(old: t.Union[NPath, AppManifest], new_dir: NPath, dest: NPath) -> DeltaStats:
+    """Create a delta bundle in `dest` that updates the `old` app (a directory or its manifest) to `new_dir`
+
+    Files whose content already exists in the old app are referenced by hash, all other files are copied into the bundle
+    """
+    old_manifest = old if isinstance(old, AppManifest) else AppManifest.from_dir(old)
+    new_dir = Path(new_dir)
+    new_manifest = AppManifest.from_dir(new_dir)
+
+    dest = Path(dest)
+    if dest.exists():
+        raise DPClientError(f"Delta bundle destination {dest} already exists")
+    dest.mkdir(parents=True)
+
+    added: t.List[str] = []
+    unchanged: t.List[str] = []
+    for (rel_path, h) in new_manifest.files.items():
+        if h in old_manifest.hashes:
+            unchanged.append(rel_path)
+        else:
+            added.append(rel_path)
+            (dest / rel_path).parent.mkdir(parents=True, exist_ok=True)
+            copyfile(new_dir / rel_path, dest / rel_path)
+    removed = sorted(set(old_manifest.files) - set(new_manifest.files))
+
+    delta = dict(
+        version=DELTA_VERSION,
+        files={p: dict(hash=h, source="bundle" if p in added else "base") for (p, h) in new_manifest.files.items()},
+        removed=removed,
+    )
+    (dest / DELTA_MANIFEST).write_text(json.dumps(delta, indent=2, sort_keys=True))
+    log.info(f"Built delta bundle in {dest} - {len(added)} new or changed, {len(unchanged)} unchanged files")
+    return DeltaStats(added=added, unchanged=unchanged, removed=removed)
+
+
+def build_delta_from_blocks(
+    old: t.Union[NPath, AppManifest],
+    blocks: BlocksT,
+    dest: NPath,
+    formatting: t.Optional[Formatting] = None,
+) -> DeltaStats:
+    """Build the Blocks as an app and create a delta bundle in `dest` that updates the `old` app to it"""
+    from .api import build_report
+
+    with TemporaryDirectory(prefix="dp-delta-") as tmp_dir:
+        # a deterministic build is needed, so unchanged assets hash the same between builds
+        build_report(blocks, name="app", dest=tmp_dir, formatting=formatting, deterministic=True)
+        return build_delta(old, Path(tmp_dir) / "app", dest)
+
+
+STAGING_DIR = ".dp-delta"
+
+
+def _check_rel_path(rel_path: str) -> str:
+    """Validate a path from a delta bundle, which must be relative and stay within the app"""
+    # parsed as a windows path to also split on backslashes, and catch drives and absolute paths on either platform
+    path = PureWindowsPath(rel_path)
+    if not path.parts or path.drive or path.root or ".." in path.parts or path.parts[0] == STAGING_DIR:
+        raise DPClientError(f"Invalid path {rel_path!r} in delta bundle")
+    return rel_path
+
+
+def apply_delta(bundle_dir: NPath, app_dir: NPath) -> None:
+    """
+    Patch the app in `app_dir` in place using the delta bundle in `bundle_dir`
+
+    All paths in the bundle are checked to be within the app, and the new files are staged and checked against their
+    hashes, before the app is modified.
+    NOTE - the app isn't patched atomically, an error while removing and replacing its files, e.g. the disk filling up,
+    leaves the app half-patched, so reapply the bundle to a copy of the original app
+    """
+    bundle_dir = Path(bundle_dir)
+    app_dir = Path(app_dir)
+    delta = json.loads((bundle_dir / DELTA_MANIFEST).read_text())
+    if delta["version"] != DELTA_VERSION:
+        raise DPClientError(f"Unsupported delta bundle version {delta['version']}")
+    for rel_path in [*delta["files"], *delta["removed"]]:
+        _check_rel_path(rel_path)
+
+    staging = app_dir / STAGING_DIR
+    rmtree(staging, ignore_errors=True)
+
+    # locate the referenced files in the existing app before modifying anything
+    old_manifest = AppManifest.from_dir(app_dir)
+    by_hash = {h: app_dir / p for (p, h) in old_manifest.files.items()}
+    files: t.Dict[str, dict] = delta["files"]
+    missing = [p for (p, x) in files.items() if x["source"] == "base" and x["hash"] not in by_hash]
+    if missing:
+        raise DPClientError(f"Delta bundle does not match the app in {app_dir}, missing {missing}")
+
+    # files already in place are left untouched
+    changed = {p: x for (p, x) in files.items() if old_manifest.files.get(p) != x["hash"]}
+
+    # stage all changed files first, as an existing file may be needed at several paths
+    staging.mkdir()
+    try:
+        for (rel_path, x) in changed.items():
+            src = bundle_dir / rel_path if x["source"] == "bundle" else by_hash[x["hash"]]
+            (staging / rel_path).parent.mkdir(parents=True, exist_ok=True)
+            copyfile(src, staging / rel_path)
+            if _hash_file(staging / rel_path) != x["hash"]:
+                raise DPClientError(f"Delta bundle file {rel_path} doesn't match its hash")
+
+        for rel_path in delta["removed"]:
+            (app_dir / rel_path).unlink(missing_ok=True)
+        for rel_path in changed:
+            (app_dir / rel_path).parent.mkdir(parents=True, exist_ok=True)
+            (staging / rel_path).replace(app_dir / rel_path)
+    finally:
+        rmtree(staging, ignore_errors=True)
@@ -1,22 +1,25 @@
 from __future__ import annotations
 
 import abc
+import binascii
 import datetime
 import gzip
 import hashlib
 import io
+import tarfile
 import tempfile
 import typing as t
+import zipfile
 from pathlib import Path
 from shutil import copyfileobj
 
 from typing_extensions import Self
 
-from datapane._vendor import base64io
-from datapane.common import guess_type
+from datapane.common import SIZE_1_MB, guess_type
 
 SERVED_REPORT_ASSETS_DIR = "assets"
 GZIP_MTIME = datetime.datetime(year=2000, month=1, day=1).timestamp()
+GZIP_MTIME_TUPLE = (2000, 1, 1, 0, 0, 0)
 
 
 class FileEntry:
@@ -31,10 +34,14 @@ class FileEntry:
     size: int
     wrapped: t.BinaryIO
 
-    def __init__(self, ext: str, mime: t.Optional[str] = None, dir_path: t.Optional[Path] = None):
+    def __init__(
+        self, ext: str, mime: t.Optional[str] = None, dir_path: t.Optional[Path] = None, compress: bool = True
+    ):
         self.mime = mime or guess_type(Path(f"tmp{ext}"))
         self._ext = ext
         self._dir_path = dir_path
+        # if the contents aren't already compressed, for entries that compress them
+        self.compress = compress
 
     @abc.abstractmethod
     def freeze(self) -> None:
@@ -81,33 +88,98 @@ class DummyFileEntry(FileEntry):
         return "/dev/null"
 
 
+class Base64Writer(io.RawIOBase):
+    """Write-only stream that base64-encodes into an in-memory ASCII buffer
+
+    Input is encoded in blocks via `binascii`, small writes are buffered into a block,
+    whereas larger writes are encoded directly. The encoded output is hashed as it's written, while still in cache
+    """
+
+    # a multiple of 3, so blocks encode without padding, and sized to fit within the CPU cache
+    BLOCK_SIZE = 3 * 16 * 1024
+
+    def __init__(self, out: bytearray, hasher: t.Optional[hashlib._Hash] = None):
+        super().__init__()
+        self.out = out
+        self.hasher = hasher
+        self._pending = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        if self.closed:
+            raise ValueError("write to closed file")
+        mv = memoryview(b).cast("B")
+        n = len(mv)
+        if self._pending:
+            # top up the pending block first
+            take = min(n, self.BLOCK_SIZE - len(self._pending))
+            self._pending += mv[:take]
+            mv = mv[take:]
+            if len(self._pending) < self.BLOCK_SIZE:
+                return n
+            self._encode(self._pending)
+            self._pending = bytearray()
+
+        # encode whole blocks directly
+        cut = len(mv) - len(mv) % self.BLOCK_SIZE
+        for i in range(0, cut, self.BLOCK_SIZE):
+            self._encode(mv[i : i + self.BLOCK_SIZE])
+        self._pending += mv[cut:]
+        return n
+
+    def _encode(self, block) -> None:
+        encoded = binascii.b2a_base64(block, newline=False)
+        self.out += encoded
+        if self.hasher:
+            self.hasher.update(encoded)
+
+    def close(self) -> None:
+        if not self.closed:
+            # encode any remaining bytes, with padding
+            self._encode(self._pending)
+            self._pending = bytearray()
+        super().close()
+
+
 class B64FileEntry(FileEntry):
     """Memory-based b64 file"""
 
-    # requires b64io is bytes only and wraps to a bytes file only
-    file: base64io.Base64IO
-    wrapped: io.BytesIO
-    contents: bytes
+    file: Base64Writer
+    # the data-uri, with the b64 contents encoded directly after the prefix
+    _buffer: bytearray
+    contents: memoryview
 
     def __init__(self, ext: str, mime: t.Optional[str] = None, *a, **kw):
         super().__init__(ext, mime, *a, **kw)
-        self.wrapped = io.BytesIO()
-        self.file = base64io.Base64IO(self.wrapped)
+        self._buffer = bytearray(f"data:{self.mime};base64,".encode("ascii"))
+        self._prefix_len = len(self._buffer)
+        self._hasher = hashlib.sha256()
+        self.file = Base64Writer(self._buffer, self._hasher)
+
+    @property
+    def wrapped(self) -> io.BytesIO:
+        return io.BytesIO(self.contents)
 
     def freeze(self) -> None:
         if not self.frozen:
             self.frozen = True
-            # get a reference to the buffer to splice later
             self.file.close()
-            self.file.flush()
-            self.contents = self.wrapped.getvalue()
+            self.contents = memoryview(self._buffer)[self._prefix_len :]
             # calc other properties
-            self.hash = hashlib.sha256(self.contents).hexdigest()[:10]
-            self.size = self.wrapped.tell()
+            self.hash = self._hasher.hexdigest()[:10]
+            self.size = len(self.contents)
 
     @property
     def src(self) -> str:
-        return f"data:{self.mime};base64,{self.contents.decode('ascii')}"
+        # NOTE - a copy of the encoded contents, so rendering briefly needs twice their size
+        return self._buffer.decode("ascii")
+
+
+def _gzip_level(compress: bool) -> int:
+    # contents that are already compressed are only stored within the gzip stream, as the viewer expects gzip
+    return 9 if compress else 0
 
 
 class GzipTmpFileEntry(FileEntry):
@@ -120,8 +192,10 @@ class GzipTmpFileEntry(FileEntry):
     has_output_dir: bool = False
 
     # Do we need DPTmpFile here, or just use namedtempfile??
-    def __init__(self, ext: str, mime: t.Optional[str] = None, dir_path: t.Optional[Path] = None):
-        super().__init__(ext, mime, dir_path)
+    def __init__(
+        self, ext: str, mime: t.Optional[str] = None, dir_path: t.Optional[Path] = None, compress: bool = True
+    ):
+        super().__init__(ext, mime, dir_path, compress)
 
         if dir_path:
             # create as a permanent file within the given dir
@@ -130,7 +204,10 @@ class GzipTmpFileEntry(FileEntry):
         else:
             self.wrapped = tempfile.NamedTemporaryFile("w+b", suffix=ext, prefix="dp-")
 
-        self.file = gzip.GzipFile(fileobj=self.wrapped, mode="w+b", mtime=GZIP_MTIME)
+        # don't embed the (random) tmp filename in the gzip header
+        self.file = gzip.GzipFile(
+            filename="", fileobj=self.wrapped, mode="w+b", mtime=GZIP_MTIME, compresslevel=_gzip_level(compress)
+        )
 
     def calc_hash(self, f: t.IO) -> str:
         f.seek(0)
@@ -157,6 +234,141 @@ class GzipTmpFileEntry(FileEntry):
             self.hash = self.calc_hash(self.wrapped)
 
 
+class GzipHashedFileEntry(GzipTmpFileEntry):
+    """Gzipped file that is renamed to its content hash when frozen, used for reproducible builds"""
+
+    def freeze(self) -> None:
+        if not self.frozen:
+            super().freeze()
+            if self.has_output_dir:
+                path = Path(self.wrapped.name)
+                dest = path.with_name(f"{self.hash}{self._ext}")
+                self.wrapped.close()
+                if dest.exists():
+                    # the same contents were already written, and may still be open by another entry,
+                    # which can't be replaced on Windows
+                    path.unlink()
+                else:
+                    path.replace(dest)
+                self.wrapped = dest.open("rb")
+
+
+class _HashingWriter(io.RawIOBase):
+    """Write-through wrapper that tracks the hash and size of the written bytes"""
+
+    def __init__(self, wrapped: t.BinaryIO):
+        super().__init__()
+        self.wrapped = wrapped
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self.hasher.update(b)
+        self.size += len(b)
+        return self.wrapped.write(b)
+
+
+class AppArchive:
+    """Streaming zip/tar archive of a built app, members are written sequentially in a single pass"""
+
+    def __init__(self, path: Path, fmt: str = "zip"):
+        self.path = path
+        self.fmt = fmt
+        self.n_assets = 0
+        if fmt == "zip":
+            # assets are already gzipped so are stored as-is
+            self._zip = zipfile.ZipFile(path, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True)
+        elif fmt == "tar":
+            self._tar = tarfile.open(path, mode="w")
+        else:
+            raise ValueError(f"Unknown archive format {fmt}")
+
+    def next_asset_name(self, ext: str) -> str:
+        self.n_assets += 1
+        return f"{SERVED_REPORT_ASSETS_DIR}/asset-{self.n_assets}{ext}"
+
+    def open_member(self, name: str) -> t.BinaryIO:
+        if self.fmt == "zip":
+            return self._zip.open(self._zip_info(name), mode="w", force_zip64=True)
+        # tar headers need the size upfront, so spool the member (to disk if large)
+        return tempfile.SpooledTemporaryFile(max_size=8 * SIZE_1_MB)
+
+    def close_member(self, name: str, f: t.BinaryIO) -> None:
+        if self.fmt == "tar":
+            info = self._tar_info(name, f.tell())
+            f.seek(0)
+            self._tar.addfile(info, f)
+        f.close()
+
+    def write_member(self, name: str, data: bytes) -> None:
+        if self.fmt == "zip":
+            self._zip.writestr(self._zip_info(name, zipfile.ZIP_DEFLATED), data)
+        else:
+            self._tar.addfile(self._tar_info(name, len(data)), io.BytesIO(data))
+
+    def close(self) -> None:
+        if self.fmt == "zip":
+            self._zip.close()
+        else:
+            self._tar.close()
+
+    @staticmethod
+    def _zip_info(name: str, compress_type: int = zipfile.ZIP_STORED) -> zipfile.ZipInfo:
+        info = zipfile.ZipInfo(name, date_time=GZIP_MTIME_TUPLE)
+        info.compress_type = compress_type
+        info.external_attr = 0o644 << 16
+        return info
+
+    @staticmethod
+    def _tar_info(name: str, size: int) -> tarfile.TarInfo:
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = int(GZIP_MTIME)
+        info.mode = 0o644
+        return info
+
+
+class ArchiveFileEntry(FileEntry):
+    """Gzipped file streamed directly into an AppArchive"""
+
+    file: gzip.GzipFile
+    wrapped: _HashingWriter
+
+    def __init__(
+        self,
+        ext: str,
+        mime: t.Optional[str] = None,
+        dir_path: t.Optional[Path] = None,
+        compress: bool = True,
+        *,
+        archive: AppArchive,
+    ):
+        super().__init__(ext, mime, dir_path, compress)
+        self.archive = archive
+        self.name = archive.next_asset_name(ext)
+        self.member = archive.open_member(self.name)
+        self.wrapped = _HashingWriter(self.member)
+        self.file = gzip.GzipFile(
+            filename="", fileobj=self.wrapped, mode="wb", mtime=GZIP_MTIME, compresslevel=_gzip_level(compress)
+        )
+
+    @property
+    def src(self) -> str:
+        return f"/{self.name}"
+
+    def freeze(self) -> None:
+        if not self.frozen:
+            self.frozen = True
+            self.file.close()
+            self.archive.close_member(self.name, self.member)
+            # size will be the compressed size...
+            self.size = self.wrapped.size
+            self.hash = self.wrapped.hasher.hexdigest()[:10]
+
+
 class FileStore:
     # TODO - make this a CAS (index by object hash itself?)
     # NOTE - currently we pass dir_path via the FileStore, could move into the file themselves?
@@ -179,8 +391,8 @@ class FileStore:
     def file_list(self) -> t.List[t.BinaryIO]:
         return [f.wrapped for f in self.files]
 
-    def get_file(self, ext: str, mime: str) -> FileEntry:
-        return self.fw_klass(ext, mime, self.dir_path)
+    def get_file(self, ext: str, mime: str, compress: bool = True) -> FileEntry:
+        return self.fw_klass(ext, mime, self.dir_path, compress=compress)
 
     def add_file(self, fw: FileEntry) -> None:
         fw.freeze()
@@ -0,0 +1,136 @@
+"""
+Precompiled HTML templates for the exporters
+
+The templates in `resources/html_templates` use a small subset of bottle's SimpleTemplate syntax,
+`{{ var }}` (escaped) and `{{ !var }}` (raw) slots, plus `% include(...)`, `% rebase(...)` and `% #` comment lines.
+Each template is split once into static chunks and slots, so rendering is just concatenation,
+or a sequence of writes when streaming to a file.
+"""
+from __future__ import annotations
+
+import dataclasses as dc
+import functools
+import re
+import typing as t
+from pathlib import Path
+
+import importlib_resources as ir
+
+template_dir: Path = t.cast(Path, ir.files("datapane.resources.html_templates"))
+
+_slot_re = re.compile(r"\{\{\s*(!?)\s*(\w+)\s*\}\}")
+_code_line_re = re.compile(r"^[ \t]*%(.*)$")
+_statement_re = re.compile(r"""^\s*(?:(include|rebase)\(["']([\w.-]+)["']\))?\s*(?:#.*)?$""")
+
+
+def html_escape(x: str) -> str:
+    """Escape HTML special characters, as bottle's `html_escape`"""
+    return (
+        x.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;").replace("'", "&#039;")
+    )
+
+
+def _escape(x: str, times: int) -> str:
+    for _ in range(times):
+        x = html_escape(x)
+    return x
+
+
+@dc.dataclass(frozen=True)
+class Slot:
+    """A variable within a template, html-escaped `escapes` times when rendered"""
+
+    name: str
+    escapes: int = 1
+
+
+Chunk = t.Union[str, Slot]
+
+
+def _merge(chunks: t.Iterable[Chunk]) -> t.Tuple[Chunk, ...]:
+    """Join adjacent static chunks"""
+    out: t.List[Chunk] = []
+    for c in chunks:
+        if isinstance(c, str) and out and isinstance(out[-1], str):
+            out[-1] += c
+        elif c != "":
+            out.append(c)
+    return tuple(out)
+
+
+@dc.dataclass(frozen=True)
+class HTMLTemplate:
+    chunks: t.Tuple[Chunk, ...]
+
+    @property
+    def slots(self) -> t.Set[str]:
+        return {c.name for c in self.chunks if isinstance(c, Slot)}
+
+    def bind(self, **values: t.Any) -> HTMLTemplate:
+        """Fill in the given slots, returning a template containing only the remaining slots"""
+        return _bind(self, tuple(sorted(values.items())))
+
+    def iter_render(self, **values: t.Any) -> t.Iterator[str]:
+        for c in self.chunks:
+            yield c if isinstance(c, str) else _render_slot(c, values[c.name])
+
+    def render(self, **values: t.Any) -> str:
+        return "".join(self.iter_render(**values))
+
+    def stream(self, f: t.TextIO, **values: t.Any) -> None:
+        for x in self.iter_render(**values):
+            f.write(x)
+
+
+def _render_slot(slot: Slot, value: t.Any) -> str:
+    return _escape("" if value is None else str(value), slot.escapes)
+
+
+@functools.lru_cache(maxsize=64)
+def _bind(template: HTMLTemplate, values: t.Tuple[t.Tuple[str, t.Any], ...]) -> HTMLTemplate:
+    v = dict(values)
+    return HTMLTemplate(
+        _merge(_render_slot(c, v[c.name]) if isinstance(c, Slot) and c.name in v else c for c in template.chunks)
+    )
+
+
+def _compile(name: str) -> t.Tuple[Chunk, ...]:
+    chunks: t.List[Chunk] = []
+    base: t.Optional[str] = None
+
+    for line in (template_dir / name).read_text(encoding="utf-8").splitlines(keepends=True):
+        if m := _code_line_re.match(line.rstrip("\r\n")):
+            if not (s := _statement_re.match(m.group(1))):
+                raise ValueError(f"Unsupported statement in template {name}: {line.strip()}")
+            (cmd, arg) = s.groups()
+            if cmd == "include":
+                chunks.extend(_compile(arg))
+            elif cmd == "rebase":
+                base = arg
+            continue
+
+        pos = 0
+        for m in _slot_re.finditer(line):
+            chunks.append(line[pos : m.start()])
+            chunks.append(Slot(m.group(2), escapes=0 if m.group(1) else 1))
+            pos = m.end()
+        chunks.append(line[pos:])
+
+    if base is None:
+        return _merge(chunks)
+
+    # the rendered template is passed into the escaped `base` slot(s) of the base template
+    def _nest(c: Chunk, escapes: int) -> Chunk:
+        return _escape(c, escapes) if isinstance(c, str) else dc.replace(c, escapes=c.escapes + escapes)
+
+    return _merge(
+        n
+        for c in _compile(base)
+        for n in ([_nest(x, c.escapes) for x in chunks] if isinstance(c, Slot) and c.name == "base" else [c])
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def load_template(name: str) -> HTMLTemplate:
+    """(cached) Load and precompile the named template"""
+    return HTMLTemplate(_compile(name))
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-import json
+import functools
+import hashlib
 import logging
 import os
+import threading
 import typing as t
 from abc import ABC
 from copy import copy
@@ -15,14 +17,14 @@ import importlib_resources as ir
 from lxml import etree
 
 from datapane import blocks as b
-from datapane._vendor.bottle import SimpleTemplate
 from datapane.client.exceptions import InvalidReportError
 from datapane.client.utils import display_msg, log, open_in_browser
-from datapane.common import HTML, NPath, timestamp, validate_view_doc
+from datapane.common import HTML, NPath, json_utils, timestamp, validate_view_doc
 from datapane.common.viewxml_utils import ElementT, local_view_resources
 from datapane.view import PreProcess, XMLBuilder
 
-from .file_store import FileEntry
+from .file_store import AppArchive, FileEntry
+from .html_templates import HTMLTemplate, load_template
 from .types import BaseProcessor, Formatting
 
 if t.TYPE_CHECKING:
@@ -65,15 +67,43 @@ class PreProcessView(BaseProcessor):
         return None
 
 
+_thread_local = threading.local()
+
+
+@functools.lru_cache(maxsize=None)
+def _local_post_xslt() -> etree._ElementTree:
+    return etree.parse(str(local_view_resources / "local_post_process.xslt"))
+
+
+def _local_post_transform() -> etree.XSLT:
+    """XSLT post-transform, compiled on first use within each thread, as lxml XSLT objects aren't shared"""
+    if (transform := getattr(_thread_local, "post_transform", None)) is None:
+        transform = _thread_local.post_transform = etree.XSLT(_local_post_xslt())
+    return transform
+
+
+def _needs_post_transform(view_doc: ElementT) -> bool:
+    """Check if the post-transform would change the doc, i.e. it has comments or whitespace-only text to strip"""
+    # NOTE - keep in sync with local_post_process.xslt, which is otherwise an identity transform
+    for e in view_doc.iter():
+        if e.tag is etree.Comment:
+            return True
+        if (e.text and e.text.isspace()) or (e.tail and e.tail.isspace()):
+            return True
+    return False
+
+
 class ConvertXML(BaseProcessor):
-    """Convert the View AST into an XML fragment"""
+    """Convert the View AST into an XML fragment
 
-    local_post_xslt = etree.parse(str(local_view_resources / "local_post_process.xslt"))
-    local_post_transform = etree.XSLT(local_post_xslt)
+    In `dry_run` mode only the structure and asset metadata are emitted, the asset writers are not run
+    and the store is left empty - useful for layout validation of large views
+    """
 
-    def __init__(self, *, pretty_print: bool = False, fragment: bool = False) -> None:
+    def __init__(self, *, pretty_print: bool = False, fragment: bool = False, dry_run: bool = False) -> None:
         self.pretty_print: bool = pretty_print
         self.fragment: bool = fragment
+        self.dry_run: bool = dry_run
         super().__init__()
 
     def __call__(self, _: t.Any) -> ElementT:
@@ -93,14 +123,19 @@ class ConvertXML(BaseProcessor):
 
     def convert_xml(self) -> ElementT:
         # create initial state
-        builder_state = XMLBuilder(store=self.s.store)
+        builder_state = XMLBuilder(
+            store=self.s.store, budget=self.s.budget, dry_run=self.dry_run, deterministic=self.s.deterministic
+        )
         self.s.blocks.accept(builder_state)
+        self.s.overruns.extend(builder_state.overruns)
         return builder_state.get_root(self.fragment)
 
     def post_transforms(self, view_doc: ElementT) -> ElementT:
         # TODO - post-xml transformations, essentially xslt / lxml-based DOM operations
-        # post_process via xslt
-        processed_view_doc: ElementT = self.local_post_transform(view_doc)
+        # post_process via xslt, skipped when it would have no effect
+        processed_view_doc: ElementT = (
+            _local_post_transform()(view_doc) if _needs_post_transform(view_doc) else view_doc
+        )
 
         # TODO - custom lxml-based transforms go here...
 
@@ -140,13 +175,11 @@ class BaseExportHTML(BaseProcessor, ABC):
     # Type is `ir.abc.Traversable` which extends `Path`,
     # but the former isn't compatible with `shutil`
     template_dir: Path = t.cast(Path, ir.files("datapane.resources.html_templates"))
-    template: SimpleTemplate
     template_name: str
 
-    def __init_subclass__(cls, **kwargs):
-        super().__init_subclass__(**kwargs)
-        # TODO (JB) - why doesn't altering TEMPLATE_PATH work as described in docs? Need to pass dir to `lookup` kwarg instead
-        cls.template = SimpleTemplate(name=cls.template_name, lookup=[str(cls.template_dir)])
+    @property
+    def template(self) -> HTMLTemplate:
+        return load_template(self.template_name)
 
     def get_cdn(self) -> str:
         from datapane import __is_dev_build__, __version__
@@ -159,31 +192,50 @@ class BaseExportHTML(BaseProcessor, ABC):
             return f"https://datapane-cdn.com/v{__version__}"
 
     def escape_json_htmlsafe(self, obj: t.Any) -> str:
-        """Escape JSON object for embedding in bottle templates."""
+        """Escape JSON object for embedding in HTML templates."""
 
         # Taken from Jinja2's |tojson pipe function
         # (https://github.com/pallets/jinja/blob/b7cb6ee6675b12a027c5e7518f832b2926dfe293/src/jinja2/utils.py#L628)
-        # Use of markupsafe is removed, as we use bottle's SimpleTemplate.
+        # Use of markupsafe is removed, as we use our own precompiled templates.
+        # Non-ASCII is left unescaped by the JSON backends, so the line and paragraph separators are escaped,
+        # as they're invalid within JS string literals before ES2019
         return (
-            json.dumps(obj)
+            json_utils.dumps(obj)
             .replace("<", "\\u003c")
             .replace(">", "\\u003e")
             .replace("&", "\\u0026")
             .replace("'", "\\u0027")
+            .replace("\u2028", "\\u2028")
+            .replace("\u2029", "\\u2029")
         )
 
-    def _write_html_template(
-        self,
-        name: str,
-        formatting: t.Optional[Formatting] = None,
-        app_runner: bool = False,
-    ) -> t.Tuple[str, str]:
+    def _write_html_template(self, name: str, formatting: t.Optional[Formatting] = None) -> t.Tuple[str, str]:
         """Internal method to write the ViewXML and assets into a HTML container and associated files"""
+        template, values, report_id = self._prepare_html_template(name, formatting)
+        return template.render(**values), report_id
+
+    def _stream_html_template(self, f: t.TextIO, name: str, formatting: t.Optional[Formatting] = None) -> str:
+        """Write the HTML container directly into `f`, returning the report id"""
+        template, values, report_id = self._prepare_html_template(name, formatting)
+        template.stream(f, **values)
+        return report_id
+
+    def _get_chrome(self, formatting: Formatting) -> HTMLTemplate:
+        """The template with the chrome, i.e. everything that only depends on the formatting, filled in (memoized)"""
+        return self.template.bind(
+            report_width_class=formatting.width.to_css(),
+            css_header=formatting.to_css(),
+            is_light_prose=json_utils.dumps(formatting.light_prose),
+            cdn_static="https://datapane-cdn.com/static",
+            cdn_base=self.get_cdn(),
+        )
+
+    def _prepare_html_template(
+        self, name: str, formatting: t.Optional[Formatting] = None
+    ) -> t.Tuple[HTMLTemplate, t.Dict[str, str], str]:
         name = name or "app"
         formatting = formatting or Formatting()
 
-        report_id: str = uuid4().hex
-
         # TODO - split this out?
         vs = self.s
         if vs:
@@ -194,22 +246,22 @@ class BaseExportHTML(BaseProcessor, ABC):
             view_xml = ""
 
         app_data = dict(view_xml=view_xml, assets=assets)
-        html = self.template.render(
-            # Escape JS multi-line strings
-            app_data=self.escape_json_htmlsafe(app_data),
-            report_width_class=formatting.width.to_css(),
+        # Escape JS multi-line strings
+        app_data_json = self.escape_json_htmlsafe(app_data)
+
+        if vs and vs.deterministic:
+            # derive the id from the content so identical inputs produce identical output
+            report_id = hashlib.sha256(app_data_json.encode()).hexdigest()[:32]
+        else:
+            report_id = uuid4().hex
+
+        values = dict(
+            app_data=app_data_json,
             report_name=name,
-            report_date=timestamp(),
-            css_header=formatting.to_css(),
-            is_light_prose=json.dumps(formatting.light_prose),
-            events=False,
+            report_date=timestamp(vs.build_date if vs else None),
             report_id=report_id,
-            cdn_static="https://datapane-cdn.com/static",
-            cdn_base=self.get_cdn(),
-            app_runner=app_runner,
         )
-
-        return html, report_id
+        return self._get_chrome(formatting), values, report_id
 
 
 class ExportBaseHTMLOnly(BaseExportHTML):
@@ -225,7 +277,7 @@ class ExportBaseHTMLOnly(BaseExportHTML):
     def generate_chrome(self) -> HTML:
         # TODO - this is a bit hacky
         self.s = None
-        html, report_id = self._write_html_template("app", formatting=self.formatting, app_runner=True)
+        html, report_id = self._write_html_template("app", formatting=self.formatting)
         return HTML(html)
 
     def get_cdn(self) -> str:
@@ -251,9 +303,8 @@ class ExportHTMLInlineAssets(BaseExportHTML):
         self.formatting = formatting
 
     def __call__(self, _: t.Any) -> str:
-        html, report_id = self._write_html_template(name=self.name, formatting=self.formatting)
-
-        Path(self.path).write_text(html, encoding="utf-8")
+        with open(self.path, "w", encoding="utf-8") as f:
+            report_id = self._stream_html_template(f, name=self.name, formatting=self.formatting)
 
         display_msg(f"App saved to ./{self.path}")
 
@@ -279,17 +330,36 @@ class ExportHTMLFileAssets(BaseExportHTML):
         self.formatting = formatting
 
     def __call__(self, dest: t.Optional[NPath] = None) -> Path:
-        html, report_id = self._write_html_template(
-            name=self.name,
-            formatting=self.formatting,
-        )
-
         index_path = self.app_dir / "index.html"
-        index_path.write_text(html, encoding="utf-8")
+        with index_path.open("w", encoding="utf-8") as f:
+            self._stream_html_template(f, name=self.name, formatting=self.formatting)
         display_msg(f"Built app in {self.app_dir}")
         return self.app_dir
 
 
+class ExportHTMLArchive(BaseExportHTML):
+    """
+    Export a view into an archive of the app directory, containing
+    - View XML - embedded in index.html
+    - Assets - streamed into the archive by the store as they are written
+    """
+
+    template_name = "local_template.html"
+
+    def __init__(self, archive: AppArchive, name: str = "app", formatting: t.Optional[Formatting] = None):
+        self.archive = archive
+        self.name = name
+        self.formatting = formatting
+
+    def __call__(self, _: t.Any) -> Path:
+        html, report_id = self._write_html_template(name=self.name, formatting=self.formatting)
+
+        self.archive.write_member("index.html", html.encode("utf-8"))
+        self.archive.close()
+        display_msg(f"Built app archive at {self.archive.path}")
+        return self.archive.path
+
+
 class ExportHTMLStringInlineAssets(BaseExportHTML):
     """
     Export the View as an in-memory string representing a resizable HTML fragment, containing
@@ -1,14 +1,17 @@
 from __future__ import annotations
 
 import dataclasses as dc
+import datetime
+import os
 import typing as t
 from enum import Enum
 from pathlib import Path
 
 from datapane.common import ViewXML
 from datapane.view import Blocks
+from datapane.view.budget import AssetOverrun, RenderBudget
 
-from .file_store import DummyFileEntry, FileEntry, FileStore
+from .file_store import GZIP_MTIME, DummyFileEntry, FileEntry, FileStore
 
 
 @dc.dataclass
@@ -20,11 +23,25 @@ class ViewState:
     view_xml: ViewXML = ""
     entries: t.Dict[str, str] = dc.field(default_factory=dict)
     dir_path: dc.InitVar[t.Optional[Path]] = None
+    budget: t.Optional[RenderBudget] = None
+    overruns: t.List[AssetOverrun] = dc.field(default_factory=list)
+    # reproducible output - ids and filenames are derived from the content
+    deterministic: bool = False
+    build_date: t.Optional[datetime.datetime] = None
 
     def __post_init__(self, file_entry_klass, dir_path):
         # TODO - should we use a lambda for file_entry_klass with dir_path captured?
         self.store = FileStore(fw_klass=file_entry_klass, assets_dir=dir_path)
 
+        if self.deterministic and self.build_date is None:
+            # follow the reproducible-builds convention, else use a fixed date
+            epoch = os.getenv("SOURCE_DATE_EPOCH")
+            build_date = datetime.datetime.fromtimestamp(
+                float(epoch) if epoch else GZIP_MTIME, tz=datetime.timezone.utc
+            )
+            # kept naive, in UTC, as per the current time used by `timestamp` for other builds
+            self.build_date = build_date.replace(tzinfo=None)
+
 
 P_IN = t.TypeVar("P_IN")
 P_OUT = t.TypeVar("P_OUT")
@@ -67,6 +84,18 @@ class Pipeline(t.Generic[P_IN]):
         return self._x
 
 
+@dc.dataclass(frozen=True)
+class RenderResult:
+    """Summary of a completed render"""
+
+    overruns: t.List[AssetOverrun] = dc.field(default_factory=list)
+
+    @property
+    def is_complete(self) -> bool:
+        """True if all assets were rendered within the budget"""
+        return not self.overruns
+
+
 def mk_null_pipe(blocks: Blocks) -> Pipeline[None]:
     s = ViewState(blocks, file_entry_klass=DummyFileEntry)
     return Pipeline(s)
@@ -0,0 +1,8 @@
+"""
+Local HTTP render service, rendering serialised block specs in a pool of worker processes
+
+Run with `datapane render-server`, see `app.py` for the endpoints and `spec.py` for the spec format
+"""
+# flake8: noqa:F401
+from .app import RenderMetrics, RenderServer
+from .spec import DataFile, RenderSpec, render_spec
@@ -0,0 +1,342 @@
+"""
+Local HTTP render service
+
+Renders serialised block specs (see `spec.py`) posted over HTTP, using a bounded pool of worker processes.
+
+Endpoints:
+    POST /render - render a spec, returning the HTML document, or a zip of the built app.
+        Either a JSON body containing the spec, or a `multipart/form-data` body with the spec in the `spec` field
+        and the data files referenced by the blocks as file fields.
+    GET /health - the server status and current load, as JSON
+    GET /metrics - request counts and render timings, in the Prometheus text format
+
+Requests beyond the number of workers are queued, up to `max_queue`, after which they're rejected with a 503.
+"""
+from __future__ import annotations
+
+import concurrent.futures as cf
+import dataclasses as dc
+import multiprocessing as mp
+import signal
+import threading
+import time
+import typing as t
+from pathlib import Path
+from shutil import rmtree
+from socketserver import ThreadingMixIn
+from tempfile import mkdtemp
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from datapane._vendor import bottle
+from datapane.client import DPClientError, log
+from datapane.common import SIZE_1_MB, json_utils
+
+from .spec import DataFile, RenderSpec, render_spec
+
+CHUNK_SIZE = 64 * 1024
+_content_types = {"html": "text/html; charset=utf-8", "zip": "application/zip"}
+
+
+################################################################################
+# worker processes
+def _init_worker() -> None:
+    # the server handles interrupts, and preloading the rendering stack keeps it off the first request
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import altair  # noqa: F401
+    import pandas  # noqa: F401
+    import pyarrow  # noqa: F401
+
+    import datapane.processors  # noqa: F401
+    from datapane.common.df_processor import set_process_threads
+
+    # the workers render in parallel, so each processes its dataframes on a single thread
+    set_process_threads(1)
+
+
+def _render_job(spec: RenderSpec, files: t.Dict[str, DataFile], dest: Path, timeout: float) -> Path:
+    from datapane.view.budget import BudgetBackend, RenderBudget
+
+    # assets are written in subprocesses, killed if the render overruns the request timeout, so a render that times
+    # out finishes (with placeholders) and releases its slot, rather than holding it until the work completes
+    return render_spec(spec, files, dest, budget=RenderBudget(deadline=timeout, backend=BudgetBackend.PROCESS))
+
+
+################################################################################
+# metrics
+@dc.dataclass
+class RenderMetrics:
+    """Counters for the requests handled by the server"""
+
+    received: int = 0
+    completed: int = 0
+    failed: int = 0
+    rejected: int = 0
+    timed_out: int = 0
+    pending: int = 0  # queued or rendering
+    render_secs: float = 0.0
+    max_render_secs: float = 0.0
+    _lock: threading.Lock = dc.field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def incr(self, **counts: int) -> None:
+        with self._lock:
+            for (k, v) in counts.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def record_render(self, secs: float) -> None:
+        with self._lock:
+            self.completed += 1
+            self.render_secs += secs
+            self.max_render_secs = max(self.max_render_secs, secs)
+
+    def snapshot(self) -> t.Dict[str, t.Union[int, float]]:
+        with self._lock:
+            return {f.name: getattr(self, f.name) for f in dc.fields(self) if not f.name.startswith("_")}
+
+
+################################################################################
+# server
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _LogHandler(WSGIRequestHandler):
+    def log_message(self, format: str, *args: t.Any) -> None:
+        log.debug(f"{self.address_string()} - {format % args}")
+
+
+def _error(status: int, msg: str, **headers: str) -> bottle.HTTPResponse:
+    return bottle.HTTPResponse(
+        json_utils.dumpb(dict(error=msg)), status=status, headers={"Content-Type": "application/json", **headers}
+    )
+
+
+class RenderServer:
+    """A local HTTP server rendering block specs in a pool of worker processes"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8090,
+        workers: int = 2,
+        max_queue: int = 8,
+        timeout: float = 300.0,
+        max_upload_mb: int = 512,
+        mp_context: str = "spawn",
+    ):
+        """
+        Args:
+            host: The interface to listen on (default: localhost only)
+            port: The port to listen on, use 0 to pick a free port
+            workers: The number of render processes
+            max_queue: The number of requests that can wait for a worker, further requests are rejected
+            timeout: Seconds to wait for a render before returning a 504
+            max_upload_mb: The largest request body accepted, in MB - requests must give their Content-Length
+            mp_context: The multiprocessing start method for the workers
+        """
+        if workers < 1 or max_queue < 0:
+            raise DPClientError("The render server needs at least 1 worker and a non-negative queue size")
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_upload = max_upload_mb * SIZE_1_MB
+        self.metrics = RenderMetrics()
+        self.started = time.time()
+
+        self._mp_context = mp.get_context(mp_context)
+        self._pool = self._mk_pool()
+        self._pool_lock = threading.Lock()
+        # admission control - a slot is held from accepting a request until its render finishes
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+
+        self.app = self._mk_app()
+        self._httpd = make_server(host, port, self.app, server_class=_ThreadingWSGIServer, handler_class=_LogHandler)
+        self._thread: t.Optional[threading.Thread] = None
+
+    def _mk_pool(self) -> cf.ProcessPoolExecutor:
+        return cf.ProcessPoolExecutor(self.workers, mp_context=self._mp_context, initializer=_init_worker)
+
+    @property
+    def url(self) -> str:
+        (host, port) = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _mk_app(self) -> bottle.Bottle:
+        app = bottle.Bottle()
+        app.route("/health", "GET", self.health)
+        app.route("/metrics", "GET", self.prometheus_metrics)
+        app.route("/render", "POST", self.render)
+        return app
+
+    ############################################################################
+    # lifecycle
+    def serve_forever(self) -> None:
+        log.info(f"Render server listening on {self.url} with {self.workers} workers")
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self.close()
+
+    def start(self) -> RenderServer:
+        """Run the server in a background thread"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="dp-render-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self) -> None:
+        if self._thread:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.close()
+
+    def close(self) -> None:
+        self._httpd.server_close()
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> RenderServer:
+        return self.start()
+
+    def __exit__(self, *args: t.Any) -> None:
+        self.shutdown()
+
+    ############################################################################
+    # endpoints
+    def health(self) -> t.Dict[str, t.Any]:
+        pending = self.metrics.pending
+        return dict(
+            status="ok",
+            workers=self.workers,
+            max_queue=self.max_queue,
+            rendering=min(pending, self.workers),
+            queued=max(pending - self.workers, 0),
+            uptime_secs=round(time.time() - self.started, 3),
+        )
+
+    def prometheus_metrics(self) -> str:
+        m = self.metrics.snapshot()
+        lines = [
+            "# TYPE datapane_render_requests_total counter",
+            *(
+                f'datapane_render_requests_total{{status="{k}"}} {m[k]}'
+                for k in ("received", "completed", "failed", "rejected", "timed_out")
+            ),
+            "# TYPE datapane_render_pending gauge",
+            f"datapane_render_pending {m['pending']}",
+            "# TYPE datapane_render_workers gauge",
+            f"datapane_render_workers {self.workers}",
+            "# TYPE datapane_render_seconds_total counter",
+            f"datapane_render_seconds_total {m['render_secs']:.6f}",
+            "# TYPE datapane_render_seconds_max gauge",
+            f"datapane_render_seconds_max {m['max_render_secs']:.6f}",
+        ]
+        bottle.response.content_type = "text/plain; version=0.0.4"
+        return "\n".join(lines) + "\n"
+
+    def render(self) -> t.Any:
+        req = bottle.request
+        self.metrics.incr(received=1)
+        if req.content_length < 0:
+            # i.e. a chunked body, whose size can't be checked before it's read
+            self.metrics.incr(failed=1)
+            return _error(411, "Content-Length required")
+        if req.content_length > self.max_upload:
+            self.metrics.incr(failed=1)
+            return _error(413, f"Request body larger than {self.max_upload // SIZE_1_MB}MB")
+        if not self._slots.acquire(blocking=False):
+            self.metrics.incr(rejected=1)
+            return _error(503, "Render queue is full, retry later", **{"Retry-After": "1"})
+
+        dest = Path(mkdtemp(prefix="dp-render-"))
+        try:
+            (spec, files) = self._parse_request(req, dest)
+            future = self._submit(spec, files, dest)
+        except DPClientError as e:
+            self._release(dest)
+            self.metrics.incr(failed=1)
+            return _error(400, str(e))
+        except BaseException:
+            self._release(dest)
+            self.metrics.incr(failed=1)
+            raise
+
+        # the slot and the request dir are released once the render finishes, even if the request times out
+        submitted = time.perf_counter()
+        self.metrics.incr(pending=1)
+        future.add_done_callback(lambda _: (self.metrics.incr(pending=-1), self._slots.release()))
+        try:
+            out: Path = future.result(timeout=self.timeout)
+        except cf.TimeoutError:
+            self.metrics.incr(timed_out=1)
+            future.add_done_callback(lambda _: rmtree(dest, ignore_errors=True))
+            return _error(504, f"Render did not finish within {self.timeout}s")
+        except DPClientError as e:
+            rmtree(dest, ignore_errors=True)
+            self.metrics.incr(failed=1)
+            return _error(400, str(e))
+        except Exception as e:
+            rmtree(dest, ignore_errors=True)
+            self.metrics.incr(failed=1)
+            log.exception("Error rendering spec")
+            return _error(500, f"Render failed: {e!r}")
+
+        self.metrics.record_render(time.perf_counter() - submitted)
+        resp = bottle.response
+        resp.content_type = _content_types[spec.format]
+        resp.content_length = out.stat().st_size
+        if spec.format == "zip":
+            resp.set_header("Content-Disposition", f'attachment; filename="{out.name}"')
+        return self._stream(out, dest)
+
+    ############################################################################
+    # helpers
+    def _parse_request(self, req: bottle.BaseRequest, dest: Path) -> t.Tuple[RenderSpec, t.Dict[str, DataFile]]:
+        files: t.Dict[str, DataFile] = {}
+        if req.content_type.startswith("multipart/"):
+            raw_spec = req.forms.get("spec")
+            if raw_spec is None and (spec_file := req.files.get("spec")):
+                raw_spec = spec_file.file.read()
+            for (i, (name, upload)) in enumerate(req.files.allitems()):
+                if name == "spec":
+                    continue
+                # store under a generated name, keeping the extension to detect the format
+                path = dest / f"data-{i}{Path(upload.raw_filename).suffix.lower()}"
+                upload.save(str(path))
+                files[name] = DataFile(path=path, filename=upload.raw_filename)
+        else:
+            raw_spec = req.body.read()
+
+        if not raw_spec:
+            raise DPClientError("No spec provided")
+        try:
+            x = json_utils.loads(raw_spec)
+        except ValueError as e:
+            raise DPClientError(f"Invalid spec JSON: {e}") from e
+
+        spec = RenderSpec.from_json(x)
+        if fmt := req.query.get("format"):
+            spec = RenderSpec.from_json({**dc.asdict(spec), "format": fmt})
+        return (spec, files)
+
+    def _submit(self, spec: RenderSpec, files: t.Dict[str, DataFile], dest: Path) -> cf.Future:
+        with self._pool_lock:
+            try:
+                return self._pool.submit(_render_job, spec, files, dest, self.timeout)
+            except cf.BrokenExecutor:
+                # a worker died, e.g. killed when out of memory - replace the pool
+                log.warning("Render pool is broken, restarting")
+                self._pool.shutdown(wait=False)
+                self._pool = self._mk_pool()
+                return self._pool.submit(_render_job, spec, files, dest, self.timeout)
+
+    def _release(self, dest: Path) -> None:
+        rmtree(dest, ignore_errors=True)
+        self._slots.release()
+
+    @staticmethod
+    def _stream(out: Path, dest: Path) -> t.Iterator[bytes]:
+        try:
+            with out.open("rb") as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    yield chunk
+        finally:
+            rmtree(dest, ignore_errors=True)
@@ -0,0 +1,256 @@
+"""
+Serialised block specs for the render server
+
+A spec is a JSON document describing the blocks to render, with any data attached separately, e.g.
+
+    {
+      "name": "Sales",
+      "format": "html",
+      "formatting": {"accent_color": "#FF0000", "width": "full"},
+      "blocks": [
+        "# Sales report",
+        {"type": "Group", "columns": 2, "blocks": [
+          {"type": "BigNumber", "heading": "Total", "value": 100},
+          {"type": "DataTable", "data": "sales", "caption": "Sales by region"}
+        ]},
+        {"type": "Plot", "data": "chart"}
+      ]
+    }
+
+Strings are rendered as Markdown `Text` blocks, any other keys are passed to the block as parameters - only the
+parameters listed in `_block_params` are accepted, excluding any that read local files, e.g. `Text(file=...)`.
+Asset blocks reference an attached file by name in `data` - Arrow (`.arrow`, `.feather`) and Parquet (`.parquet`)
+files for `DataTable` and `Table`, Vega-Lite JSON (`.json`) for `Plot`, and any file for `Attachment` and `Media`.
+"""
+from __future__ import annotations
+
+import dataclasses as dc
+import typing as t
+from pathlib import Path
+
+from datapane import blocks as b
+from datapane.client import DPClientError
+from datapane.common import JDict, NPath
+
+if t.TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    from datapane.processors.types import Formatting
+    from datapane.view.budget import RenderBudget
+
+OUTPUT_FORMATS = ("html", "zip")
+
+ARROW_EXTS = (".arrow", ".feather", ".ipc")
+PARQUET_EXTS = (".parquet", ".pq")
+
+
+@dc.dataclass(frozen=True)
+class DataFile:
+    """A file attached to a spec, stored locally at `path`"""
+
+    path: Path
+    filename: str
+
+    @property
+    def ext(self) -> str:
+        return "".join(self.path.suffixes[-1:]).lower()
+
+
+def load_df(f: DataFile) -> pd.DataFrame:
+    if f.ext in ARROW_EXTS:
+        from datapane.common import ArrowFormat
+
+        return ArrowFormat.load_file(str(f.path))
+    elif f.ext in PARQUET_EXTS:
+        from datapane.common import ParquetFormat
+
+        return ParquetFormat.load_file(str(f.path))
+    raise DPClientError(f"Unsupported data file {f.filename}, expected an Arrow or Parquet file")
+
+
+def load_table(f: DataFile) -> t.Union[pa.Table, pq.ParquetFile]:
+    """
+    Load the data as an arrow table, for blocks that don't need it in pandas, opening Parquet files without reading
+    them, to be processed a row group at a time
+    """
+    if f.ext in ARROW_EXTS:
+        from datapane.common import ArrowFormat
+
+        return ArrowFormat.load_file(str(f.path), as_table=True)
+    elif f.ext in PARQUET_EXTS:
+        from datapane.common.datafiles import ParquetPath
+
+        return ParquetPath(str(f.path))
+    raise DPClientError(f"Unsupported data file {f.filename}, expected an Arrow or Parquet file")
+
+
+def load_plot(f: DataFile) -> t.Any:
+    if f.ext != ".json":
+        raise DPClientError(f"Unsupported plot file {f.filename}, expected a Vega-Lite JSON file")
+    import altair as alt
+
+    from datapane.common import json_utils
+
+    try:
+        return alt.Chart.from_dict(json_utils.loads(f.path.read_bytes()))
+    except Exception as e:
+        raise DPClientError(f"Invalid Vega-Lite plot {f.filename}: {e}") from e
+
+
+# Block types allowed within a spec, with how their attached data is loaded (as the named parameter)
+_container_blocks: t.Dict[str, t.Type[b.BaseBlock]] = {
+    "Group": b.Group,
+    "Select": b.Select,
+    "Toggle": b.Toggle,
+    "Page": b.Page,
+}
+_data_blocks: t.Dict[str, t.Type[b.BaseBlock]] = {
+    "Text": b.Text,
+    "HTML": b.HTML,
+    "Code": b.Code,
+    "Formula": b.Formula,
+    "BigNumber": b.BigNumber,
+}
+_asset_blocks: t.Dict[str, t.Tuple[t.Type[b.BaseBlock], str, t.Callable[[DataFile], t.Any]]] = {
+    "DataTable": (b.DataTable, "df", load_table),
+    "Table": (b.Table, "data", load_df),
+    "Plot": (b.Plot, "data", load_plot),
+    "Attachment": (b.Attachment, "file", lambda f: f.path),
+    "Media": (b.Media, "file", lambda f: f.path),
+}
+
+
+# The parameters a spec may give each block type - any that read local paths, e.g. `Text(file=...)`, are excluded,
+# and asset blocks reference their attached file by name in `data`
+_common_params = frozenset({"name", "label"})
+_block_params: t.Dict[str, t.FrozenSet[str]] = {
+    k: _common_params | v
+    for (k, v) in {
+        "Group": {"blocks", "widths", "valign", "columns"},
+        "Select": {"blocks"},
+        "Toggle": {"blocks"},
+        "Page": {"blocks", "title"},
+        "Text": {"text"},
+        "HTML": {"html"},
+        "Code": {"code", "language", "caption"},
+        "Formula": {"formula", "caption"},
+        "BigNumber": {"heading", "value", "change", "prev_value", "is_positive_intent", "is_upward_change"},
+        "DataTable": {"data", "caption", "compression"},
+        "Table": {"data", "caption"},
+        "Plot": {"data", "caption", "responsive", "scale"},
+        "Attachment": {"data", "filename", "caption"},
+        "Media": {"data", "caption"},
+    }.items()
+}
+
+
+def _mk_block(klass: t.Type[b.BaseBlock], args: JDict) -> b.BaseBlock:
+    try:
+        return klass(**args)
+    except TypeError as e:
+        raise DPClientError(f"Invalid parameters for {klass.__name__}: {e}") from e
+
+
+def block_from_spec(x: t.Union[str, JDict], files: t.Mapping[str, DataFile]) -> b.BlockOrPrimitive:
+    """Build a block, and any nested blocks, from its spec"""
+    if isinstance(x, str):
+        return x
+    if not isinstance(x, dict) or not isinstance(x.get("type"), str):
+        raise DPClientError(f"Invalid block spec {str(x)[:100]}, expected a string or an object with a type")
+
+    args = {k: v for (k, v) in x.items() if k != "type"}
+    typ: str = x["type"]
+    if typ not in _block_params:
+        raise DPClientError(f"Unsupported block type {typ}")
+    if unknown := args.keys() - _block_params[typ]:
+        raise DPClientError(
+            f"Unsupported parameters {sorted(unknown)} for {typ}, choose from {sorted(_block_params[typ])}"
+        )
+    if klass := _container_blocks.get(typ):
+        args["blocks"] = [block_from_spec(y, files) for y in args.get("blocks", [])]
+        return _mk_block(klass, args)
+    elif klass := _data_blocks.get(typ):
+        return _mk_block(klass, args)
+    elif typ in _asset_blocks:
+        (klass, param, loader) = _asset_blocks[typ]
+        ref = args.pop("data", None)
+        if ref not in files:
+            raise DPClientError(f"{typ} block references data {ref!r}, which is not attached")
+        f = files[ref]
+        if typ == "Attachment":
+            args.setdefault("filename", f.filename)
+        args[param] = loader(f)
+        return _mk_block(klass, args)
+    raise DPClientError(f"Unsupported block type {typ}")
+
+
+def formatting_from_spec(x: t.Optional[JDict]) -> t.Optional[Formatting]:
+    from datapane.processors.types import FontChoice, Formatting, TextAlignment, Width
+
+    if not x:
+        return None
+    args = dict(x)
+    try:
+        if "width" in args:
+            args["width"] = Width(args["width"])
+        if "text_alignment" in args:
+            args["text_alignment"] = TextAlignment(args["text_alignment"])
+        if str(args.get("font", "")).upper() in FontChoice.__members__:
+            args["font"] = FontChoice[args["font"].upper()]
+        return Formatting(**args)
+    except (TypeError, ValueError) as e:
+        raise DPClientError(f"Invalid formatting: {e}") from e
+
+
+@dc.dataclass(frozen=True)
+class RenderSpec:
+    """A parsed spec, the blocks are built separately (within the render worker) by `mk_blocks`"""
+
+    blocks: t.List[t.Union[str, JDict]]
+    name: str = "Report"
+    format: str = "html"
+    formatting: t.Optional[JDict] = None
+    deterministic: bool = False
+
+    @classmethod
+    def from_json(cls, x: t.Any) -> RenderSpec:
+        if isinstance(x, list):
+            x = dict(blocks=x)
+        if not isinstance(x, dict) or not isinstance(x.get("blocks"), list):
+            raise DPClientError("Invalid spec, expected a list of blocks or an object with a `blocks` list")
+        unknown = x.keys() - {f.name for f in dc.fields(cls)}
+        if unknown:
+            raise DPClientError(f"Invalid spec, unknown keys {sorted(unknown)}")
+        spec = cls(**x)
+        if spec.format not in OUTPUT_FORMATS:
+            raise DPClientError(f"Unsupported output format {spec.format}, choose from {list(OUTPUT_FORMATS)}")
+        return spec
+
+    def mk_blocks(self, files: t.Mapping[str, DataFile]) -> t.List[b.BlockOrPrimitive]:
+        return [block_from_spec(x, files) for x in self.blocks]
+
+
+def render_spec(
+    spec: RenderSpec, files: t.Mapping[str, DataFile], dest: NPath, budget: t.Optional[RenderBudget] = None
+) -> Path:
+    """
+    Render the spec into the `dest` dir, returning the path to the output (a HTML file or a zipped app)
+    Assets that overrun the `budget` are replaced by placeholders (optional)
+    """
+    from datapane.processors import archive_report, save_report
+
+    blocks = spec.mk_blocks(files)
+    formatting = formatting_from_spec(spec.formatting)
+    if spec.format == "zip":
+        out = Path(dest) / "app.zip"
+        archive_report(
+            blocks, out, name=spec.name, formatting=formatting, deterministic=spec.deterministic, budget=budget
+        )
+    else:
+        out = Path(dest) / "report.html"
+        save_report(
+            blocks, str(out), name=spec.name, formatting=formatting, deterministic=spec.deterministic, budget=budget
+        )
+    return out
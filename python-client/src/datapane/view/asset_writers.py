@@ -1,41 +1,27 @@
 """
-# TODO - optimise import handling here
 # NOTE - flake8 disabled on this file, as is not a fan of multimethod overriding here
 """
 # flake8: noqa:F811
 from __future__ import annotations
 
-import json
 import pickle
+import threading
 import typing as t
 from contextlib import suppress
 from io import TextIOWrapper
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from altair.utils import SchemaBase
-from multimethod import multimethod
-from packaging import version as v
-from packaging.specifiers import SpecifierSet
-from pandas.io.formats.style import Styler
+from multimethod import DispatchError, multimethod
 
 from datapane import optional_libs as opt
 from datapane.client import DPClientError, log
-from datapane.common import ArrowFormat
+from datapane.common import ArrowFormat, json_utils
 
 from .xml_visitor import AssetMeta
 
-# NOTE - need to update this and keep in sync with JS
-BOKEH_V_SPECIFIER = SpecifierSet("~=2.4.2")
-PLOTLY_V_SPECIFIER = SpecifierSet(">=4.0.0")
-FOLIUM_V_SPECIFIER = SpecifierSet(">=0.12.0")
-
-
-def _check_version(name: str, _v: v.Version, ss: SpecifierSet):
-    if _v not in ss:
-        log.warning(
-            f"{name} version {_v} is not supported, these plots may not display correctly, please install version {ss}"
-        )
-
 
 class DPTextIOWrapper(TextIOWrapper):
     """Custom IO Wrapper that detaches before closing - see https://bugs.python.org/issue21363"""
@@ -67,26 +53,50 @@ class AttachmentWriter:
 
     @multimethod
     def write_file(self, x: str, f) -> None:
-        out: str = json.dumps(json.loads(x))
-        f.write(out.encode())
+        json_utils.dump(json_utils.loads(x), f)
 
 
 class DataTableWriter:
+    def __init__(self, compression: t.Optional[str] = None):
+        self.compression = compression
+
     @multimethod
     def get_meta(self, x: pd.DataFrame) -> AssetMeta:
-        return AssetMeta(mime=ArrowFormat.content_type, ext=ArrowFormat.ext)
+        return AssetMeta(mime=ArrowFormat.content_type, ext=ArrowFormat.ext, compressed=self.compression is not None)
 
     @multimethod
     def write_file(self, x: pd.DataFrame, f) -> None:
         if x.size == 0:
             raise DPClientError("Empty DataFrame provided")
         # process_df called in Arrow.save_file
-        ArrowFormat.save_file(f, x)
+        ArrowFormat.save_file(f, x, compression=self.compression)
+
+    @multimethod
+    def get_meta(self, x: pa.Table) -> AssetMeta:
+        return AssetMeta(mime=ArrowFormat.content_type, ext=ArrowFormat.ext, compressed=self.compression is not None)
+
+    @multimethod
+    def write_file(self, x: pa.Table, f) -> None:
+        if x.num_rows == 0 or x.num_columns == 0:
+            raise DPClientError("Empty Table provided")
+        # process_table called in Arrow.save_file
+        ArrowFormat.save_file(f, x, compression=self.compression)
+
+    @multimethod
+    def get_meta(self, x: pq.ParquetFile) -> AssetMeta:
+        return AssetMeta(mime=ArrowFormat.content_type, ext=ArrowFormat.ext, compressed=self.compression is not None)
+
+    @multimethod
+    def write_file(self, x: pq.ParquetFile, f) -> None:
+        if x.metadata.num_rows == 0 or x.metadata.num_columns == 0:
+            raise DPClientError("Empty Parquet file provided")
+        # processed a row group at a time in Arrow.save_file
+        ArrowFormat.save_file(f, x, compression=self.compression)
 
 
 class HTMLTableWriter:
     @multimethod
-    def get_meta(self, x: t.Union[pd.DataFrame, Styler]) -> AssetMeta:
+    def get_meta(self, x: pd.DataFrame) -> AssetMeta:
         return AssetMeta(mime="application/vnd.datapane.table+html", ext=".tbl.html")
 
     @multimethod
@@ -95,11 +105,18 @@ class HTMLTableWriter:
         out = x.to_html().encode()
         f.write(out)
 
+    # Styler is registered on first use, as importing it pulls in matplotlib
     @multimethod
-    def write_file(self, x: Styler, f) -> None:
-        self._check(x.data)
-        out = x.to_html().encode()
-        f.write(out)
+    def get_meta(self, x: object) -> AssetMeta:
+        if opt.load_for(x):
+            return self.get_meta(x)
+        raise DispatchError(f"No HTMLTableWriter found for {type(x)}")
+
+    @multimethod
+    def write_file(self, x: object, f) -> None:
+        if opt.load_for(x):
+            return self.write_file(x, f)
+        raise DispatchError(f"No HTMLTableWriter found for {type(x)}")
 
     def _check(self, df: pd.DataFrame) -> None:
         n_cells = df.shape[0] * df.shape[1]
@@ -119,56 +136,114 @@ class PlotWriter:
 
     @multimethod
     def write_file(self, x: SchemaBase, f) -> None:
-        json.dump(x.to_dict(), DPTextIOWrapper(f))
+        json_utils.dump(x.to_dict(), f)
+
+    # Other libraries are registered on first use, see `_register_*` below
+    @multimethod
+    def get_meta(self, x: object) -> AssetMeta:
+        if opt.load_for(x):
+            return self.get_meta(x)
+        raise DispatchError(f"No PlotWriter found for {type(x)}")
+
+    @multimethod
+    def write_file(self, x: object, f) -> None:
+        if opt.load_for(x):
+            return self.write_file(x, f)
+        raise DispatchError(f"No PlotWriter found for {type(x)}")
+
+
+@opt.on_first_use("pandas")
+def _register_styler() -> None:
+    from pandas.io.formats.style import Styler
+
+    @HTMLTableWriter.get_meta.register(object, Styler)
+    def _(self, x: Styler) -> AssetMeta:
+        return AssetMeta(mime="application/vnd.datapane.table+html", ext=".tbl.html")
+
+    @HTMLTableWriter.write_file.register(object, Styler)
+    def _(self, x: Styler, f) -> None:
+        self._check(x.data)
+        out = x.to_html().encode()
+        f.write(out)
 
-    if opt.HAVE_FOLIUM:
 
-        @multimethod
-        def get_meta(self, x: opt.Map) -> AssetMeta:
+if opt.HAVE_FOLIUM:
+
+    @opt.on_first_use("folium")
+    def _register_folium() -> None:
+        from folium import Map
+
+        @PlotWriter.get_meta.register(object, Map)
+        def _(self, x: Map) -> AssetMeta:
             return AssetMeta(mime="application/vnd.folium+html", ext=".fl.html")
 
-        @multimethod
-        def write_file(self, x: opt.Map, f) -> None:
+        @PlotWriter.write_file.register(object, Map)
+        def _(self, x: Map, f) -> None:
             html: str = x.get_root().render()
             f.write(html.encode())
 
-    if opt.HAVE_BOKEH:
 
-        @multimethod
-        def get_meta(self, x: t.Union[opt.BFigure, opt.BLayout]) -> AssetMeta:
+if opt.HAVE_BOKEH:
+
+    @opt.on_first_use("bokeh")
+    def _register_bokeh() -> None:
+        from bokeh.embed import json_item
+        from bokeh.layouts import LayoutDOM as BLayout
+        from bokeh.plotting.figure import Figure as BFigure
+
+        def get_meta(self, x: t.Union[BFigure, BLayout]) -> AssetMeta:
             return AssetMeta(mime="application/vnd.bokeh.show+json", ext=".bokeh.json")
 
-        @multimethod
-        def write_file(self, x: t.Union[opt.BFigure, opt.BLayout], f):
-            from bokeh.embed import json_item
+        def write_file(self, x: t.Union[BFigure, BLayout], f) -> None:
+            json_utils.dump(json_item(x), f)
+
+        for typ in (BFigure, BLayout):
+            PlotWriter.get_meta.register(object, typ)(get_meta)
+            PlotWriter.write_file.register(object, typ)(write_file)
 
-            json.dump(json_item(x), DPTextIOWrapper(f))
 
-    if opt.HAVE_PLOTLY:
+if opt.HAVE_PLOTLY:
 
-        @multimethod
-        def get_meta(self, x: opt.PFigure) -> AssetMeta:
+    @opt.on_first_use("plotly")
+    def _register_plotly() -> None:
+        from plotly.graph_objects import Figure as PFigure
+
+        @PlotWriter.get_meta.register(object, PFigure)
+        def _(self, x: PFigure) -> AssetMeta:
             return AssetMeta(mime="application/vnd.plotly.v1+json", ext=".pl.json")
 
-        @multimethod
-        def write_file(self, x: opt.PFigure, f):
-            json.dump(x.to_json(), DPTextIOWrapper(f))
+        @PlotWriter.write_file.register(object, PFigure)
+        def _(self, x: PFigure, f) -> None:
+            json_utils.dump(x.to_json(), f)
+
+
+if opt.HAVE_MATPLOTLIB:
 
-    if opt.HAVE_MATPLOTLIB:
+    # numpy arrays are returned by `plt.subplots`
+    @opt.on_first_use("matplotlib", "numpy")
+    def _register_matplotlib() -> None:
+        from matplotlib.figure import Axes, Figure
+        from numpy import ndarray
 
-        @multimethod
-        def get_meta(self, x: t.Union[opt.Axes, opt.Figure, opt.ndarray]) -> AssetMeta:
+        def get_meta(self, x: t.Union[Axes, Figure, ndarray]) -> AssetMeta:
             return AssetMeta(mime="image/svg+xml", ext=".svg")
 
-        @multimethod
-        def write_file(self, x: opt.Figure, f) -> None:
-            x.savefig(DPTextIOWrapper(f), format="svg", bbox_inches="tight")
+        for typ in (Axes, Figure, ndarray):
+            PlotWriter.get_meta.register(object, typ)(get_meta)
+
+        # matplotlib isn't thread-safe, and figures may be shared between concurrent renders
+        mpl_lock = threading.Lock()
+
+        @PlotWriter.write_file.register(object, Figure)
+        def _(self, x: Figure, f) -> None:
+            with mpl_lock:
+                x.savefig(DPTextIOWrapper(f), format="svg", bbox_inches="tight")
 
-        @multimethod
-        def write_file(self, x: opt.Axes, f) -> None:
+        @PlotWriter.write_file.register(object, Axes)
+        def _(self, x: Axes, f) -> None:
             self.write_file(x.get_figure(), f)
 
-        @multimethod
-        def write_file(self, x: opt.ndarray, f) -> None:
+        @PlotWriter.write_file.register(object, ndarray)
+        def _(self, x: ndarray, f) -> None:
             fig = x.flatten()[0].get_figure()
             self.write_file(fig, f)
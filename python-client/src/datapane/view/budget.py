@@ -0,0 +1,201 @@
+"""
+Time budgets for the asset-writing stage
+
+Asset writers, e.g. serialising a plot or a dataframe, run within a worker (a thread or a process)
+so that a pathological object can be abandoned once it has overrun its budget,
+rather than stalling the whole render.
+"""
+from __future__ import annotations
+
+import dataclasses as dc
+import functools
+import io
+import multiprocessing as mp
+import threading
+import time
+import typing as t
+
+from datapane.client import DPClientError, log
+from datapane.common.dp_types import StrEnum
+
+if t.TYPE_CHECKING:
+    from .xml_visitor import AssetWriterP
+
+
+class BudgetBackend(StrEnum):
+    # overrunning writers are abandoned, but continue to run in the background until they complete
+    THREAD = "thread"
+    # overrunning writers are killed, requires the asset data to be picklable, to transfer it to a subprocess
+    PROCESS = "process"
+
+
+@dc.dataclass(frozen=True)
+class RenderBudget:
+    """Configure time limits when writing the assets for a report
+
+    Args:
+        deadline: Total time in seconds allowed for writing all assets (optional)
+        asset_timeout: Time in seconds allowed for writing any single asset (optional)
+        backend: Run writers in a `thread` (default), or in a `process` so overrunning writers can be killed
+
+    NOTE - threads can't be killed, so writers abandoned by the `thread` backend keep running, and keep their data
+    in memory, until they complete. Once `MAX_ABANDONED_WRITERS` are still running, further assets are replaced by
+    placeholders rather than written, use the `process` backend to bound long-running renders
+    """
+
+    deadline: t.Optional[float] = None
+    asset_timeout: t.Optional[float] = None
+    backend: BudgetBackend = BudgetBackend.THREAD
+
+    @property
+    def is_bounded(self) -> bool:
+        return self.deadline is not None or self.asset_timeout is not None
+
+
+@dc.dataclass(frozen=True)
+class AssetOverrun:
+    """Record of an asset that was replaced by a placeholder"""
+
+    block: str
+    name: t.Optional[str]
+    reason: str
+    elapsed: float
+
+
+class AssetTimeout(DPClientError):
+    pass
+
+
+@dc.dataclass
+class BudgetClock:
+    """Tracks the time remaining for a single render against a RenderBudget"""
+
+    budget: RenderBudget
+    started: float = dc.field(default_factory=time.monotonic)
+
+    def time_left(self) -> t.Optional[float]:
+        """Time available for the next asset, None if unbounded"""
+        limits = [x for x in (self.budget.asset_timeout, self._deadline_left()) if x is not None]
+        return max(min(limits), 0.0) if limits else None
+
+    def _deadline_left(self) -> t.Optional[float]:
+        if self.budget.deadline is None:
+            return None
+        return self.budget.deadline - (time.monotonic() - self.started)
+
+    def write(self, writer: AssetWriterP, data: t.Any) -> bytes:
+        """Run the writer within the remaining budget, returning the written bytes or raising AssetTimeout"""
+        timeout = self.time_left()
+        if timeout is not None and timeout <= 0:
+            raise AssetTimeout("render deadline reached before the asset was written")
+
+        # NOTE - daemon processes can't start subprocesses, e.g. ProcessPoolExecutor workers before Python 3.9
+        if self.budget.backend == BudgetBackend.PROCESS and not mp.current_process().daemon:
+            return _write_in_process(writer, data, timeout)
+        return _write_in_thread(writer, data, timeout)
+
+
+# the number of writers abandoned by the thread backend that can still be running, before writing further assets
+MAX_ABANDONED_WRITERS = 8
+_abandoned_lock = threading.Lock()
+_abandoned: t.List[threading.Thread] = []
+
+
+def abandoned_writers() -> int:
+    """The number of abandoned writers still running"""
+    with _abandoned_lock:
+        _abandoned[:] = [x for x in _abandoned if x.is_alive()]
+        return len(_abandoned)
+
+
+def _write_in_thread(writer: AssetWriterP, data: t.Any, timeout: t.Optional[float]) -> bytes:
+    if (n_abandoned := abandoned_writers()) >= MAX_ABANDONED_WRITERS:
+        raise AssetTimeout(f"{n_abandoned} abandoned asset writers are still running")
+
+    out = io.BytesIO()
+    error: t.List[BaseException] = []
+
+    def _run():
+        try:
+            writer.write_file(data, out)
+        except BaseException as e:  # noqa: B036
+            error.append(e)
+
+    # daemon thread, so that an abandoned writer doesn't block interpreter shutdown
+    th = threading.Thread(target=_run, name="dp-asset-writer", daemon=True)
+    th.start()
+    th.join(timeout)
+    if th.is_alive():
+        with _abandoned_lock:
+            _abandoned.append(th)
+        log.warning(f"Asset writer exceeded its {timeout:.1f}s budget, abandoning ({abandoned_writers()} running)")
+        raise AssetTimeout(f"exceeded time budget of {timeout:.1f}s")
+    if error:
+        raise error[0]
+    return out.getvalue()
+
+
+def _process_writer(conn) -> None:
+    try:
+        (writer, data) = conn.recv()
+        out = io.BytesIO()
+        writer.write_file(data, out)
+        conn.send((True, out.getvalue()))
+    except BaseException as e:  # noqa: B036
+        conn.send((False, e))
+    finally:
+        conn.close()
+
+
+@functools.lru_cache(maxsize=None)
+def _mp_context():
+    # the writers are started from a fork server, rather than forking the caller, which may be multithreaded,
+    # e.g. the render server or Jupyter, so could fork while another thread holds a lock, deadlocking the writer
+    if "forkserver" in mp.get_all_start_methods():
+        ctx = mp.get_context("forkserver")
+        # the server imports the writers once, so they're forked ready to run
+        ctx.set_forkserver_preload(["datapane.view.asset_writers"])
+        return ctx
+    return mp.get_context("spawn")
+
+
+def _send_job(conn, job: t.Tuple[AssetWriterP, t.Any], proc, error: t.List[BaseException]) -> None:
+    try:
+        conn.send(job)
+    except BaseException as e:  # noqa: B036
+        # e.g. the data isn't picklable, or the process was killed
+        error.append(e)
+        proc.kill()
+
+
+def _write_in_process(writer: AssetWriterP, data: t.Any, timeout: t.Optional[float]) -> bytes:
+    ctx = _mp_context()
+    (conn, child_conn) = ctx.Pipe()
+    proc = ctx.Process(target=_process_writer, args=(child_conn,), name="dp-asset-writer", daemon=True)
+    proc.start()
+    child_conn.close()
+    # the data is sent from a thread, so that pickling and transferring it is within the budget
+    send_error: t.List[BaseException] = []
+    sender = threading.Thread(
+        target=_send_job, args=(conn, (writer, data), proc, send_error), name="dp-asset-sender", daemon=True
+    )
+    sender.start()
+    try:
+        if not conn.poll(timeout):
+            log.warning(f"Asset writer exceeded its {timeout:.1f}s budget, killing process {proc.pid}")
+            proc.kill()
+            raise AssetTimeout(f"exceeded time budget of {timeout:.1f}s")
+        try:
+            ok, res = conn.recv()
+        except EOFError:
+            sender.join()
+            if send_error:
+                raise DPClientError(f"Couldn't send the asset data to the writer process: {send_error[0]!r}")
+            raise DPClientError(f"Asset writer process exited unexpectedly ({proc.exitcode})")
+    finally:
+        conn.close()
+        proc.join()
+
+    if not ok:
+        raise res
+    return res
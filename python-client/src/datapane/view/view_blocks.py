@@ -55,12 +55,12 @@ class Blocks(ContainerBlock):
 
     def get_dom(self) -> ElementT:
         """Return the Document structure for the View"""
-        # internal debugging method
+        # internal debugging method - runs as a dry-run, so assets are not written
         from datapane.processors.file_store import DummyFileEntry, FileStore
 
         from .xml_visitor import XMLBuilder
 
-        builder = XMLBuilder(FileStore(DummyFileEntry))
+        builder = XMLBuilder(FileStore(DummyFileEntry), dry_run=True)
         self.accept(builder)
         return builder.get_root()
 
@@ -2,8 +2,12 @@
 from __future__ import annotations
 
 import dataclasses as dc
+import threading
+import time
 import typing as t
 from collections import namedtuple
+from itertools import count
+from pathlib import Path
 
 from lxml import etree
 from lxml.builder import ElementMaker
@@ -12,14 +16,17 @@ from multimethod import DispatchError, multimethod
 from datapane import DPClientError
 from datapane.blocks import BaseBlock
 from datapane.blocks.asset import AssetBlock
-from datapane.blocks.empty import gen_name
+from datapane.blocks.empty import Empty, gen_name
 from datapane.blocks.layout import ContainerBlock
 from datapane.blocks.text import EmbeddedTextBlock
 from datapane.client import log
+from datapane.common import guess_type
 from datapane.common.viewxml_utils import ElementT, mk_attribs
 from datapane.view.view_blocks import Blocks
 from datapane.view.visitors import ViewVisitor
 
+from .budget import AssetOverrun, AssetTimeout, BudgetClock, RenderBudget
+
 if t.TYPE_CHECKING:
     from datapane.processors import FileEntry, FileStore
 
@@ -35,6 +42,20 @@ class XMLBuilder(ViewVisitor):
     store: FileStore
     # element: t.Optional[etree.Element] = None  # Empty Group Element?
     elements: t.List[ElementT] = dc.field(default_factory=list)
+    budget: t.Optional[RenderBudget] = None
+    overruns: t.List[AssetOverrun] = dc.field(default_factory=list)
+    # emit the structure and asset metadata only, without running the asset writers
+    dry_run: bool = False
+    # replace generated block names with ones derived from their position in the document
+    deterministic: bool = False
+    generated_names: t.Iterator[int] = dc.field(default_factory=count, init=False)
+    clock: t.Optional[BudgetClock] = dc.field(default=None, init=False)
+    # file entries written during this render, by block id
+    entries: t.Dict[int, FileEntry] = dc.field(default_factory=dict, init=False)
+
+    def __post_init__(self):
+        if self.budget and self.budget.is_bounded:
+            self.clock = BudgetClock(self.budget)
 
     def get_root(self, fragment: bool = False) -> ElementT:
         """Return the top-level ViewXML"""
@@ -94,6 +115,13 @@ class XMLBuilder(ViewVisitor):
         element = E.Group(*sub_elements, columns="1", valign="top")
         return self.add_element(b, element)
 
+    @multimethod
+    def visit(self, b: Empty) -> XMLBuilder:
+        attribs = b._attributes
+        if self.deterministic and b._is_generated:
+            attribs = {**attribs, "name": gen_name(seed=f"Empty-{next(self.generated_names)}")}
+        return self.add_element(b, E.Empty(**attribs))
+
     @multimethod
     def visit(self, b: EmbeddedTextBlock) -> XMLBuilder:
         # NOTE - do we use etree.CDATA wrapper?
@@ -103,44 +131,75 @@ class XMLBuilder(ViewVisitor):
     @multimethod
     def visit(self, b: AssetBlock):
         """Main XMl creation method - visitor method"""
-        fe = self._add_asset_to_store(b)
+        if self.dry_run:
+            mime, src = self._get_asset_meta(b).mime, "ref://dry-run"
+        else:
+            started = time.monotonic()
+            try:
+                fe = self._add_asset_to_store(b)
+            except AssetTimeout as e:
+                return self._add_placeholder(b, str(e), time.monotonic() - started)
+            mime, src = fe.mime, f"ref://{fe.hash}"
 
         _E = getattr(E, b._tag)
 
         e: etree._Element = _E(
-            type=fe.mime,
+            type=mime,
             # size=conv_attrib(fe.size),
             # hash=fe.hash,
             **{**b._attributes, **b.get_file_attribs()},
             # src=f"attachment://{self.store_count}",
-            src=f"ref://{fe.hash}",
+            src=src,
         )
 
         if b.caption:
             e.set("caption", b.caption)
         return self.add_element(b, e)
 
+    def _add_placeholder(self, b: AssetBlock, reason: str, elapsed: float) -> XMLBuilder:
+        """Replace an asset that couldn't be written with a Text block recording the reason"""
+        self.overruns.append(AssetOverrun(block=b._tag, name=b.name, reason=reason, elapsed=elapsed))
+        log.warning(f"Replacing {b._tag} block with a placeholder - {reason}")
+        attribs = {k: v for (k, v) in b._attributes.items() if k in ("name", "label")}
+        return self.add_element(b, E.Text(etree.CDATA(f"_{b._tag} not rendered: {reason}_"), **attribs))
+
+    def _get_asset_meta(self, b: AssetBlock) -> AssetMeta:
+        """Determine the asset metadata as the store would, without writing the asset"""
+        if b.data is not None:
+            try:
+                return get_writer(b).get_meta(b.data)
+            except DispatchError:
+                raise DPClientError(f"{type(b.data).__name__} not supported for {self.__class__.__name__}")
+        elif b.file is not None:
+            ext = "".join(b.file.suffixes)
+            return AssetMeta(ext=ext, mime=guess_type(Path(f"tmp{ext}")))
+        else:
+            raise DPClientError("No asset to add")
+
     def _add_asset_to_store(self, b: AssetBlock) -> FileEntry:
         """Default asset store handler that operates on native Python objects"""
         # import here as a very slow module due to nested imports
         # from .. import files
 
-        # check if we already have stored this asset to the store
-        # TODO - do we just persist the asset store across the session??
-        if b._prev_entry:
-            if type(b._prev_entry) == self.store.fw_klass:
-                self.store.add_file(b._prev_entry)
-                return b._prev_entry
-            else:
-                b._prev_entry = None
+        # check if we already have stored this asset to the store during this render
+        # NOTE - tracked here rather than on the block, as blocks may be shared between concurrent renders
+        if (prev_entry := self.entries.get(id(b))) is not None:
+            self.store.add_file(prev_entry)
+            return prev_entry
 
         if b.data is not None:
             # fe = files.add_to_store(self.data, s.store)
             try:
                 writer = get_writer(b)
                 meta: AssetMeta = writer.get_meta(b.data)
-                fe = self.store.get_file(meta.ext, meta.mime)
-                writer.write_file(b.data, fe.file)
+                if self.clock:
+                    # run the writer within the remaining time budget before allocating the file
+                    content = self.clock.write(writer, b.data)
+                    fe = self.store.get_file(meta.ext, meta.mime, compress=not meta.compressed)
+                    fe.file.write(content)
+                else:
+                    fe = self.store.get_file(meta.ext, meta.mime, compress=not meta.compressed)
+                    writer.write_file(b.data, fe.file)
                 self.store.add_file(fe)
             except DispatchError:
                 raise DPClientError(f"{type(b.data).__name__} not supported for {self.__class__.__name__}")
@@ -149,11 +208,12 @@ class XMLBuilder(ViewVisitor):
         else:
             raise DPClientError("No asset to add")
 
-        b._prev_entry = fe
+        self.entries[id(b)] = fe
         return fe
 
 
-AssetMeta = namedtuple("AssetMeta", "ext mime")
+# compressed - if the written asset is already compressed, so isn't compressed again by the store
+AssetMeta = namedtuple("AssetMeta", "ext mime compressed", defaults=(False,))
 
 
 class AssetWriterP(t.Protocol):
@@ -168,14 +228,21 @@ class AssetWriterP(t.Protocol):
 
 
 asset_mapping: t.Dict[t.Type[AssetBlock], t.Type[AssetWriterP]] = dict()
+_asset_mapping_lock = threading.Lock()
 
 
 def get_writer(b: AssetBlock) -> AssetWriterP:
+    if not asset_mapping:
+        _init_asset_mapping()
+    return asset_mapping[type(b)](**b.writer_options)
+
+
+def _init_asset_mapping() -> None:
     import datapane.blocks.asset as a
 
     from . import asset_writers as aw
 
-    if not asset_mapping:
+    with _asset_mapping_lock:
         asset_mapping.update(
             {
                 a.Plot: aw.PlotWriter,
@@ -184,4 +251,3 @@ def get_writer(b: AssetBlock) -> AssetWriterP:
                 a.Attachment: aw.AttachmentWriter,
             }
         )
-    return asset_mapping[type(b)]()
@@ -0,0 +1,74 @@
+"""Import-time regression tests, run in fresh interpreters"""
+import json
+import subprocess
+import sys
+
+import pytest
+
+# heavy dependencies that must only be loaded on first use
+HEAVY_MODULES = ["pandas", "pyarrow", "numpy", "altair", "lxml", "multimethod", "matplotlib", "datapane.builtins"]
+# generous budget (secs) for `import datapane`, a regression would typically load pandas or altair at import
+IMPORT_TIME_BUDGET = 0.5
+
+
+def _run_py(code: str) -> dict:
+    res = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(res.stdout.splitlines()[-1])
+
+
+def test_import_is_lazy():
+    loaded = _run_py(
+        f"import sys, json, datapane; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    assert loaded == []
+
+
+def test_import_time_budget():
+    # take the best of several runs to reduce noise
+    code = "import time, json; t = time.perf_counter(); import datapane; print(json.dumps(time.perf_counter() - t))"
+    best = min(_run_py(code) for _ in range(3))
+    assert best < IMPORT_TIME_BUDGET
+
+
+@pytest.mark.parametrize("name", ["Blocks", "Text", "X", "builtins", "save_report", "Formatting"])
+def test_lazy_attrs(name: str):
+    import datapane as dp
+
+    assert getattr(dp, name) is not None
+    assert name in dir(dp)
+    with pytest.raises(AttributeError):
+        dp.not_an_attribute
+
+
+@pytest.mark.parametrize("name", ["blocks", "processors", "view", "resources", "_vendor"])
+def test_lazy_subpackages(name: str):
+    # subpackages resolve after a plain `import datapane`, as with the eager API
+    res = _run_py(f"import json, datapane as dp; print(json.dumps([dp.{name}.__name__, {name!r} in dir(dp)]))")
+    assert res == [f"datapane.{name}", True]
+
+
+def test_plotting_libs_loaded_on_first_use():
+    # rendering a report doesn't import any plotting libraries, until a plot from one is used
+    code = """
+import sys, json
+import datapane as dp
+import pandas as pd
+dp.stringify_report(dp.View(dp.Table(pd.DataFrame({"a": [1, 2]})), dp.Text("hi")))
+loaded = [m for m in ["matplotlib", "plotly", "bokeh", "folium"] if m in sys.modules]
+import plotly.graph_objects as go
+dp.stringify_report(dp.View(go.Figure()))
+print(json.dumps(dict(loaded=loaded, plotly="plotly" in sys.modules, bokeh="bokeh" in sys.modules)))
+"""
+    res = _run_py(code)
+    assert res == dict(loaded=[], plotly=True, bokeh=False)
+
+
+def test_mimetypes_loaded_on_first_use():
+    code = """
+import json, mimetypes
+from pathlib import Path
+from datapane.common.utils import guess_type
+inited = mimetypes.inited
+print(json.dumps([inited, guess_type(Path("a.arrow")), mimetypes.inited]))
+"""
+    assert _run_py(code) == [False, "application/vnd.apache.arrow+binary", True]
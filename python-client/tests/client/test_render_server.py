@@ -0,0 +1,201 @@
+"""Tests for the local render server, run against a server on localhost"""
+import concurrent.futures as cf
+import http.client
+import io
+import json
+import multiprocessing as mp
+import time
+import typing as t
+import uuid
+import zipfile
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import altair as alt
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from datapane.server import RenderServer, app
+from datapane.server.spec import DataFile, RenderSpec, render_spec
+
+
+def _multipart(spec: dict, files: t.Dict[str, t.Tuple[str, bytes]]) -> t.Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="spec"\r\n\r\n{json.dumps(spec)}\r\n'.encode()]
+    for (name, (filename, data)) in files.items():
+        header = f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+        parts.append(header.encode() + b"Content-Type: application/octet-stream\r\n\r\n" + data + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return (b"".join(parts), f"multipart/form-data; boundary={boundary}")
+
+
+def _post(url: str, spec: dict, files: t.Optional[dict] = None) -> t.Tuple[int, t.Dict[str, str], bytes]:
+    if files:
+        (body, content_type) = _multipart(spec, files)
+    else:
+        (body, content_type) = (json.dumps(spec).encode(), "application/json")
+    req = Request(f"{url}/render", data=body, headers={"Content-Type": content_type}, method="POST")
+    try:
+        with urlopen(req, timeout=120) as resp:
+            return (resp.status, dict(resp.headers), resp.read())
+    except HTTPError as e:
+        return (e.code, dict(e.headers), e.read())
+
+
+def _get(url: str) -> bytes:
+    with urlopen(url, timeout=30) as resp:
+        return resp.read()
+
+
+def _arrow_bytes(df: pd.DataFrame) -> bytes:
+    sink = io.BytesIO()
+    table = pa.Table.from_pandas(df)
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write(table)
+    return sink.getvalue()
+
+
+def _parquet_bytes(df: pd.DataFrame) -> bytes:
+    sink = io.BytesIO()
+    pq.write_table(pa.Table.from_pandas(df), sink)
+    return sink.getvalue()
+
+
+@pytest.fixture(scope="module")
+def server() -> t.Iterator[RenderServer]:
+    with RenderServer(port=0, workers=2, max_queue=2) as s:
+        yield s
+
+
+def test_render_server(server: RenderServer):
+    df = pd.DataFrame({"region": ["north", "south", "east"], "sales": [10, 20, 30]})
+    plot = alt.Chart(df).mark_bar().encode(x="region", y="sales")
+    spec = dict(
+        name="Sales",
+        blocks=[
+            "# Sales report",
+            dict(type="Group", columns=2, blocks=[dict(type="BigNumber", heading="Total", value=60), "text"]),
+            dict(type="DataTable", data="sales", caption="Sales by region"),
+            dict(type="DataTable", data="sales_pq", caption="Sales from Parquet"),
+            dict(type="Plot", data="chart"),
+        ],
+    )
+    files = dict(
+        sales=("sales.arrow", _arrow_bytes(df)),
+        sales_pq=("sales.parquet", _parquet_bytes(df)),
+        chart=("chart.json", json.dumps(plot.to_dict()).encode()),
+    )
+
+    # html
+    (status, headers, body) = _post(server.url, spec, files)
+    assert status == 200
+    assert headers["Content-Type"].startswith("text/html")
+    html = body.decode()
+    assert "Sales report" in html and "Sales by region" in html and "Sales from Parquet" in html
+
+    # zipped app
+    (status, headers, body) = _post(server.url, {**spec, "format": "zip"}, files)
+    assert status == 200
+    assert headers["Content-Type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(body)) as zf:
+        names = zf.namelist()
+    assert "index.html" in names
+    # both tables are written as assets
+    assert len([n for n in names if n.endswith(".arrow")]) == 2
+
+    # plain JSON body, without any data
+    (status, _, body) = _post(server.url, dict(blocks=["# Hello"]))
+    assert status == 200 and b"Hello" in body
+
+    # invalid specs are client errors
+    bad_specs = (
+        dict(blocks="x"),
+        dict(blocks=[dict(type="Exec")]),
+        dict(blocks=[dict(type="DataTable")]),
+        # parameters that read local files aren't accepted
+        dict(blocks=[dict(type="Text", file="/etc/hostname")]),
+    )
+    for bad_spec in bad_specs:
+        (status, _, body) = _post(server.url, bad_spec)
+        assert status == 400
+        assert json.loads(body)["error"]
+
+    health = json.loads(_get(f"{server.url}/health"))
+    assert health["status"] == "ok" and health["workers"] == 2 and health["queued"] == 0
+    metrics = _get(f"{server.url}/metrics").decode()
+    assert 'datapane_render_requests_total{status="completed"} 3' in metrics
+    assert 'datapane_render_requests_total{status="failed"} 4' in metrics
+
+
+def test_render_server_upload_size():
+    with RenderServer(port=0, workers=1, max_upload_mb=1) as server:
+        conn = http.client.HTTPConnection(*server._httpd.server_address[:2], timeout=30)
+        try:
+            # rejected from the headers, before the body is read
+            conn.putrequest("POST", "/render")
+            conn.putheader("Content-Type", "application/json")
+            conn.putheader("Content-Length", str(2 * 1024 * 1024))
+            conn.endheaders()
+            resp = conn.getresponse()
+            assert resp.status == 413
+            resp.read()
+            conn.close()
+
+            # a chunked body has no size to check
+            conn.request("POST", "/render", body=iter([b'{"blocks": ["# Hello"]}']), encode_chunked=True)
+            resp = conn.getresponse()
+            assert resp.status == 411
+            resp.read()
+        finally:
+            conn.close()
+        assert 'datapane_render_requests_total{status="failed"} 2' in _get(f"{server.url}/metrics").decode()
+
+
+def _held_render_job(spec: RenderSpec, files: t.Dict[str, DataFile], dest: Path, timeout: float) -> Path:
+    # the render is held until the file named by the spec exists
+    while not Path(spec.name).exists():
+        time.sleep(0.05)
+    return render_spec(spec, files, dest)
+
+
+@pytest.mark.skipif("fork" not in mp.get_all_start_methods(), reason="needs forked workers")
+def test_render_server_queue_full(tmp_path: Path, monkeypatch):
+    # the workers are forked, so run the patched render job
+    monkeypatch.setattr(app, "_render_job", _held_render_job)
+    release = tmp_path / "release"
+    with RenderServer(port=0, workers=1, max_queue=1, mp_context="fork") as server:
+        with cf.ThreadPoolExecutor(2) as pool:
+            # occupy the worker and the queue
+            held = [pool.submit(_post, server.url, dict(name=str(release), blocks=["# Hello"])) for _ in range(2)]
+            deadline = time.monotonic() + 30
+            while json.loads(_get(f"{server.url}/health"))["queued"] < 1:
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+
+            (status, headers, _) = _post(server.url, dict(blocks=["# Hello"]))
+            assert status == 503
+            assert headers["Retry-After"] == "1"
+            release.touch()
+            assert [f.result()[0] for f in held] == [200, 200]
+        assert 'datapane_render_requests_total{status="rejected"} 1' in _get(f"{server.url}/metrics").decode()
+
+
+@pytest.mark.skipif("fork" not in mp.get_all_start_methods(), reason="needs forked workers")
+def test_render_server_timeout(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(app, "_render_job", _held_render_job)
+    release = tmp_path / "release"
+    with RenderServer(port=0, workers=1, timeout=0.5, mp_context="fork") as server:
+        (status, _, body) = _post(server.url, dict(name=str(release), blocks=["# Hello"]))
+        assert status == 504
+        assert "0.5s" in json.loads(body)["error"]
+        # the slot is held until the render finishes
+        assert json.loads(_get(f"{server.url}/health"))["rendering"] == 1
+        release.touch()
+        deadline = time.monotonic() + 30
+        while json.loads(_get(f"{server.url}/health"))["rendering"]:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        assert 'datapane_render_requests_total{status="timed_out"} 1' in _get(f"{server.url}/metrics").decode()
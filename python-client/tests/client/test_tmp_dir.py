@@ -0,0 +1,86 @@
+"""Tests for the session tmp dir, created on first use"""
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import types
+from pathlib import Path
+
+import pytest
+
+import datapane
+
+# NOTE - loaded on its own, as the `cloud_api` package doesn't import as a whole
+COMMON_PY = Path(datapane.__file__).parent / "cloud_api" / "common.py"
+
+
+def _load_common() -> types.ModuleType:
+    spec = importlib.util.spec_from_file_location("dp_cloud_api_common", COMMON_PY)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+@pytest.fixture
+def common(tmp_path: Path, monkeypatch) -> types.ModuleType:
+    mod = _load_common()
+    monkeypatch.setattr(mod, "gettempdir", lambda: str(tmp_path))
+    return mod
+
+
+def test_import_creates_no_tmp_dir(tmp_path: Path):
+    code = f"""
+import importlib.util, json, os
+spec = importlib.util.spec_from_file_location("dp_cloud_api_common", {str(COMMON_PY)!r})
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+print(json.dumps(os.listdir({str(tmp_path)!r})))
+"""
+    env = {**os.environ, "TMPDIR": str(tmp_path), "PYTHONPATH": str(COMMON_PY.parents[2])}
+    res = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+    assert json.loads(res.stdout.splitlines()[-1]) == []
+
+
+def test_get_tmp_dir(common: types.ModuleType, tmp_path: Path):
+    tmp_dir = common.get_tmp_dir()
+    assert tmp_dir.is_dir() and tmp_dir.parent == tmp_path
+    # created once, then reused
+    assert common.get_tmp_dir() == tmp_dir
+    assert [x.name for x in tmp_path.glob("dp-tmp-*") if x.is_dir()] == [tmp_dir.name]
+    # the previous module attribute still resolves
+    assert common.tmp_dir == tmp_dir
+
+
+def test_stale_cleanup_interval(common: types.ModuleType, tmp_path: Path, monkeypatch):
+    scans = []
+    scanned = threading.Event()
+    monkeypatch.setattr(common, "_remove_stale_tmp_dirs", lambda x: (scans.append(x), scanned.set()))
+
+    common._schedule_stale_cleanup(tmp_path)
+    assert scanned.wait(10)
+    # the stamp stops another scan within the interval
+    common._schedule_stale_cleanup(tmp_path)
+    assert scans == [tmp_path]
+
+    # until it has passed
+    scanned.clear()
+    stamp = tmp_path / common._CLEANUP_STAMP
+    old = time.time() - common.STALE_CLEANUP_INTERVAL.total_seconds() - 1
+    os.utime(stamp, (old, old))
+    common._schedule_stale_cleanup(tmp_path)
+    assert scanned.wait(10)
+    assert scans == [tmp_path, tmp_path]
+
+
+def test_remove_stale_tmp_dirs(common: types.ModuleType, tmp_path: Path):
+    (stale, fresh, other) = (tmp_path / "dp-tmp-stale", tmp_path / "dp-tmp-fresh", tmp_path / "other")
+    for p in (stale, fresh, other):
+        p.mkdir()
+    old = time.time() - common.STALE_TMP_AGE.total_seconds() - 60
+    for p in (stale, other):
+        os.utime(p, (old, old))
+
+    common._remove_stale_tmp_dirs(tmp_path)
+    assert sorted(x.name for x in tmp_path.iterdir()) == ["dp-tmp-fresh", "other"]
@@ -1,9 +1,20 @@
 """Tests for the API that can run locally (due to design or mocked out)"""
+import gzip
+import io
+import json
 import os
+import pickle
+import tarfile
+import threading
+import time
 import typing as t
+import zipfile
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 from dominate.tags import h2
 from glom import glom
@@ -13,10 +24,14 @@ import datapane as dp
 from datapane.blocks import BaseBlock
 from datapane.builtins import gen_df, gen_plot
 from datapane.client.exceptions import DPClientError
+from datapane.common import ArrowFormat, ParquetFormat
+from datapane.common.datafiles import ParquetPath
+from datapane.common.df_processor import process_df_to_table, process_table
 from datapane.common.viewxml_utils import load_doc, validate_view_doc
 from datapane.processors import ConvertXML, Pipeline, PreProcessView, ViewState
-from datapane.processors.file_store import B64FileEntry
+from datapane.processors.file_store import B64FileEntry, GzipHashedFileEntry
 from datapane.processors.types import mk_null_pipe
+from datapane.view import budget
 
 ################################################################################
 # Helpers
@@ -304,3 +319,403 @@ def test_save_report_with_files(datadir: Path, monkeypatch):  # noqa: ANN
     monkeypatch.chdir(datadir)
     view = gen_view_complex_with_files(datadir, local_report=True)
     dp.save_report(view, path="test_out.html", name="Even better report")
+
+
+################################################################################
+# Render budgets
+class SlowPickle:
+    """Object that takes a long time to write as an Attachment"""
+
+    def __reduce__(self):
+        time.sleep(5)
+        return (SlowPickle, ())
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_render_budget_placeholder(backend: str):
+    view = dp.Blocks(
+        dp.Attachment(data=[1, 2, 3], name="fast"),
+        dp.Attachment(data=SlowPickle(), name="slow", label="Slow"),
+    )
+    s = ViewState(
+        blocks=view, file_entry_klass=B64FileEntry, budget=dp.RenderBudget(asset_timeout=0.5, backend=backend)
+    )
+    started = time.monotonic()
+    s = Pipeline(s).pipe(PreProcessView()).pipe(ConvertXML()).state
+    assert time.monotonic() - started < 4
+
+    # the slow asset is replaced by a text placeholder and reported
+    assert len(s.store.files) == 1
+    assert [(o.block, o.name) for o in s.overruns] == [("Attachment", "slow")]
+    doc = load_doc(s.view_xml)
+    assert doc.xpath("/View/Attachment/@name") == ["fast"]
+    assert "not rendered" in doc.xpath("/View/Text[@name='slow']/text()")[0]
+
+
+def test_render_budget_deadline(datadir: Path, monkeypatch):
+    monkeypatch.chdir(datadir)
+    view = dp.Blocks(dp.Attachment(data=SlowPickle()), dp.Attachment(data=SlowPickle()))
+    res = dp.save_report(view, path="test_out.html", budget=dp.RenderBudget(deadline=0.5))
+    assert not res.is_complete
+    assert len(res.overruns) == 2
+    # once the deadline has passed, remaining assets aren't attempted
+    assert res.overruns[1].elapsed < 0.5
+
+
+def test_render_budget_abandoned_writers(monkeypatch):
+    # once too many abandoned writers are still running, further assets aren't attempted
+    monkeypatch.setattr(budget, "MAX_ABANDONED_WRITERS", budget.abandoned_writers() + 1)
+    view = dp.Blocks(dp.Attachment(data=SlowPickle(), name="slow"), dp.Attachment(data=[1, 2, 3], name="fast"))
+    s = ViewState(blocks=view, file_entry_klass=B64FileEntry, budget=dp.RenderBudget(asset_timeout=0.5))
+    s = Pipeline(s).pipe(PreProcessView()).pipe(ConvertXML()).state
+    assert [o.name for o in s.overruns] == ["slow", "fast"]
+    assert "abandoned asset writers" in s.overruns[1].reason
+
+
+def test_render_budget_process_unpicklable():
+    view = dp.Blocks(dp.Attachment(data=threading.Lock()))
+    s = ViewState(
+        blocks=view, file_entry_klass=B64FileEntry, budget=dp.RenderBudget(asset_timeout=10, backend="process")
+    )
+    with pytest.raises(DPClientError, match="Couldn't send the asset data"):
+        Pipeline(s).pipe(PreProcessView()).pipe(ConvertXML())
+
+
+################################################################################
+# Dry-run
+def test_dry_run(datadir: Path):
+    view = dp.Blocks(
+        dp.Plot(gen_plot(), name="plot"),
+        dp.DataTable(gen_df(1000), name="datatable"),
+        dp.Attachment(data=SlowPickle(), name="attachment"),
+        dp.Media(file=datadir / "datapane-icon-192x192.png", name="media"),
+    )
+
+    # writers aren't run (the SlowPickle would take 5s), nor are files added to the store
+    started = time.monotonic()
+    s = Pipeline(ViewState(blocks=view, file_entry_klass=B64FileEntry)).pipe(PreProcessView())
+    s = s.pipe(ConvertXML(dry_run=True)).state
+    assert time.monotonic() - started < 4
+    assert s.store.store_count == 0
+    assert validate_view_doc(xml_str=s.view_xml)
+
+    # the structure and metadata match those of a full render
+    doc = load_doc(s.view_xml)
+    assert doc.xpath("/View/*/@type") == [
+        "application/vnd.vegalite.v5+json",
+        "application/vnd.apache.arrow+binary",
+        "application/vnd.pickle+binary",
+        "image/png",
+    ]
+    assert doc.xpath("/View/DataTable/@rows") == ["1000"]
+    assert "DataTable" in view.get_dom_str()
+
+
+################################################################################
+# Deterministic builds
+def gen_view_deterministic() -> dp.Blocks:
+    df = pd.DataFrame(dict(x=range(100), y=[f"s{i % 7}" for i in range(100)]))
+    return dp.Blocks(
+        md_block,
+        dp.Plot(gen_plot()),
+        dp.DataTable(df),
+        dp.Attachment(data=[1, 2, 3]),
+        dp.Group.empty(),
+    )
+
+
+def test_save_report_deterministic(tmp_path: Path):
+    paths = [tmp_path / "a.html", tmp_path / "b.html"]
+    for p in paths:
+        dp.save_report(gen_view_deterministic(), path=str(p), deterministic=True)
+    assert paths[0].read_bytes() == paths[1].read_bytes()
+
+
+def test_build_report_deterministic(tmp_path: Path):
+    def _build(dest: Path) -> t.Dict[str, bytes]:
+        dp.build_report(gen_view_deterministic(), dest=dest, deterministic=True)
+        return {str(p.relative_to(dest)): p.read_bytes() for p in dest.rglob("*") if p.is_file()}
+
+    a = _build(tmp_path / "a")
+    b = _build(tmp_path / "b")
+    assert a == b
+    # the datatable, plot and attachment assets are named by their content hashes
+    assert len([p for p in a if p.startswith("Report/assets/")]) == 3
+
+
+################################################################################
+# Delta bundles
+def test_delta_bundle(tmp_path: Path):
+    from datapane.processors import AppManifest, apply_delta, build_delta, build_delta_from_blocks
+
+    df = pd.DataFrame(dict(x=range(100)))
+    dp.build_report([dp.Plot(gen_plot()), dp.DataTable(df)], name="old", dest=tmp_path, deterministic=True)
+    dp.build_report(
+        [dp.Plot(gen_plot()), dp.DataTable(df + 1), "New text"], name="new", dest=tmp_path, deterministic=True
+    )
+    old_dir, new_dir = tmp_path / "old", tmp_path / "new"
+    manifest = AppManifest.from_dir(old_dir)
+
+    # only the view and the changed datatable are bundled
+    stats = build_delta(old_dir, new_dir, tmp_path / "delta")
+    assert len(stats.added) == 2 and "index.html" in stats.added
+    assert len(stats.unchanged) == 1
+    assert len(stats.removed) == 1
+
+    apply_delta(tmp_path / "delta", old_dir)
+    assert AppManifest.from_dir(old_dir) == AppManifest.from_dir(new_dir)
+
+    # from a previous manifest and new blocks
+    stats = build_delta_from_blocks(manifest, [dp.Plot(gen_plot())], tmp_path / "delta_2")
+    assert stats.added == ["index.html"]
+    assert not (tmp_path / "delta_2" / "assets").exists()
+
+
+def test_delta_bundle_invalid(tmp_path: Path):
+    from datapane.processors import AppManifest, apply_delta, build_delta
+
+    dp.build_report([dp.DataTable(gen_df(10))], name="old", dest=tmp_path, deterministic=True)
+    dp.build_report([dp.DataTable(gen_df(20))], name="new", dest=tmp_path, deterministic=True)
+    (old_dir, bundle) = (tmp_path / "old", tmp_path / "delta")
+    build_delta(old_dir, tmp_path / "new", bundle)
+    manifest = AppManifest.from_dir(old_dir)
+    delta = json.loads((bundle / "delta.json").read_text())
+    outside = tmp_path / "outside.txt"
+    outside.write_text("keep")
+
+    # paths outside the app are rejected
+    for bad_path in ("../outside.txt", str(outside), "assets\\..\\..\\outside.txt"):
+        (bundle / "delta.json").write_text(json.dumps({**delta, "removed": [bad_path]}))
+        with pytest.raises(DPClientError, match="Invalid path"):
+            apply_delta(bundle, old_dir)
+    assert outside.exists()
+
+    # as are bundled files that don't match their hash, before modifying the app
+    (bundle / "delta.json").write_text(json.dumps(delta))
+    (bundle / "index.html").write_text("tampered")
+    with pytest.raises(DPClientError, match="doesn't match its hash"):
+        apply_delta(bundle, old_dir)
+    assert AppManifest.from_dir(old_dir) == manifest
+
+
+################################################################################
+# Archive export
+@pytest.mark.parametrize("ext", [".zip", ".tar"])
+def test_archive_report(tmp_path: Path, ext: str):
+    path = tmp_path / f"report{ext}"
+    dp.archive_report(gen_view_deterministic(), path=path, deterministic=True)
+
+    if ext == ".zip":
+        with zipfile.ZipFile(path) as zf:
+            members = {i.filename: i for i in zf.infolist()}
+            # gzipped assets are stored without recompression
+            assert members["assets/asset-1.vl.json"].compress_type == zipfile.ZIP_STORED
+            assert members["index.html"].compress_type == zipfile.ZIP_DEFLATED
+            contents = {n: zf.read(n) for n in members}
+    else:
+        with tarfile.open(path) as tf:
+            contents = {m.name: tf.extractfile(m).read() for m in tf.getmembers()}
+
+    assert sorted(contents) == ["assets/asset-1.vl.json", "assets/asset-2.arrow", "assets/asset-3.pkl", "index.html"]
+    assert "/assets/asset-2.arrow" in contents["index.html"].decode()
+    assert gzip.decompress(contents["assets/asset-3.pkl"]) == pickle.dumps([1, 2, 3])
+
+    # a deterministic archive is reproducible
+    dp.archive_report(gen_view_deterministic(), path=tmp_path / f"report_2{ext}", deterministic=True)
+    assert path.read_bytes() == (tmp_path / f"report_2{ext}").read_bytes()
+
+    with pytest.raises(DPClientError):
+        dp.archive_report(gen_view_deterministic(), path=path)
+
+
+################################################################################
+# XML post-processing
+def test_post_transform_skipped():
+    from lxml import etree
+
+    from datapane.processors.processors import _local_post_transform, _needs_post_transform
+
+    c = ConvertXML()
+    c.s = mk_null_pipe(dp.Blocks(dp.Group(md_block, dp.Text("a"), columns=2))).state
+    doc = c.convert_xml()
+    # the transform is an identity on generated docs, so is skipped
+    assert not _needs_post_transform(doc)
+    assert etree.tounicode(_local_post_transform()(doc)) == etree.tounicode(doc)
+    assert c.post_transforms(doc) is doc
+
+    # comments and whitespace-only text are stripped
+    doc[0].append(etree.Comment("a comment"))
+    doc[0][-1].tail = "  "
+    assert _needs_post_transform(doc)
+    processed = c.post_transforms(doc)
+    assert processed is not doc
+    assert "comment" not in etree.tounicode(processed)
+
+
+################################################################################
+# HTML templates
+@pytest.mark.parametrize("name", ["local_template.html", "ipython_template.html"])
+def test_html_templates(name: str):
+    from datapane._vendor.bottle import SimpleTemplate
+    from datapane.processors.html_templates import load_template, template_dir
+
+    values = dict(
+        app_data='{"view_xml": "<View/>"}',
+        report_width_class="max-w-screen-lg",
+        report_name="app's",
+        report_date="2023-01-01",
+        css_header=":root { --dp-font-family: 'Inter'; }",
+        is_light_prose="false",
+        report_id="abc",
+        cdn_static="https://cdn/static",
+        cdn_base="https://cdn/base?a=1&b=2",
+    )
+    expected = SimpleTemplate(name=name, lookup=[str(template_dir)]).render(**values)
+    template = load_template(name)
+    # precompiled templates match the bottle output, including when partially bound
+    assert template.render(**values) == expected
+    chrome = template.bind(css_header=values["css_header"], cdn_base=values["cdn_base"])
+    assert chrome.slots < template.slots
+    assert chrome.render(**values) == expected
+
+
+################################################################################
+# File store
+@pytest.mark.parametrize("sizes", [[0], [1, 2], [5, 7, 1], [49151, 5, 3 * 49152 + 1], [1] * 100])
+def test_b64_file_entry(sizes: t.List[int]):
+    import base64
+    import hashlib
+
+    data = [os.urandom(n) for n in sizes]
+    fe = B64FileEntry(".bin", "application/octet-stream")
+    for d in data:
+        fe.file.write(d)
+    fe.freeze()
+
+    expected = base64.b64encode(b"".join(data))
+    assert fe.src == f"data:application/octet-stream;base64,{expected.decode()}"
+    assert fe.hash == hashlib.sha256(expected).hexdigest()[:10]
+    assert fe.size == len(expected)
+    assert fe.wrapped.read() == expected
+
+
+def test_gzip_hashed_file_entry(tmp_path: Path):
+    # entries with the same contents share the hash-named file, which isn't replaced while the first is open
+    entries = [GzipHashedFileEntry(".bin", "application/octet-stream", tmp_path) for _ in range(2)]
+    for fe in entries:
+        fe.file.write(b"data")
+        fe.freeze()
+    assert entries[0].hash == entries[1].hash
+    assert [x.name for x in tmp_path.iterdir()] == [f"{entries[0].hash}.bin"]
+    assert all(gzip.decompress(fe.wrapped.read()) == b"data" for fe in entries)
+
+
+################################################################################
+# Concurrency
+def test_concurrent_renders(tmp_path: Path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    # blocks are shared between all renders
+    df = pd.DataFrame(
+        dict(
+            a=range(100),
+            b=[f"x{i % 5}" for i in range(100)],
+            c=pd.to_timedelta(range(100), unit="s"),
+        )
+    )
+    blocks = dp.View(
+        dp.Text("Shared blocks"),
+        dp.DataTable(df),
+        dp.Table(df.head(10)),
+        dp.Plot(gen_plot()),
+        dp.Attachment({"a": [1, 2, 3]}),
+        dp.Group(dp.Text("a"), dp.Text("b"), columns=2),
+    )
+    table_df: pd.DataFrame = blocks.blocks[1].data
+    dtypes = table_df.dtypes.copy()
+
+    def render(i: int) -> str:
+        if i % 2:
+            return dp.stringify_report(blocks, deterministic=True)
+        dp.save_report(blocks, path=str(tmp_path / f"report_{i}.html"), deterministic=True)
+        return ""
+
+    expected = dp.stringify_report(blocks, deterministic=True)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(render, range(64)))
+
+    assert all(r == expected for r in results[1::2])
+    saved = {(tmp_path / f"report_{i}.html").read_text() for i in range(0, 64, 2)}
+    assert len(saved) == 1
+    # the blocks themselves aren't modified by rendering
+    assert table_df.dtypes.equals(dtypes)
+
+
+def test_datatable_shares_data(tmp_path: Path):
+    df = gen_df(100)
+    block = dp.DataTable(df)
+    # the data is shared, not copied, until rendered
+    assert all(np.shares_memory(block.data[c].to_numpy(), df[c].to_numpy()) for c in df.columns)
+    assert block.file_attribs["rows"] == "100"
+
+    df_orig = df.copy(deep=True)
+    dp.save_report(dp.Blocks(block), str(tmp_path / "report.html"))
+    pd.testing.assert_frame_equal(df, df_orig)
+
+
+def test_datatable_arrow(tmp_path: Path):
+    table = pa.Table.from_pandas(gen_df(100))
+    for data in (table, table.to_reader()):
+        block = dp.DataTable(data)
+        # held as an arrow table, without converting to pandas
+        assert isinstance(block.data, pa.Table)
+        assert (block.file_attribs["rows"], block.file_attribs["columns"]) == ("100", str(table.num_columns))
+        dp.save_report(dp.Blocks(block, table), str(tmp_path / "report.html"))
+
+    with pytest.raises(DPClientError):
+        dp.save_report(dp.Blocks(dp.DataTable(table.slice(0, 0))), str(tmp_path / "report.html"))
+
+
+def test_datatable_parquet(tmp_path: Path):
+    df = gen_df(1000)
+    fn = str(tmp_path / "df.parquet")
+    ParquetFormat.save_file(fn, df, row_group_size=100)
+    pf = pq.ParquetFile(fn)
+    block = dp.DataTable(pf)
+    # the file is referenced, and processed a row group at a time when rendered
+    assert block.data is pf
+    assert (block.file_attribs["rows"], block.file_attribs["columns"]) == ("1000", str(df.shape[1]))
+
+    path = tmp_path / "report.zip"
+    dp.archive_report(dp.Blocks(block, pf), path=path)
+    with zipfile.ZipFile(path) as zf:
+        asset = gzip.decompress(zf.read("assets/asset-1.arrow"))
+    assert pa.ipc.open_file(asset).read_all().equals(process_table(pq.read_table(fn)))
+
+    # files opened by path are pickled by their path, so can be written in a subprocess
+    pf = ParquetPath(fn)
+    assert pickle.loads(pickle.dumps(pf)).metadata.num_rows == 1000
+    res = dp.save_report(
+        dp.Blocks(dp.DataTable(pf)),
+        str(tmp_path / "report.html"),
+        budget=dp.RenderBudget(deadline=60, backend="process"),
+    )
+    assert res.is_complete
+
+
+def test_datatable_compression(tmp_path: Path):
+    df = gen_df(1000)
+    path = tmp_path / "report.zip"
+    dp.archive_report(dp.Blocks(dp.DataTable(df, compression="zstd")), path=path)
+    with zipfile.ZipFile(path) as zf:
+        gzipped = zf.read("assets/asset-1.arrow")
+    asset = gzip.decompress(gzipped)
+    assert pa.ipc.open_file(asset).read_all().equals(process_df_to_table(df))
+
+    # the arrow buffers are compressed, so the file is only stored within the gzip stream, not compressed again
+    uncompressed = io.BytesIO()
+    ArrowFormat.save_file(uncompressed, df)
+    assert len(asset) < len(uncompressed.getvalue()) and len(gzipped) > len(asset)
+
+    with pytest.raises(ValueError):
+        dp.DataTable(df, compression="snappy")
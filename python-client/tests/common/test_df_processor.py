@@ -1,13 +1,18 @@
 import sys
+import typing as t
 from datetime import datetime, timedelta
 from pathlib import Path
 from tempfile import mktemp
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
 import vega_datasets as vd
 
-from datapane.common import ArrowFormat, SList, log
+from datapane.common import ArrowFormat, ParquetFormat, SList, datafiles, df_processor, log
+from datapane.common.datafiles import process_parquet, write_df
 from datapane.common.df_processor import (
     PD_VERSION,
     convert_axis,
@@ -15,7 +20,12 @@ from datapane.common.df_processor import (
     obj_to_str,
     parse_categories,
     process_df,
+    process_df_batches,
+    process_df_to_table,
+    process_table,
+    str_to_arrow_str,
     timedelta_to_str,
+    to_table,
 )
 
 
@@ -88,6 +98,44 @@ def test_parse_categories_large():
     _check_categories_parsed(data, ["str2"])
 
 
+def test_parse_categories_sampled(monkeypatch):
+    """Columns checked against a sample of their rows are typed as when counted in full"""
+
+    def _df(n: int, **cols: t.Callable[[int], t.Any]) -> pd.DataFrame:
+        return pd.DataFrame({k: [f(x) for x in range(n)] for (k, f) in cols.items()})
+
+    dfs = [
+        # either side of the 20 value threshold
+        (_df(400, v20=lambda x: str(x % 20), v21=lambda x: str(x % 21)), ["v20"]),
+        # either side of the 5% threshold, and unique values (in runs, so only a sample of them are seen)
+        (
+            _df(
+                2000,
+                p5=lambda x: str(x % 99),
+                p5_over=lambda x: str(x % 101),
+                runs=lambda x: str(x // 16),
+                unique=str,
+                unique_na=lambda x: str(x) if x % 2 else None,
+                obj=lambda x: (x,) if x == 0 else f"x{x}",
+            ),
+            ["p5"],
+        ),
+    ]
+    for (df, categories) in dfs:
+        monkeypatch.setattr(df_processor, "CATEGORY_SAMPLE_MIN_ROWS", 10**9)
+        exact = process_df(df, copy=True)
+        exact_legacy = df.copy()
+        parse_categories(exact_legacy)
+        _check_categories_parsed(exact, categories)
+        _check_categories_parsed(exact_legacy, categories)
+
+        monkeypatch.setattr(df_processor, "CATEGORY_SAMPLE_MIN_ROWS", 0)
+        pd.testing.assert_frame_equal(process_df(df, copy=True), exact)
+        sampled_legacy = df.copy()
+        parse_categories(sampled_legacy)
+        pd.testing.assert_frame_equal(sampled_legacy, exact_legacy)
+
+
 def test_parse_categories_roundtrip(tmp_path: Path):
     # initial df
     df = pd.DataFrame(
@@ -261,3 +309,265 @@ def test_e2e_df_processing(tmp_path: Path):
         )
     )
     _test_df(df, ["string", "category", "UInt8", "Float64", "string", "datetime64[ns]"])
+
+
+def test_process_df_single_pass():
+    """process_df converts each column directly, with the same result as running each processing step in turn"""
+
+    def _process_steps(df: pd.DataFrame) -> pd.DataFrame:
+        df = df.copy(deep=True)
+        convert_axis(df)
+        timedelta_to_str(df)
+        df = df.convert_dtypes()
+        downcast_numbers(df)
+        obj_to_str(df)
+        parse_categories(df)
+        str_to_arrow_str(df)
+        return df
+
+    n = 40
+    dfs = [
+        pd.DataFrame(
+            dict(
+                uint=range(n),
+                int=[-x for x in range(n)],
+                bigint=[x * 10**10 for x in range(n)],
+                uint64=np.arange(n, dtype="uint64") + 2**63,
+                float=[x + 0.5 for x in range(n)],
+                float_int=[float(x) for x in range(n - 1)] + [np.nan],
+                float_nan=[np.nan] * n,
+                float32=np.arange(n, dtype="float32") + 0.5,
+                bool=[True, False] * (n // 2),
+                date=pd.date_range("2020", periods=n, tz="UTC"),
+            )
+        ),
+        pd.DataFrame(
+            dict(
+                nullable_int=pd.array(list(range(n - 1)) + [None], dtype="Int64"),
+                nullable_float=pd.array([1.0] * n, dtype="Float64"),
+                nullable_bool=pd.array([True, None] * (n // 2), dtype="boolean"),
+                all_na=pd.array([None] * n, dtype="Int64"),
+                str=[str(x) for x in range(n)],
+                str_cat=[str(x % 3) for x in range(n - 2)] + [None, np.nan],
+                str_dtype=pd.array(["x"] * n, dtype="string"),
+                str_none=[None] * n,
+                obj=[(str(x),) for x in range(n)],
+                obj_mixed=[1, "a"] * (n // 2),
+                obj_num=[1, 2.5] * (n // 2),
+                cat=pd.Categorical(["a", None] * (n // 2)),
+                cat_int=pd.Categorical([1, 2] * (n // 2)),
+            )
+        ),
+        pd.DataFrame(
+            dict(
+                td=[timedelta(seconds=x, microseconds=x) for x in range(n)],
+                td_neg=pd.to_timedelta([-1.5, None] * (n // 2), unit="s"),
+                td_days=[timedelta(days=x) for x in range(n)],
+                td_cat=[timedelta(seconds=1)] * n,
+                td_nat=[pd.NaT] * n,
+            ),
+            index=list(range(n, 0, -1)),
+        ),
+        pd.DataFrame(dict(a=pd.Series([], dtype=int), b=pd.Series([], dtype=object), c=pd.Series([], dtype=float))),
+        vd.data.cars().set_index("Name"),
+    ]
+
+    for df in dfs:
+        df_orig = df.copy(deep=True)
+        df_steps = _process_steps(df)
+        df_proc = process_df(df, copy=True)
+        pd.testing.assert_frame_equal(df_steps, df_proc)
+        assert [repr(x) for x in df_steps.dtypes] == [repr(x) for x in df_proc.dtypes]
+        # and converting a column at a time into arrow
+        table = pa.Table.from_pandas(df_proc, preserve_index=False)
+        assert process_df_to_table(df).equals(table, check_metadata=True)
+        # the input is untouched when copying
+        pd.testing.assert_frame_equal(df, df_orig)
+
+
+def test_process_df_batches(tmp_path: Path):
+    """The types of each column are decided from all its values, so are the same in every batch"""
+    n = 100
+    df = pd.DataFrame(
+        dict(
+            # the range of values, or their uniqueness, only shows in later rows
+            int=[1] * (n - 1) + [-1000],
+            float_int=[1.0] * (n - 1) + [1.5],
+            str_cat=["a"] * n,
+            str=["a"] * 10 + [str(x) for x in range(n - 10)],
+            td=[timedelta(days=1)] * (n - 1) + [timedelta(seconds=1)],
+            td_nat=[pd.NaT] * (n - 1) + [timedelta(days=1)],
+            obj=[(1,)] * (n - 1) + ["a"],
+        ),
+        index=list(range(n, 0, -1)),
+    )
+    table = pa.Table.from_pandas(process_df(df, copy=True), preserve_index=False)
+
+    for batch_rows in (1, 7, n):
+        (schema, batches) = process_df_batches(df, batch_rows=batch_rows)
+        batches = list(batches)
+        assert len(batches) == -(-n // batch_rows)
+        assert all(b.schema == schema for b in batches)
+        assert pa.Table.from_batches(batches, schema=schema).equals(table, check_metadata=True)
+
+        # written a batch at a time, reusing the same dictionaries
+        fn = str(tmp_path / f"{batch_rows}.arrow")
+        write_df(df, fn, batch_rows=batch_rows)
+        pd.testing.assert_frame_equal(ArrowFormat.load_file(fn), process_df(df, copy=True))
+
+    # empty dataframes are written as a single empty batch
+    (_, batches) = process_df_batches(df.iloc[:0])
+    assert [b.num_rows for b in batches] == [0]
+
+
+def test_process_df_threads(monkeypatch):
+    """Processing the columns in parallel gives the same results as processing them in turn"""
+    monkeypatch.setattr(df_processor, "PARALLEL_MIN_CELLS", 0)
+    n = 1000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            f"{k}_{i}": c
+            for i in range(8)
+            for (k, c) in dict(
+                int=rng.integers(0, 100, n),
+                float=rng.normal(size=n),
+                str=rng.choice(["a", "b", "c"], n).astype(object),
+                td=pd.to_timedelta(rng.integers(0, 10**6, n), unit="s"),
+            ).items()
+        }
+    )
+    pd.testing.assert_frame_equal(process_df(df, copy=True, threads=4), process_df(df, copy=True, threads=1))
+
+    table = pa.Table.from_batches(process_df_batches(df, batch_rows=300, threads=1)[1])
+    (schema, batches) = process_df_batches(df, batch_rows=300, threads=4)
+    assert pa.Table.from_batches(batches, schema=schema).equals(table, check_metadata=True)
+
+    # the default is bounded on large hosts
+    assert 1 <= df_processor.process_threads <= df_processor.MAX_DEFAULT_THREADS
+
+
+def test_process_table(tmp_path: Path):
+    """Arrow tables are processed to the same types and values as via pandas"""
+    n = 300
+    df = pd.DataFrame(
+        dict(
+            int=np.arange(n),
+            int_neg=np.arange(n) - 5,
+            float=np.linspace(0, 1, n),
+            float_int=np.arange(n) * 1.0,
+            float_nan=np.where(np.arange(n) % 3, np.nan, 1.0),
+            str=[str(x) for x in range(n)],
+            str_cat=[None if x % 7 == 0 else str(x % 5) for x in range(n)],
+            bool=np.arange(n) % 2 == 0,
+            datetime=pd.date_range("2020-01-01", periods=n),
+            timedelta=[timedelta(seconds=x) for x in range(n)],
+            cat=pd.Categorical([str(x % 3) for x in range(n)]),
+            list=[[x] for x in range(n)],
+        )
+    )
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    processed = process_table(table)
+    assert processed.equals(process_df_to_table(df).replace_schema_metadata(None))
+    # columns that aren't converted are shared
+    assert processed["float"].chunk(0).buffers()[1].address == table["float"].chunk(0).buffers()[1].address
+
+    # in chunks, categories are encoded with a single dictionary
+    chunked = pa.Table.from_batches(table.to_batches(max_chunksize=100))
+    processed_chunked = process_table(chunked)
+    assert processed_chunked.equals(processed)
+    dictionaries = [c.dictionary for c in processed_chunked["str_cat"].chunks]
+    assert len(dictionaries) == 3 and all(d.equals(dictionaries[0]) for d in dictionaries)
+
+    # and saved without pandas
+    fn = str(tmp_path / "table.arrow")
+    ArrowFormat.save_file(fn, chunked.to_reader())
+    assert pa.ipc.open_file(fn).read_all().equals(processed)
+
+
+def test_to_table():
+    table = pa.table(dict(a=[1, 2, 3]))
+
+    class Stream:
+        def __arrow_c_stream__(self, requested_schema=None):
+            return table.__arrow_c_stream__(requested_schema)
+
+    for x in (table, table.to_batches()[0], table.to_reader(), Stream()):
+        assert to_table(x).equals(table)
+    assert to_table(table.to_pandas()) is None
+    assert to_table([1, 2, 3]) is None
+
+
+def test_arrow_load_file(tmp_path: Path):
+    n = 1000
+    df = pd.DataFrame(dict(a=np.arange(n), b=[str(x % 3) for x in range(n)], c=[f"x{x}" for x in range(n)]))
+    fn = str(tmp_path / "df.arrow")
+    write_df(df, fn, batch_rows=100)
+    expected = process_df(df, copy=True)
+    pd.testing.assert_frame_equal(ArrowFormat.load_file(fn), expected)
+
+    # only the selected columns and rows, in the order given and indexed by their position
+    pd.testing.assert_frame_equal(
+        ArrowFormat.load_file(fn, columns=["c", "a"], rows=slice(150, 420)), expected[["c", "a"]].iloc[150:420]
+    )
+    with open(fn, "rb") as f:
+        pd.testing.assert_frame_equal(ArrowFormat.load_file(f, rows=slice(-10, None)), expected.iloc[-10:])
+
+    # the table is memory-mapped, rather than read in
+    allocated = pa.total_allocated_bytes()
+    table = ArrowFormat.load_file(fn, columns=["a"], as_table=True)
+    assert table.column_names == ["a"] and pa.total_allocated_bytes() - allocated < table.nbytes
+
+    with pytest.raises(ValueError):
+        ArrowFormat.load_file(fn, columns=["d"])
+    with pytest.raises(ValueError):
+        ArrowFormat.load_file(fn, rows=slice(0, 10, 2))
+
+
+def test_parquet_format(tmp_path: Path, monkeypatch):
+    n = 1000
+    df = pd.DataFrame(
+        dict(
+            int=np.arange(n) - 5,
+            float_int=np.where(np.arange(n) % 3, np.nan, 1.0),
+            float=np.linspace(0, 1, n),
+            # the categories differ between row groups
+            str_cat=[str(x // 100) for x in range(n)],
+            str=[str(x) for x in range(n)],
+            datetime=pd.date_range("2020-01-01", periods=n),
+            timedelta=[timedelta(seconds=x) for x in range(n)],
+            cat=pd.Categorical([str(x % 3) for x in range(n)]),
+            list=[[x] for x in range(n)],
+        )
+    )
+    fn = str(tmp_path / "df.parquet")
+    ParquetFormat.save_file(fn, df, row_group_size=300, compression="zstd")
+    pf = pq.ParquetFile(fn)
+    assert pf.num_row_groups == 4 and pf.metadata.row_group(0).column(0).compression == "ZSTD"
+
+    # processed a batch at a time, to the same types and values as the whole table
+    monkeypatch.setattr(datafiles, "PARQUET_BATCH_ROWS", 128)
+    (schema, batches) = process_parquet(pf)
+    batches = list(batches)
+    assert len(batches) > 4 and all(b.num_rows <= 128 for b in batches)
+    expected = process_table(pq.read_table(fn))
+    assert pa.Table.from_batches(batches, schema=schema).equals(expected)
+    assert pa.types.is_dictionary(schema.field("str_cat").type) and schema.field("int").type == pa.int16()
+
+    # as a DataTable asset
+    fn_arrow = str(tmp_path / "df.arrow")
+    ArrowFormat.save_file(fn_arrow, pf)
+    assert ArrowFormat.load_file(fn_arrow, as_table=True).equals(expected)
+
+    # only the selected columns and row groups, in the order given
+    loaded = ParquetFormat.load_file(fn, columns=["str", "int"], row_groups=[1, 3])
+    assert list(loaded.columns) == ["str", "int"] and len(loaded) == 400
+    assert loaded["int"].tolist() == [*range(295, 595), *range(895, 995)]
+    assert ParquetFormat.load_file(fn, as_table=True).equals(pq.read_table(fn))
+    with open(fn, "rb") as f:
+        assert ParquetFormat.load_file(f, row_groups=[2])["str"].tolist() == [str(x) for x in range(600, 900)]
+
+    with pytest.raises(ValueError):
+        ParquetFormat.load_file(fn, columns=["missing"])
+    with pytest.raises(ValueError):
+        ParquetFormat.load_file(fn, row_groups=[4])
@@ -1,8 +1,16 @@
+import datetime
+import io
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
 import pytest
 from packaging.version import Version
 
+from datapane.common import datafiles, json_utils
 from datapane.common import versioning as v
-from datapane.common.utils import should_compress_mime_type_for_upload
+from datapane.common.datafiles import CSVFormat
+from datapane.common.utils import guess_encoding, should_compress_mime_type_for_upload
 
 
 def test_version():
@@ -43,3 +51,136 @@ def test_version():
 )
 def test_should_compress_mime_type(mime_type, value):
     assert should_compress_mime_type_for_upload(mime_type) == value
+
+
+@pytest.mark.parametrize("backend", ["json", "orjson"])
+def test_json_backends(backend: str):
+    if backend not in json_utils._backends:
+        pytest.skip(f"{backend} not installed")
+    prev_backend = json_utils.backend
+    json_utils.set_json_backend(backend)
+    try:
+        x = {
+            "arr": np.arange(3),
+            "non_contiguous": np.arange(6).reshape(2, 3)[:, 1],
+            "scalar": np.float32(1.5),
+            "date": datetime.datetime(2020, 1, 2, 3, 4, 5),
+            "text": ["é", "<b>"],
+            1: True,
+        }
+        out = '{"arr":[0,1,2],"non_contiguous":[1,4],"scalar":1.5,"date":"2020-01-02T03:04:05","text":["é","<b>"],"1":true}'
+        assert json_utils.dumps(x) == out
+        assert json_utils.dumpb(x) == out.encode()
+        assert json_utils.loads(out)["arr"] == [0, 1, 2]
+        # unsupported types raise the backend's own error
+        with pytest.raises(TypeError) as e:
+            json_utils.dumps(object())
+        if backend == "orjson":
+            assert isinstance(e.value, json_utils.orjson.JSONEncodeError)
+    finally:
+        json_utils.backend = prev_backend
+
+
+def test_json_backends_match():
+    """The backends give the same output, so the written reports don't depend on orjson being installed"""
+    if "orjson" not in json_utils._backends:
+        pytest.skip("orjson not installed")
+    (nan, inf) = (float("nan"), float("inf"))
+    x = {
+        "floats": [nan, inf, -inf, 1.5],
+        "nested": {"t": (1, nan)},
+        "arr": np.array([1.5, np.nan, np.inf]),
+        "scalar": np.float64("nan"),
+        "date": datetime.date(2020, 1, 2),
+        "datetime": datetime.datetime(2020, 1, 2, 3, 4, 5),
+    }
+    out = (
+        b'{"floats":[null,null,null,1.5],"nested":{"t":[1,null]},"arr":[1.5,null,null],"scalar":null,'
+        b'"date":"2020-01-02","datetime":"2020-01-02T03:04:05"}'
+    )
+    for backend in ("json", "orjson"):
+        assert json_utils._backends[backend]().dumpb(x) == out
+        assert json_utils._backends[backend]().dumpb(nan) == b"null"
+
+
+def test_escape_json_htmlsafe():
+    from datapane.processors.processors import BaseExportHTML
+
+    x = {"text": "</script><b>'&' é \u2028\u2029"}
+    out = BaseExportHTML.escape_json_htmlsafe(None, x)
+    assert out == '{"text":"\\u003c/script\\u003e\\u003cb\\u003e\\u0027\\u0026\\u0027 é \\u2028\\u2029"}'
+    assert json_utils.loads(out) == x
+
+
+def test_csv_format(tmp_path: Path):
+    text = "name,count\nZürich,1\nMalmö,2\n"
+    expected = pd.DataFrame(dict(name=["Zürich", "Malmö"], count=[1, 2]))
+
+    for encoding in ("utf-8", "latin-1"):
+        fn = tmp_path / f"{encoding}.csv"
+        fn.write_bytes(text.encode(encoding))
+        pd.testing.assert_frame_equal(CSVFormat.load_file(str(fn)), expected)
+        # file objects, read from their current position
+        with fn.open("rb") as f:
+            pd.testing.assert_frame_equal(CSVFormat.load_file(f), expected)
+
+    pd.testing.assert_frame_equal(CSVFormat.load_file(io.StringIO(text)), expected)
+    # files the arrow reader can't parse, e.g. with missing trailing fields, fall back to pandas
+    df = CSVFormat.load_file(io.StringIO("a,b\n1,2\n3\n"))
+    pd.testing.assert_frame_equal(df, pd.DataFrame(dict(a=[1, 3], b=[2, np.nan])))
+
+    # with only ASCII in the sample the encoding is guessed from, UTF-8 is assumed, else guessed from the whole file
+    text = "name,count\n" + "x,1\n" * 300_000 + "y\nZürich,2\n"
+    for encoding in ("utf-8", "latin-1"):
+        fn = tmp_path / f"ascii_prefix_{encoding}.csv"
+        fn.write_bytes(text.encode(encoding))
+        df = CSVFormat.load_file(str(fn))
+        assert len(df) == 300_002 and df["name"].iloc[-1] == "Zürich" and np.isnan(df["count"].iloc[-2])
+
+
+def test_csv_format_matches_pandas(monkeypatch):
+    """The arrow reader gives the same columns and values as `pd.read_csv`"""
+    text = (
+        "a,a,a.1,,date,time,datetime,text,flag,count\n"
+        "1,2,3,4,2020-01-02,12:30:00,2020-01-02 03:04:05,,True,NA\n"
+        "5,6,7,8,2020-01-03,13:00:00,2020-01-02T03:04:05Z,x,false,1\n"
+        ',,,,,,,"",,<NA>\n'
+    )
+    expected = pd.read_csv(io.StringIO(text))
+    assert list(expected.columns) == ["a", "a.2", "a.1", "Unnamed: 3", *"date,time,datetime,text,flag,count".split(",")]
+    df = CSVFormat.load_file(io.BytesIO(text.encode()))
+    pd.testing.assert_frame_equal(df, expected)
+    assert df["text"].isna().tolist() == [True, False, True]
+
+    # dates only found after the first block are still read as strings
+    monkeypatch.setattr(datafiles, "CSV_BLOCK_SIZE", 64)
+    text = "id,date\n" + "1,\n" * 20 + "2,2020-01-02\n"
+    pd.testing.assert_frame_equal(CSVFormat.load_file(io.BytesIO(text.encode())), pd.read_csv(io.StringIO(text)))
+
+
+class _Unseekable(io.RawIOBase):
+    def __init__(self, data: bytes):
+        self._f = io.BytesIO(data)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        return self._f.readinto(b)
+
+
+def test_csv_format_spooled(monkeypatch):
+    # unseekable file objects are copied, to a temp file if large
+    monkeypatch.setattr(datafiles, "CSV_SPOOL_SIZE", 16)
+    text = "name,count\n" + "x,1\n" * 1000
+    pd.testing.assert_frame_equal(CSVFormat.load_file(_Unseekable(text.encode())), pd.read_csv(io.StringIO(text)))
+
+
+def test_guess_encoding():
+    data = ("x" * 100_000 + "Malmö\n").encode("latin-1")
+    f = io.BytesIO(data)
+    f.seek(10)
+    # only the sample is read, and the position is restored
+    assert guess_encoding(f, sample_size=1000) == "ascii"
+    assert f.tell() == 10
+    assert guess_encoding(f).lower() == "iso-8859-1"